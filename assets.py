@@ -0,0 +1,245 @@
+"""Fingerprinted static assets with precompressed variants, plus vendoring of third-party files"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+import urllib.request
+import uuid
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_HASH_LENGTH = 12
+# Variants smaller than this are not worth a second file
+ASSET_COMPRESS_MIN_SIZE = 512
+ASSET_COMPRESSIBLE = ('.css', '.js', '.json', '.map', '.svg', '.ttf', '.txt')
+VENDOR_MANIFEST = os.path.join('vendor', 'vendor.json')
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_FINGERPRINT = re.compile(r'^(.*)\.[0-9a-f]{%d}(\.[^./]+)$' % ASSET_HASH_LENGTH)
+
+
+class Asset:
+    """One static file: where its fingerprinted copy and encoded variants live"""
+
+    def __init__(self, name, fingerprinted, path, digest, mimetype):
+        self.name = name
+        self.fingerprinted = fingerprinted
+        self.path = path
+        self.digest = digest
+        self.mimetype = mimetype
+        self.variants = {}
+
+
+def fingerprint_name(name, digest):
+    base, extension = os.path.splitext(name)
+    return f"{base}.{digest[:ASSET_HASH_LENGTH]}{extension}"
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def _encoders():
+    """Precompression at the highest levels; this runs once per file version, not per request"""
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = ('.zst', lambda data: zstandard.ZstdCompressor(level=19).compress(data))
+    if brotli is not None:
+        encoders['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+    encoders['gzip'] = ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+    return encoders
+
+
+class AssetPipeline:
+    """Copies files from `source_dir` to `build_dir` under content-hashed names.
+
+    A file's name changes whenever its content does, so its URL can be cached
+    for a year and marked immutable. Text files also get .gz, and .br/.zst
+    when brotli or zstandard is installed. The URLs inside CSS files are
+    rewritten to the fingerprinted names of the files they point to, so a
+    font change gives the stylesheet a new name too. Files already in
+    `build_dir` are not written again, so every worker can run build() at
+    startup.
+
+    Vendored files listed in vendor/vendor.json that have not been fetched
+    yet are served from their original URL instead (see vendor_assets()).
+    The first url() or lookup() builds the assets if build() was not called.
+    """
+
+    def __init__(self, source_dir, build_dir, url_prefix='/assets', encoders=None):
+        self.source_dir = source_dir
+        self.build_dir = build_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.encoders = encoders if encoders is not None else _encoders()
+        self.assets = {}
+        self._by_fingerprint = {}
+        self.fallbacks = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.build()
+
+    def build(self):
+        """Fingerprint and precompress every source file; returns the number of assets"""
+        assets = {}
+        names = []
+        for root, _, files in os.walk(self.source_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.source_dir).replace(os.sep, '/')
+                if name != VENDOR_MANIFEST.replace(os.sep, '/'):
+                    names.append(name)
+        vendored = _vendor_files(self.source_dir)
+        fallbacks = {name: entry['url'] for name, entry in vendored.items() if name not in names}
+        # Stylesheets last, so the files they reference already have their fingerprints
+        names.sort(key=lambda name: (name.endswith('.css'), name))
+        for name in names:
+            with open(os.path.join(self.source_dir, name), 'rb') as f:
+                data = f.read()
+            if name.endswith('.css'):
+                data = self._rewrite_css(name, data, assets, fallbacks)
+            assets[name] = self._store(name, data)
+
+        self.assets = assets
+        self._by_fingerprint = {asset.fingerprinted: asset for asset in assets.values()}
+        self.fallbacks = fallbacks
+        if self.fallbacks:
+            logger.warning(f"{len(self.fallbacks)} vendored assets are missing and will load from their CDN; "
+                           f"run `flask vendor-assets` to fetch them")
+        self._built = True
+        return len(assets)
+
+    def _rewrite_css(self, name, data, assets, fallbacks):
+        directory = os.path.dirname(name)
+
+        def replace(match):
+            quote, target = match.group(1), match.group(2).strip()
+            if target.startswith(('data:', '/', '#')) or '://' in target:
+                return match.group(0)
+            # The fragment may follow a query string (font.eot?#iefix), so it is split off first
+            path, _, fragment = target.partition('#')
+            path = path.partition('?')[0]
+            resolved = os.path.normpath(os.path.join(directory, path)).replace(os.sep, '/')
+            asset = assets.get(resolved)
+            if asset is None:
+                if resolved in fallbacks:
+                    return f"url({quote}{fallbacks[resolved]}{quote})"
+                return match.group(0)
+            relative = os.path.relpath(asset.fingerprinted, directory or '.').replace(os.sep, '/')
+            rewritten = relative + (f"#{fragment}" if fragment else '')
+            return f"url({quote}{rewritten}{quote})"
+
+        return _CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+    def _store(self, name, data):
+        digest = hashlib.sha256(data).hexdigest()
+        fingerprinted = fingerprint_name(name, digest)
+        path = os.path.join(self.build_dir, fingerprinted)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+        asset = Asset(name, fingerprinted, path, digest, mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        if name.endswith(ASSET_COMPRESSIBLE) and len(data) >= ASSET_COMPRESS_MIN_SIZE:
+            for encoding, (suffix, compress) in self.encoders.items():
+                variant = path + suffix
+                if not os.path.exists(variant):
+                    encoded = compress(data)
+                    # Keep only variants that save at least a tenth
+                    if len(encoded) > len(data) * 0.9:
+                        continue
+                    _write_atomic(variant, encoded)
+                asset.variants[encoding] = variant
+        return asset
+
+    def url(self, name):
+        """Fingerprinted URL of a source file, its CDN URL if it is a vendored file not yet fetched, or None"""
+        self._ensure_built()
+        asset = self.assets.get(name)
+        if asset is not None:
+            return f"{self.url_prefix}/{asset.fingerprinted}"
+        return self.fallbacks.get(name)
+
+    def lookup(self, fingerprinted):
+        """(asset, current) for a requested name; current is False for a fingerprint from an older build"""
+        self._ensure_built()
+        asset = self._by_fingerprint.get(fingerprinted)
+        if asset is not None:
+            return asset, True
+        match = _FINGERPRINT.match(fingerprinted)
+        if match:
+            asset = self.assets.get(match.group(1) + match.group(2))
+            if asset is not None:
+                return asset, False
+        return None, False
+
+    def stats(self):
+        return {
+            'assets': len(self.assets),
+            'precompressed': sum(len(asset.variants) for asset in self.assets.values()),
+            'missing_vendor_files': sorted(self.fallbacks),
+        }
+
+
+def _vendor_files(source_dir):
+    path = os.path.join(source_dir, VENDOR_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        manifest = json.load(f)
+    return {name: entry for package in manifest.values() for name, entry in package['files'].items()}
+
+
+def vendor_assets(source_dir, refresh=False, progress=None, timeout=30):
+    """Download the files listed in vendor/vendor.json into `source_dir`.
+
+    A file whose sha256 is recorded must match it. A file without a recorded
+    sha256 has its hash written back to the manifest, so later fetches can
+    be verified. Commit the fetched files and the updated manifest, so that
+    deployments without internet access get the same bytes. Returns the
+    names of the files that were written.
+    """
+    manifest_path = os.path.join(source_dir, VENDOR_MANIFEST)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    written = []
+    for package in manifest.values():
+        for name, entry in package['files'].items():
+            target = os.path.join(source_dir, name)
+            if os.path.exists(target) and not refresh:
+                continue
+            with urllib.request.urlopen(entry['url'], timeout=timeout) as response:
+                data = response.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if entry.get('sha256') and entry['sha256'] != digest:
+                raise ValueError(f"{name}: sha256 {digest} does not match the pinned {entry['sha256']}")
+            entry['sha256'] = digest
+            _write_atomic(target, data)
+            written.append(name)
+            if progress:
+                progress(name, len(data))
+
+    _write_atomic(manifest_path, (json.dumps(manifest, indent=4) + '\n').encode('utf-8'))
+    return written
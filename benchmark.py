@@ -0,0 +1,398 @@
+"""Drive the app's routes at a fixed concurrency and report latency, throughput and memory as JSON.
+
+Runs against a local database only. Fill it first with reproducible data:
+
+    flask --app server seed-data --clients 1000000 --users 1000 --replace --yes
+
+then benchmark in-process through Flask's test client (no server needed):
+
+    python benchmark.py --concurrency 8 --requests 200 --output results.json
+
+or against a running server, reading its peak RSS from /proc/<pid>/status:
+
+    python benchmark.py --url http://localhost:5000 --pid 12345
+
+Routes are run one after another, each for its own number of requests, so
+every route gets its own percentiles. A route can override the request count
+with name=count, e.g. --routes dashboard,client_details,export_csv=3.
+Compare two runs with --baseline previous.json.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import CookieJar
+
+from datagen import CATEGORIES
+
+BENCHMARK_CATEGORY = 'Benchmark Import'
+DEFAULT_ROUTES = ['dashboard', 'clients', 'clients_api', 'client_details', 'export_csv=5',
+                  'import=10', 'bulk_update=20', 'bulk_delete=20']
+
+
+def percentile(sorted_values, p):
+    """Linear-interpolated percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def peak_rss_mb(pid=None):
+    """Peak resident set size of this process, or of `pid` on Linux"""
+    if pid:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            return None
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: text/csv\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class TestClientSession:
+    """Requests through Flask's test client, in this process"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, json_body=None, files=None):
+        data = dict(form or {})
+        for name, (filename, content) in (files or {}).items():
+            data[name] = (io.BytesIO(content), filename)
+        response = self.client.open(path, method=method, data=data or None, json=json_body)
+        # Reading the body drives streamed responses to completion
+        body = response.get_data()
+        return response.status_code, body
+
+
+class HttpSession:
+    """Requests over HTTP to a running server, with its own cookie jar"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, form=None, json_body=None, files=None):
+        headers = {}
+        data = None
+        if files:
+            data, headers['Content-Type'] = encode_multipart(form or {}, files)
+        elif json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class Benchmark:
+    def __init__(self, session_factory, username, password, concurrency, seed, import_rows, bulk_size):
+        self.session_factory = session_factory
+        self.username = username
+        self.password = password
+        self.concurrency = concurrency
+        self.seed = seed
+        self.import_rows = import_rows
+        self.bulk_size = bulk_size
+        self._local = threading.local()
+        self._thread_seeds = iter(range(seed, seed + 1_000_000))
+        self._seed_lock = threading.Lock()
+        self.max_id = 1
+
+    def session(self):
+        """This thread's logged-in session and random generator"""
+        if not hasattr(self._local, 'session'):
+            session = self.session_factory()
+            session.request('POST', '/login', form={'username': self.username, 'password': self.password})
+            # Both outcomes of a login are HTML pages; an API call tells them apart
+            status, body = session.request('GET', '/clients/api?limit=1')
+            if status != 200 or not body.startswith(b'{'):
+                raise RuntimeError(f"Could not log in as {self.username}")
+            with self._seed_lock:
+                self._local.rng = random.Random(next(self._thread_seeds))
+            self._local.session = session
+        return self._local.session, self._local.rng
+
+    def prepare(self):
+        """Learn the id range of the dataset the routes will be run against"""
+        session, _ = self.session()
+        _, body = session.request('GET', '/clients/api?sort=id&order=desc&limit=1')
+        page = json.loads(body)
+        if page['clients']:
+            self.max_id = page['clients'][0]['id']
+        return {'clients': page.get('total'), 'max_id': self.max_id}
+
+    def _benchmark_ids(self, session, rng):
+        """Ids of clients created by the import scenario, for the bulk scenarios to work on.
+
+        A random subset of a larger page keeps concurrent workers mostly off each other's rows.
+        """
+        query = urllib.parse.urlencode({'category': BENCHMARK_CATEGORY, 'sort': 'id',
+                                        'limit': min(self.bulk_size * self.concurrency, 100)})
+        _, body = session.request('GET', f'/clients/api?{query}')
+        ids = [client['id'] for client in json.loads(body)['clients']]
+        return rng.sample(ids, min(self.bulk_size, len(ids)))
+
+    # Scenarios: each performs one timed request and returns (status, bytes, seconds),
+    # or None when there was nothing to do (e.g. no imported rows left to delete)
+    def _timed(self, session, method, path, **kwargs):
+        started = time.perf_counter()
+        status, body = session.request(method, path, **kwargs)
+        return status, len(body), time.perf_counter() - started
+
+    def dashboard(self, session, rng):
+        return self._timed(session, 'GET', '/dashboard')
+
+    def clients(self, session, rng):
+        return self._timed(session, 'GET', '/clients')
+
+    def clients_api(self, session, rng):
+        # Categories as generated by `flask seed-data`
+        params = {'limit': 50}
+        if rng.random() < 0.5:
+            params['category'] = rng.choice(CATEGORIES)
+        return self._timed(session, 'GET', f'/clients/api?{urllib.parse.urlencode(params)}')
+
+    def client_details(self, session, rng):
+        return self._timed(session, 'GET', f'/clients/{rng.randint(1, self.max_id)}')
+
+    def export_csv(self, session, rng):
+        return self._timed(session, 'GET', '/export/csv?columns=id,name,category,email,phone,created_at')
+
+    def import_(self, session, rng):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Client Name', 'Category', 'Email', 'Phone', 'Address', 'Notes'])
+        for i in range(self.import_rows):
+            writer.writerow([f'Benchmark Client {rng.randint(1, 10 ** 9)}', BENCHMARK_CATEGORY,
+                             f'bench{i}@example.com', '555-0100', '1 Benchmark Way', 'generated by benchmark.py'])
+        return self._timed(session, 'POST', '/clients/import',
+                           files={'file': ('benchmark.csv', buffer.getvalue().encode())})
+
+    def bulk_update(self, session, rng):
+        ids = self._benchmark_ids(session, rng)
+        if not ids:
+            return None
+        return self._timed(session, 'POST', '/clients/bulk-update-category',
+                           json_body={'client_ids': ids, 'category': BENCHMARK_CATEGORY})
+
+    def bulk_delete(self, session, rng):
+        ids = self._benchmark_ids(session, rng)
+        if not ids:
+            return None
+        return self._timed(session, 'POST', '/clients/bulk-delete', json_body={'client_ids': ids})
+
+    SCENARIOS = {
+        'dashboard': dashboard,
+        'clients': clients,
+        'clients_api': clients_api,
+        'client_details': client_details,
+        'export_csv': export_csv,
+        'import': import_,
+        'bulk_update': bulk_update,
+        'bulk_delete': bulk_delete,
+    }
+
+    def _one(self, scenario):
+        session, rng = self.session()
+        try:
+            return scenario(self, session, rng)
+        except Exception as e:
+            return ('error', 0, 0.0, str(e))
+
+    def run_route(self, name, requests, rss_pid=None):
+        scenario = self.SCENARIOS[name]
+        # Log every worker in before the clock starts
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(lambda _: self.session(), range(self.concurrency)))
+            started = time.perf_counter()
+            results = list(executor.map(lambda _: self._one(scenario), range(requests)))
+            elapsed = time.perf_counter() - started
+
+        latencies = []
+        statuses = Counter()
+        errors = []
+        total_bytes = 0
+        skipped = 0
+        for result in results:
+            if result is None:
+                skipped += 1
+                continue
+            status, size, seconds = result[:3]
+            statuses[str(status)] += 1
+            if status == 'error' or status >= 400:
+                if len(result) > 3 and len(errors) < 5:
+                    errors.append(result[3])
+                continue
+            latencies.append(seconds * 1000)
+            total_bytes += size
+        latencies.sort()
+        completed = len(latencies)
+        return {
+            'requests': requests,
+            'completed': completed,
+            'skipped': skipped,
+            'errors': requests - completed - skipped,
+            'error_samples': errors,
+            'status_codes': dict(statuses),
+            'latency_ms': {
+                'min': round(latencies[0], 3) if latencies else None,
+                'p50': round(percentile(latencies, 50), 3) if latencies else None,
+                'p95': round(percentile(latencies, 95), 3) if latencies else None,
+                'p99': round(percentile(latencies, 99), 3) if latencies else None,
+                'max': round(latencies[-1], 3) if latencies else None,
+                'mean': round(sum(latencies) / completed, 3) if latencies else None,
+            },
+            'throughput_rps': round(completed / elapsed, 2) if elapsed else None,
+            'bytes': total_bytes,
+            'elapsed_s': round(elapsed, 3),
+            'peak_rss_mb': peak_rss_mb(rss_pid),
+        }
+
+
+def parse_routes(spec, default_requests):
+    routes = []
+    for item in spec:
+        name, _, count = item.partition('=')
+        name = name.strip()
+        if name not in Benchmark.SCENARIOS:
+            raise SystemExit(f"Unknown route {name!r}; choose from {', '.join(Benchmark.SCENARIOS)}")
+        routes.append((name, int(count) if count else default_requests))
+    return routes
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print how each route moved relative to a previous report"""
+    for name, current in report['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in ('p50', 'p95', 'p99'):
+            before, after = previous['latency_ms'].get(key), current['latency_ms'].get(key)
+            if before and after:
+                changes.append(f"{key} {before:.1f}->{after:.1f} ms ({(after - before) / before:+.0%})")
+        if previous.get('throughput_rps') and current.get('throughput_rps'):
+            before, after = previous['throughput_rps'], current['throughput_rps']
+            changes.append(f"rps {before}->{after} ({(after - before) / before:+.0%})")
+        print(f"{name:15} {', '.join(changes)}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Benchmark a running server instead of the app in this process')
+    parser.add_argument('--pid', type=int, help='With --url, the server process to read peak RSS from')
+    parser.add_argument('--routes', default=','.join(DEFAULT_ROUTES),
+                        help='Comma-separated routes, each optionally name=requests')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route (default 200)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients (default 4)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the random choices (default 42)')
+    parser.add_argument('--import-rows', type=int, default=1000, help='Rows per import request (default 1000)')
+    parser.add_argument('--bulk-size', type=int, default=25, help='Clients per bulk request (default 25)')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='A previous JSON report to compare against')
+    args = parser.parse_args(argv)
+
+    if args.url:
+        def session_factory():
+            return HttpSession(args.url)
+        target = args.url
+    else:
+        from server import create_app
+        app = create_app()
+        # The app logs every export and import at INFO; keep the report readable
+        logging.getLogger().setLevel(logging.WARNING)
+
+        def session_factory():
+            return TestClientSession(app)
+        target = 'in-process'
+
+    routes = parse_routes(args.routes.split(','), args.requests)
+    bench = Benchmark(session_factory, args.username, args.password, args.concurrency, args.seed,
+                      args.import_rows, args.bulk_size)
+    dataset = bench.prepare()
+
+    report = {
+        'benchmark': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'target': target,
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'import_rows': args.import_rows,
+            'bulk_size': args.bulk_size,
+        },
+        'dataset': dataset,
+        'routes': {},
+    }
+    rss_pid = args.pid if args.url else None
+    for name, requests in routes:
+        print(f"{name}: {requests} requests at concurrency {args.concurrency}", file=sys.stderr)
+        report['routes'][name] = bench.run_route(name, requests, rss_pid)
+    report['peak_rss_mb'] = peak_rss_mb(rss_pid)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
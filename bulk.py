@@ -0,0 +1,182 @@
+"""Bulk client mutations run in bounded chunks, each committed on its own"""
+import logging
+from collections import Counter
+
+from category_stats import apply_category_deltas, remove_category
+from rollups import remove_clients_from_rollup
+
+BULK_CHUNK_SIZE = 500
+BULK_MAX_IDS = 50000
+# Id sets above this size are loaded into a temporary table instead of being sent as IN (...) lists
+BULK_TEMP_TABLE_THRESHOLD = 2000
+
+_ID_TABLE = 'bulk_client_ids'
+
+logger = logging.getLogger(__name__)
+
+
+class BulkResult:
+    """Counts of one bulk operation; `affected` is what a dry run would change"""
+
+    def __init__(self, requested=0, dry_run=False):
+        self.requested = requested
+        self.dry_run = dry_run
+        self.affected = 0
+        self.chunks = 0
+        self.categories = Counter()
+
+    def to_dict(self):
+        return {
+            'requested': self.requested,
+            'affected': self.affected,
+            'chunks': self.chunks,
+            'dry_run': self.dry_run,
+            'categories': {category: count for category, count in self.categories.items() if category is not None},
+        }
+
+
+def parse_bulk_ids(raw, max_ids=BULK_MAX_IDS):
+    """Validate a JSON list of client ids; returns them sorted and de-duplicated"""
+    if not isinstance(raw, list):
+        raise ValueError("client_ids must be a list")
+    try:
+        ids = sorted({int(value) for value in raw})
+    except (TypeError, ValueError):
+        raise ValueError("client_ids must contain only integer ids")
+    if len(ids) > max_ids:
+        raise ValueError(f"At most {max_ids} clients can be changed in one request")
+    return ids
+
+
+def _id_chunks(cursor, ids, chunk_size, temp_threshold):
+    """Yield (join, condition, params) selecting successive chunks of the sorted ids from clients.
+
+    Small sets become IN (...) lists of at most chunk_size placeholders. Large
+    sets are loaded once into a temporary table, and each chunk is the id
+    range between two of its rows, so no statement carries the full list.
+    """
+    if len(ids) <= temp_threshold:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            yield '', f"clients.id IN ({placeholders})", tuple(chunk)
+        return
+
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {_ID_TABLE}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {_ID_TABLE} (id INT PRIMARY KEY)")
+    try:
+        for start in range(0, len(ids), chunk_size):
+            cursor.executemany(f"INSERT INTO {_ID_TABLE} (id) VALUES (%s)",
+                               [(client_id,) for client_id in ids[start:start + chunk_size]])
+        join = f"JOIN {_ID_TABLE} ON {_ID_TABLE}.id = clients.id"
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            yield join, f"{_ID_TABLE}.id BETWEEN %s AND %s", (chunk[0], chunk[-1])
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {_ID_TABLE}")
+
+
+def _count_categories(cursor, join, condition, params, lock):
+    cursor.execute(f"SELECT clients.category, COUNT(*) FROM clients {join} WHERE {condition} "
+                   f"GROUP BY clients.category{' FOR UPDATE' if lock else ''}", params)
+    return Counter(dict(cursor.fetchall()))
+
+
+def _run_chunks(db, ids, mutate, dry_run, chunk_size, temp_threshold, progress):
+    result = BulkResult(len(ids), dry_run)
+    cursor = db.cursor()
+    chunks = _id_chunks(cursor, ids, chunk_size, temp_threshold)
+    try:
+        for join, condition, params in chunks:
+            # Locks are held for one chunk only; the commit releases them before the next one
+            old_categories = _count_categories(cursor, join, condition, params, lock=not dry_run)
+            if not dry_run:
+                mutate(cursor, join, condition, params, old_categories)
+                db.commit()
+            result.chunks += 1
+            result.affected += sum(old_categories.values())
+            result.categories.update(old_categories)
+            if progress:
+                progress(result)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        # Drops the temporary id table while the cursor is still open
+        try:
+            chunks.close()
+        except Exception as e:
+            # Raising here would hide the error that stopped the loop; the next bulk operation drops the table first
+            logger.warning(f"Could not drop the temporary id table: {e}")
+        if dry_run:
+            db.rollback()
+        cursor.close()
+    return result
+
+
+def bulk_delete(db, ids, dry_run=False, chunk_size=BULK_CHUNK_SIZE,
+                temp_threshold=BULK_TEMP_TABLE_THRESHOLD, progress=None):
+    """Delete clients by id, committing after every chunk.
+
+    A failure leaves the chunks before it deleted; the result passed to
+    `progress` after each chunk says how far the operation got.
+    """
+    def mutate(cursor, join, condition, params, old_categories):
+        remove_clients_from_rollup(cursor, condition, params, join)
+        cursor.execute(f"DELETE clients FROM clients {join} WHERE {condition}", params)
+        apply_category_deltas(cursor, {category: -count for category, count in old_categories.items()})
+
+    return _run_chunks(db, ids, mutate, dry_run, chunk_size, temp_threshold, progress)
+
+
+def bulk_update_category(db, ids, category, dry_run=False, chunk_size=BULK_CHUNK_SIZE,
+                         temp_threshold=BULK_TEMP_TABLE_THRESHOLD, progress=None):
+    """Move clients to `category`, committing after every chunk"""
+    def mutate(cursor, join, condition, params, old_categories):
+        cursor.execute(f"UPDATE clients {join} SET clients.category = %s WHERE {condition}",
+                       (category,) + params)
+        deltas = Counter({category: sum(old_categories.values())})
+        deltas.subtract(old_categories)
+        apply_category_deltas(cursor, deltas)
+
+    return _run_chunks(db, ids, mutate, dry_run, chunk_size, temp_threshold, progress)
+
+
+def delete_category_clients(db, category, dry_run=False, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    """Delete every client in `category` with repeated DELETE ... LIMIT, committing after each"""
+    cursor = db.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM clients WHERE category = %s", (category,))
+        result = BulkResult(cursor.fetchone()[0], dry_run)
+        if dry_run:
+            result.affected = result.requested
+            result.categories[category] = result.requested
+            return result
+
+        while True:
+            # Locks and subtracts the same rows the DELETE below removes
+            remove_clients_from_rollup(cursor, "clients.category = %s", (category,),
+                                       order_by="clients.id", limit=chunk_size)
+            cursor.execute("DELETE FROM clients WHERE category = %s ORDER BY id LIMIT %s", (category, chunk_size))
+            deleted = cursor.rowcount
+            apply_category_deltas(cursor, {category: -deleted})
+            db.commit()
+            if deleted:
+                result.chunks += 1
+                result.affected += deleted
+                result.categories[category] += deleted
+                if progress:
+                    progress(result)
+            if deleted < chunk_size:
+                break
+        # Also drops a summary row left behind by drift
+        remove_category(cursor, category)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if dry_run:
+            db.rollback()
+        cursor.close()
@@ -0,0 +1,84 @@
+"""In-process cache with TTL expiry and write-driven version invalidation"""
+import threading
+import time
+
+
+class VersionedCache:
+    """Caches computed values against a data version.
+
+    Writers call bump() after committing; every entry computed under an older
+    version is ignored from then on, so a request that follows its own write
+    always recomputes. Entries also expire after `ttl` seconds, which bounds
+    staleness for writes made by other processes. With `max_entries` set, the
+    oldest entries are dropped once it is reached.
+    """
+
+    def __init__(self, ttl=30, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._version = 0
+        self._last_modified = time.time()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def last_modified(self):
+        """Wall-clock time of the last bump, i.e. the last known data change"""
+        return self._last_modified
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, version, expires = entry
+                if version == self._version and time.monotonic() < expires:
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def set(self, key, value, version):
+        """Store a value computed under `version`; dropped if a write happened meanwhile"""
+        with self._lock:
+            if version != self._version:
+                return
+            if self.max_entries and key not in self._entries and len(self._entries) >= self.max_entries:
+                # Entries are kept in insertion order, so the first one is the oldest
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (value, version, time.monotonic() + self.ttl)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            version = self._version
+            value = compute()
+            self.set(key, value, version)
+        return value
+
+    def bump(self):
+        """Mark the underlying data as changed"""
+        with self._lock:
+            self._version += 1
+            self._last_modified = time.time()
+            self._entries.clear()
+            return self._version
+
+    def clear(self):
+        self.bump()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'ttl': self.ttl,
+            }
@@ -0,0 +1,103 @@
+"""Maintenance of the category_stats summary table and the uncategorized client count"""
+from collections import Counter
+
+
+def apply_category_deltas(cursor, deltas):
+    """Apply {category: change in client count} inside the caller's transaction.
+
+    The None key counts clients without a category, which go to
+    uncategorized_clients since category_stats has no row for them.
+    """
+    uncategorized = deltas.get(None, 0)
+    if uncategorized:
+        cursor.execute("""
+            INSERT INTO uncategorized_clients (id, client_count) VALUES (1, %s)
+            ON DUPLICATE KEY UPDATE client_count = client_count + VALUES(client_count)
+        """, (uncategorized,))
+
+    deltas = {category: delta for category, delta in deltas.items() if category is not None and delta}
+    if not deltas:
+        return
+
+    cursor.executemany("""
+        INSERT INTO category_stats (category, client_count) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE client_count = client_count + VALUES(client_count)
+    """, list(deltas.items()))
+
+    # Categories that lost their last client disappear, as they would from a GROUP BY
+    shrunk = [category for category, delta in deltas.items() if delta < 0]
+    if shrunk:
+        placeholders = ','.join(['%s'] * len(shrunk))
+        cursor.execute(f"DELETE FROM category_stats WHERE category IN ({placeholders}) AND client_count <= 0",
+                       tuple(shrunk))
+
+
+def lock_client_categories(cursor, client_ids):
+    """Lock the given clients and return how many of them are in each category"""
+    if not client_ids:
+        return Counter()
+    placeholders = ','.join(['%s'] * len(client_ids))
+    cursor.execute(f"SELECT category FROM clients WHERE id IN ({placeholders}) FOR UPDATE", tuple(client_ids))
+    return Counter(row[0] for row in cursor.fetchall())
+
+
+def remove_category(cursor, category):
+    cursor.execute("DELETE FROM category_stats WHERE category = %s", (category,))
+
+
+def read_category_stats(cursor):
+    """Return [(category, count), ...] ordered by count, largest first"""
+    cursor.execute("SELECT category, client_count FROM category_stats ORDER BY client_count DESC")
+    return cursor.fetchall()
+
+
+def read_uncategorized_count(cursor):
+    """Clients whose category is NULL; add this to the category counts for the total"""
+    cursor.execute("SELECT client_count FROM uncategorized_clients WHERE id = 1")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def reconcile_category_stats(db, dry_run=False):
+    """Rebuild category_stats and the uncategorized count from clients and return the drift that was found.
+
+    Each drift entry is {'category', 'expected', 'recorded'}; a recorded count
+    of None means the category was missing from category_stats. The entry for
+    clients without a category has category None.
+    """
+    cursor = db.cursor()
+    try:
+        # Shared locks keep writers out while the counts are compared and rewritten
+        # NULL forms its own group, which is the uncategorized count
+        cursor.execute("SELECT category, COUNT(*) FROM clients GROUP BY category LOCK IN SHARE MODE")
+        expected = dict(cursor.fetchall())
+        expected.setdefault(None, 0)
+        cursor.execute("SELECT category, client_count FROM category_stats FOR UPDATE")
+        recorded = dict(cursor.fetchall())
+        cursor.execute("SELECT client_count FROM uncategorized_clients WHERE id = 1 FOR UPDATE")
+        row = cursor.fetchone()
+        recorded[None] = row[0] if row else None
+
+        drift = []
+        for category in sorted(set(expected) | set(recorded), key=lambda category: (category is not None, category)):
+            if expected.get(category) != recorded.get(category):
+                drift.append({
+                    'category': category,
+                    'expected': expected.get(category, 0),
+                    'recorded': recorded.get(category),
+                })
+
+        if drift and not dry_run:
+            cursor.execute("DELETE FROM category_stats")
+            cursor.executemany("INSERT INTO category_stats (category, client_count) VALUES (%s, %s)",
+                               [(category, count) for category, count in expected.items() if category is not None])
+            cursor.execute("""
+                INSERT INTO uncategorized_clients (id, client_count) VALUES (1, %s)
+                ON DUPLICATE KEY UPDATE client_count = VALUES(client_count)
+            """, (expected[None],))
+            db.commit()
+        else:
+            db.rollback()
+        return drift
+    finally:
+        cursor.close()
@@ -0,0 +1,168 @@
+"""Parquet and Arrow IPC exports of the clients table, written one row group at a time.
+
+Needs pyarrow (`pip install pyarrow`); without it columnar_available()
+returns False and the CSV/JSON exports are unaffected. pyarrow is imported
+by the first export rather than at startup, since importing it takes a
+good part of a second.
+"""
+import importlib.util
+import io
+import logging
+
+from exports import counted
+
+logger = logging.getLogger(__name__)
+
+# Format name -> (mimetype, file extension)
+COLUMNAR_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+# Codecs each format accepts; zstd is the default for both
+COLUMNAR_COMPRESSION = {
+    'parquet': ('zstd', 'snappy', 'gzip', 'none'),
+    'arrow': ('zstd', 'lz4', 'none'),
+}
+COLUMNAR_ROW_GROUP_SIZE = 50000
+COLUMNAR_MIN_ROW_GROUP_SIZE = 1000
+COLUMNAR_MAX_ROW_GROUP_SIZE = 500000
+
+# Arrow type factories per client column; category is filled in as a dictionary type
+_COLUMN_TYPES = {
+    'id': lambda: pa.int32(),
+    'name': lambda: pa.string(),
+    'email': lambda: pa.string(),
+    'phone': lambda: pa.string(),
+    'address': lambda: pa.string(),
+    'notes': lambda: pa.string(),
+    'created_at': lambda: pa.timestamp('s'),
+    'updated_at': lambda: pa.timestamp('s'),
+}
+
+pa = None
+pq = None
+
+
+def columnar_available():
+    return pa is not None or importlib.util.find_spec('pyarrow') is not None
+
+
+def _import_pyarrow():
+    global pa, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.parquet
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def client_schema(columns):
+    """Arrow schema of the selected client columns, with category dictionary-encoded"""
+    fields = []
+    for column in columns:
+        if column == 'category':
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, _COLUMN_TYPES[column](), nullable=column != 'id'))
+    return pa.schema(fields)
+
+
+def load_categories(cursor):
+    """Distinct categories, read from the category index, to seed the dictionary before the first batch"""
+    cursor.execute("SELECT DISTINCT category FROM clients WHERE category IS NOT NULL ORDER BY category")
+    return [row[0] for row in cursor.fetchall()]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that keeps what was written until drain() hands it out"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class _CategoryDictionary:
+    """Maps category names to dictionary indices that stay stable for the whole export.
+
+    Categories added while the export runs are appended, so the Arrow stream
+    only has to send them as a dictionary delta.
+    """
+
+    def __init__(self, categories):
+        self.values = list(categories)
+        self._index = {value: i for i, value in enumerate(self.values)}
+
+    def encode(self, values):
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            index = self._index.get(value)
+            if index is None:
+                index = self._index[value] = len(self.values)
+                self.values.append(value)
+            indices.append(index)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()),
+                                              pa.array(self.values, type=pa.string()))
+
+
+def _record_batch(rows, columns, schema, dictionary):
+    arrays = []
+    for position, values in enumerate(zip(*rows)):
+        if columns[position] == 'category':
+            arrays.append(dictionary.encode(values))
+        else:
+            arrays.append(pa.array(values, type=schema.field(position).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def columnar_stream(chunks, columns, categories, fmt='parquet', compression='zstd', label=None):
+    """Encode row chunks as Parquet or an Arrow IPC stream, yielding the bytes of each chunk.
+
+    Every chunk becomes one Parquet row group or one Arrow record batch, so
+    memory is bounded by the chunk size. Parquet writes its footer last;
+    the file is only readable once the stream has finished.
+    """
+    if not columnar_available():
+        raise RuntimeError("Columnar exports need pyarrow (pip install pyarrow)")
+    _import_pyarrow()
+    schema = client_schema(columns)
+    dictionary = _CategoryDictionary(categories)
+    sink = _ChunkSink()
+    codec = None if compression == 'none' else compression
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression=codec or 'none', use_dictionary=True)
+        write = writer.write_table
+        wrap = lambda batch: pa.Table.from_batches([batch])
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=codec, emit_dictionary_deltas=True)
+        writer = pa.ipc.new_stream(sink, schema, options=options)
+        write = writer.write_batch
+        wrap = lambda batch: batch
+
+    try:
+        for rows in counted(chunks, label or f"{fmt.capitalize()} export"):
+            write(wrap(_record_batch(rows, columns, schema, dictionary)))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
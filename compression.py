@@ -0,0 +1,261 @@
+"""WSGI middleware that compresses responses as they stream out"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+
+# Compressible types; anything else (images, PDFs, archives, Parquet) is already compact
+COMPRESSIBLE_TYPES = {
+    'application/javascript',
+    'application/json',
+    'application/sql',
+    'application/x-ndjson',
+    'application/xml',
+    'image/svg+xml',
+}
+# Server-Sent Events must reach the browser message by message; a compressor would hold them back
+UNCOMPRESSED_TYPES = {'text/event-stream'}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def available_encodings():
+    """Supported Content-Encodings in order of preference"""
+    encodings = {}
+    if zstandard is not None:
+        encodings['zstd'] = _Zstd
+    if brotli is not None:
+        encodings['br'] = _Brotli
+    encodings['gzip'] = _Gzip
+    return encodings
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """The preferred encoding the client accepts, or None for identity.
+
+    Follows RFC 9110: q=0 refuses a coding, `*` covers codings not named,
+    and among equal q-values the server's order decides.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    if 'x-gzip' in accepted and 'gzip' not in accepted:
+        accepted['gzip'] = accepted['x-gzip']
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _is_compressible(content_type):
+    mimetype = content_type.split(';', 1)[0].strip().lower()
+    if not mimetype or mimetype in UNCOMPRESSED_TYPES:
+        return False
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES or mimetype.endswith('+json')
+
+
+class CompressionMiddleware:
+    """Compress text responses with the best encoding the client accepts.
+
+    The body is compressed chunk by chunk as the application yields it, so
+    streamed exports stay streamed. Compression is skipped in these cases:
+    - bodies under `min_size` bytes (a streamed body is held back only
+      until that many bytes have arrived)
+    - responses that are already encoded, partial or marked no-transform
+    - types that do not compress (see COMPRESSIBLE_TYPES), and
+      text/event-stream
+    `levels` sets the level per encoding. Lower levels trade ratio for CPU.
+    `on_complete(encoding, raw_bytes, sent_bytes)` is called after every
+    compressed response.
+    """
+
+    def __init__(self, app, levels=None, min_size=COMPRESSION_MIN_SIZE, encodings=None, on_complete=None):
+        self.app = app
+        self.levels = dict(COMPRESSION_LEVELS, **(levels or {}))
+        self.min_size = min_size
+        self.encodings = encodings if encodings is not None else available_encodings()
+        self.on_complete = on_complete
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        state = {'exc_info': None, 'pending': []}
+
+        def capture(status, headers, exc_info=None):
+            # The real start_response waits until the first bytes show whether the body is worth compressing
+            state['status'], state['headers'], state['exc_info'] = status, headers, exc_info
+            return state['pending'].append
+
+        body = self.app(environ, capture)
+        if 'status' in state and (encoding is None or not self._eligible(state['status'], state['headers'])):
+            # Nothing to do: the body goes out untouched, so file wrappers and event streams keep working
+            headers = state['headers']
+            if self._eligible(state['status'], headers):
+                headers = self._add_vary(list(headers))
+            write = start_response(state['status'], headers, state['exc_info'])
+            for block in state['pending']:
+                write(block)
+            return body
+        return self._compress(body, encoding, state, start_response)
+
+    def _eligible(self, status, headers):
+        """Whether the response may be compressed at all, ignoring its size"""
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        values = {}
+        for name, value in headers:
+            values.setdefault(name.lower(), value)
+        if 'content-encoding' in values or 'content-range' in values:
+            return False
+        if 'no-transform' in values.get('cache-control', '').lower():
+            return False
+        return _is_compressible(values.get('content-type', ''))
+
+    def _compress(self, body, encoding, state, start_response):
+        iterator = iter(body)
+        try:
+            buffered = state['pending']
+            size = sum(len(block) for block in buffered)
+            exhausted = False
+            # Hold back the start of the body until it is clear whether it reaches min_size
+            while 'status' not in state or (size < self.min_size
+                                            and self._eligible(state['status'], state['headers'])):
+                try:
+                    block = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if block:
+                    buffered.append(block)
+                    size += len(block)
+            status, headers = state['status'], list(state['headers'])
+            eligible = self._eligible(status, headers)
+            if eligible:
+                headers = self._add_vary(headers)
+            if not eligible or encoding is None or (exhausted and size < self.min_size):
+                start_response(status, headers, state['exc_info'])
+                yield from buffered
+                yield from iterator
+                return
+
+            start_response(status, self._encoded_headers(headers, encoding), state['exc_info'])
+            compressor = self.encodings[encoding](self.levels[encoding])
+            raw = sent = 0
+            first = True
+            for block in _chain(buffered, iterator):
+                if not block:
+                    continue
+                raw += len(block)
+                data = compressor.compress(block)
+                if first:
+                    # The page head (or the first rows of an export) go out straight away
+                    data += compressor.flush()
+                    first = False
+                if data:
+                    sent += len(data)
+                    yield data
+            data = compressor.finish()
+            sent += len(data)
+            yield data
+            if self.on_complete:
+                self.on_complete(encoding, raw, sent)
+        finally:
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
+
+    def _add_vary(self, headers):
+        for index, (name, value) in enumerate(headers):
+            if name.lower() == 'vary':
+                if 'accept-encoding' not in value.lower() and value.strip() != '*':
+                    headers[index] = (name, f"{value}, Accept-Encoding")
+                return headers
+        headers.append(('Vary', 'Accept-Encoding'))
+        return headers
+
+    def _encoded_headers(self, headers, encoding):
+        result = []
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == 'content-length':
+                continue
+            if lowered == 'etag' and not value.startswith('W/'):
+                # The compressed bytes differ from the identity ones; a weak tag still revalidates
+                value = f"W/{value}"
+            result.append((name, value))
+        result.append(('Content-Encoding', encoding))
+        return result
+
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
@@ -0,0 +1,93 @@
+"""Settings from the environment, then an optional config file, then the built-in defaults.
+
+Point APP_CONFIG at a JSON file, or at a Python file whose UPPERCASE names
+are the settings:
+
+    DB_HOST = 'db.internal'
+    DB_PASSWORD = '...'
+    DB_POOL_MAX_SIZE = 20
+
+An environment variable always wins over the file, so one file can be
+shared by every host and overridden per host.
+"""
+import json
+import logging
+import os
+import runpy
+import secrets
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CONFIG_ENV = 'APP_CONFIG'
+_FALSE = ('0', 'false', 'no', 'off', '')
+
+_file_settings = None
+
+
+def load_config_file(path):
+    """Settings defined in a .json file, or the UPPERCASE names of a .py file"""
+    if path.endswith('.json'):
+        with open(path) as f:
+            settings = json.load(f)
+        if not isinstance(settings, dict):
+            raise ValueError(f"{path}: expected a JSON object of settings")
+        return settings
+    return {name: value for name, value in runpy.run_path(path).items() if name.isupper()}
+
+
+def file_settings():
+    """The settings of the file named by APP_CONFIG, read once per process"""
+    global _file_settings
+    if _file_settings is None:
+        path = os.environ.get(CONFIG_ENV)
+        _file_settings = load_config_file(path) if path else {}
+        if path:
+            logger.info(f"Loaded {len(_file_settings)} settings from {path}")
+    return _file_settings
+
+
+def setting(name, default=None, cast=None):
+    """The value of a setting, converted with `cast` unless it is the default None"""
+    value = os.environ.get(name)
+    if value is None:
+        value = file_settings().get(name, default)
+    if cast is not None and value is not None:
+        value = cast(value)
+    return value
+
+
+def flag(name, default=True):
+    """A boolean setting; 0, false, no and off (or false in JSON) turn it off"""
+    value = setting(name, default)
+    if isinstance(value, str):
+        return value.strip().lower() not in _FALSE
+    return bool(value)
+
+
+def secret_key(instance_path):
+    """SECRET_KEY from the settings, or a random key generated once and kept in the instance folder.
+
+    Every worker has to sign sessions with the same key, and a restart must
+    not log everyone out, so a key generated per process will not do.
+    """
+    key = setting('SECRET_KEY')
+    if key:
+        return key
+    path = os.path.join(instance_path, 'secret_key')
+    if not os.path.exists(path):
+        os.makedirs(instance_path, exist_ok=True)
+        partial = f"{path}.{uuid.uuid4().hex}.tmp"
+        fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+        try:
+            # link() fails if another worker got there first; everyone then reads the winner's key
+            os.link(partial, path)
+            logger.warning(f"No SECRET_KEY configured; generated one in {path}")
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(partial)
+    with open(path) as f:
+        return f.read().strip()
@@ -0,0 +1,134 @@
+"""Seeded synthetic clients and users for load testing"""
+import hashlib
+import random
+from datetime import date, datetime, time, timedelta
+
+from category_stats import reconcile_category_stats
+
+SEED_BATCH_SIZE = 5000
+SEED_COMMIT_ROWS = 50000
+# Generated users share this password so benchmarks can log in as any of them
+SEED_USER_PASSWORD = 'benchmark123'
+SEED_USER_PREFIX = 'bench_'
+
+# The ten sample categories first, so they stay the largest under the skew
+CATEGORIES = [
+    'Technology', 'Healthcare', 'Finance', 'Education', 'Immigration',
+    'Manufacturing', 'Real Estate', 'Transportation', 'Marketing', 'Consulting',
+    'Retail', 'Hospitality', 'Energy', 'Agriculture', 'Construction',
+    'Legal', 'Insurance', 'Media', 'Telecommunications', 'Logistics',
+    'Pharmaceuticals', 'Automotive', 'Aerospace', 'Biotechnology', 'Nonprofit',
+    'Government', 'Entertainment', 'Sports', 'Food & Beverage', 'Security',
+]
+
+_PREFIXES = ['Tech', 'Med', 'Fin', 'Edu', 'Data', 'Cloud', 'Smart', 'Prime', 'Global', 'United',
+             'Blue', 'Green', 'North', 'Summit', 'Apex', 'Nova', 'Urban', 'Metro', 'Pioneer', 'Vertex']
+_SUFFIXES = ['Corp', 'Solutions', 'Systems', 'Partners', 'Labs', 'Group', 'Works', 'Holdings',
+             'Networks', 'Services', 'Industries', 'Ventures', 'Associates', 'Dynamics', 'Logic']
+_STREETS = ['Main St', 'Oak Ave', 'Maple Dr', 'Cedar Ln', 'Park Blvd', 'Lake Rd', 'Hill St', 'River Way']
+_CITIES = ['Springfield', 'Riverside', 'Franklin', 'Greenville', 'Bristol', 'Clinton', 'Fairview', 'Salem']
+_NOTE_WORDS = ['renewal', 'priority', 'invoice', 'meeting', 'follow-up', 'contract', 'referral',
+               'onboarding', 'quarterly', 'review', 'escalation', 'discount', 'pilot', 'expansion']
+
+
+def category_weights(categories, skew):
+    """Zipf weights: the category at rank r gets 1 / r**skew; skew 0 is uniform"""
+    return [1 / (rank ** skew) for rank in range(1, len(categories) + 1)]
+
+
+def generate_clients(rng, count, categories=CATEGORIES, skew=1.1, days=730, now=None):
+    """Yield (name, category, email, phone, address, notes, created_at) tuples.
+
+    created_at falls within `days` before `now`, which defaults to midnight
+    today so that a given seed produces identical rows all day.
+    """
+    now = now or datetime.combine(date.today(), time())
+    weights = category_weights(categories, skew)
+    # Draw categories in blocks; rng.choices is much faster per item than one call per row
+    block = []
+    for i in range(count):
+        if not block:
+            block = rng.choices(categories, weights, k=min(10000, count - i))
+            block.reverse()
+        category = block.pop()
+        name = f"{rng.choice(_PREFIXES)}{rng.choice(_SUFFIXES)} {i + 1}"
+        slug = name.lower().replace(' ', '')
+        email = f"contact@{slug}.example.com" if rng.random() < 0.9 else None
+        phone = f"555-{rng.randint(0, 999):03d}-{rng.randint(0, 9999):04d}" if rng.random() < 0.8 else None
+        address = (f"{rng.randint(1, 9999)} {rng.choice(_STREETS)}, {rng.choice(_CITIES)}"
+                   if rng.random() < 0.7 else None)
+        notes = ' '.join(rng.choices(_NOTE_WORDS, k=rng.randint(1, 6))) if rng.random() < 0.5 else None
+        # Newer clients are more common, as in a growing business
+        age = timedelta(seconds=int(days * 86400 * rng.random() ** 2))
+        yield (name, category, email, phone, address, notes, now - age)
+
+
+def generate_users(rng, count):
+    """Yield (username, password_hash, email, full_name, role) tuples"""
+    password_hash = hashlib.sha256(SEED_USER_PASSWORD.encode()).hexdigest()
+    for i in range(1, count + 1):
+        username = f"{SEED_USER_PREFIX}{i:06d}"
+        role = rng.choices(['user', 'manager', 'admin'], [90, 9, 1])[0]
+        yield (username, password_hash, f"{username}@example.com", f"Benchmark User {i}", role)
+
+
+def _insert_batches(db, sql, rows, batch_size, commit_rows, progress=None, label=''):
+    cursor = db.cursor()
+    inserted = 0
+    uncommitted = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) < batch_size:
+                continue
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+            uncommitted += len(batch)
+            batch = []
+            if uncommitted >= commit_rows:
+                db.commit()
+                uncommitted = 0
+                if progress:
+                    progress(label, inserted)
+        if batch:
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+        db.commit()
+        if progress:
+            progress(label, inserted)
+    finally:
+        cursor.close()
+    return inserted
+
+
+def seed_database(db, clients=10000, users=0, seed=42, skew=1.1, replace=False,
+                  batch_size=SEED_BATCH_SIZE, commit_rows=SEED_COMMIT_ROWS, progress=None):
+    """Insert generated clients and users; the same seed always produces the same rows.
+
+    With replace=True every client and previously generated user is removed
+    first. category_stats is rebuilt at the end rather than maintained per
+    batch, which keeps multi-million-row loads fast.
+    """
+    rng = random.Random(seed)
+    cursor = db.cursor()
+    if replace:
+        cursor.execute("DELETE FROM users WHERE username LIKE %s", (SEED_USER_PREFIX.replace('_', '\\_') + '%',))
+        cursor.execute("TRUNCATE TABLE clients")
+        cursor.execute("TRUNCATE TABLE category_stats")
+        db.commit()
+    cursor.close()
+
+    inserted_clients = _insert_batches(db, """
+        INSERT INTO clients (name, category, email, phone, address, notes, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, generate_clients(rng, clients, skew=skew), batch_size, commit_rows, progress, 'clients')
+
+    inserted_users = _insert_batches(db, """
+        INSERT IGNORE INTO users (username, password_hash, email, full_name, role)
+        VALUES (%s, %s, %s, %s, %s)
+    """, generate_users(rng, users), batch_size, commit_rows, progress, 'users')
+
+    reconcile_category_stats(db)
+    return {'clients': inserted_clients, 'users': inserted_users}
+
@@ -0,0 +1,258 @@
+"""Thread-safe MySQL connection pool"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the timeout"""
+
+
+class PooledConnection:
+    """A connection owned by the pool plus the bookkeeping needed to reuse it"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Hands out one connection per caller and takes it back when they are done.
+
+    min_size     connections kept open even when idle
+    max_size     hard cap on open connections; callers wait beyond this
+    timeout      seconds a caller waits for a free connection before PoolTimeout
+    recycle      connections older than this many seconds are reopened
+    idle_check   connections idle for longer than this are pinged before reuse
+    max_idle     idle connections above min_size are closed after this many seconds
+    on_checkout  optional callback receiving the seconds each checkout waited
+    """
+
+    def __init__(self, factory, min_size=2, max_size=10, timeout=10.0,
+                 recycle=3600, idle_check=30, max_idle=300, on_checkout=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool needs 0 <= min_size <= max_size and max_size >= 1")
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_check = idle_check
+        self.max_idle = max_idle
+        self.on_checkout = on_checkout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # oldest on the left, most recently returned on the right
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._inherited = []
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._health_checks = 0
+        self._health_failures = 0
+
+    def _open(self):
+        connection = self._factory()
+        with self._cond:
+            self._created += 1
+        return PooledConnection(connection)
+
+    def _discard(self, pooled):
+        try:
+            pooled.connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+    def warm(self):
+        """Open connections until min_size are available"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def acquire(self, timeout=None):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._cond:
+            pooled = None
+            while True:
+                if self._idle:
+                    # Reuse the most recently returned connection; it is the least likely to be stale
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {timeout}s "
+                                      f"({self._in_use} in use, max {self.max_size})")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if pooled is None:
+                pooled = self._open()
+            else:
+                pooled = self._validate(pooled)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        if self.on_checkout:
+            self.on_checkout(waited)
+        return pooled
+
+    def _validate(self, pooled):
+        """Recycle old connections and ping ones that have sat idle; fresh ones are used as-is"""
+        now = time.monotonic()
+        if self.recycle and now - pooled.created_at > self.recycle:
+            self._discard(pooled)
+            with self._cond:
+                self._recycled += 1
+            return self._open()
+
+        if now - pooled.last_used > self.idle_check:
+            with self._cond:
+                self._health_checks += 1
+            try:
+                pooled.connection.ping(reconnect=False)
+            except Exception as e:
+                logger.warning(f"Pooled connection failed health check, reconnecting: {e}")
+                with self._cond:
+                    self._health_failures += 1
+                self._discard(pooled)
+                return self._open()
+        return pooled
+
+    def release(self, pooled, discard=False):
+        """Return a connection to the pool, rolling back anything left uncommitted.
+
+        With discard=True the connection is closed instead, e.g. when it was
+        abandoned halfway through reading an unbuffered result.
+        """
+        healthy = not discard
+        try:
+            if healthy and pooled.connection.in_transaction:
+                pooled.connection.rollback()
+        except Exception as e:
+            logger.warning(f"Dropping pooled connection that failed on release: {e}")
+            healthy = False
+
+        expired = []
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                # Shrink back towards min_size, starting with the connections idle the longest
+                cutoff = pooled.last_used - self.max_idle
+                while (self._idle and self._size > self.min_size
+                       and self._idle[0].last_used < cutoff):
+                    expired.append(self._idle.popleft())
+                    self._size -= 1
+            else:
+                self._size -= 1
+            self._cond.notify()
+
+        if not healthy:
+            self._discard(pooled)
+        for stale in expired:
+            self._discard(stale)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager yielding a raw connection that is returned on exit.
+
+        If the block is interrupted (an error, or a streaming generator closed
+        early) the connection may have unread results, so it is discarded.
+        """
+        pooled = self.acquire(timeout)
+        try:
+            yield pooled.connection
+        except BaseException:
+            self.release(pooled, discard=True)
+            raise
+        self.release(pooled)
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones come back through release() as usual"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for pooled in idle:
+            self._discard(pooled)
+
+    def reset_after_fork(self):
+        """Forget the connections inherited from the parent process; call in a freshly forked child.
+
+        Their sockets are shared with the parent, so the child must neither
+        use them nor close them: closing would end the parent's sessions.
+        They are kept referenced so garbage collection cannot close them
+        either, and the child opens its own on first use.
+        """
+        self._inherited.extend(self._idle)
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'avg_checkout_ms': round(self._wait_total / checkouts * 1000, 3) if checkouts else 0,
+                'max_checkout_ms': round(self._wait_max * 1000, 3),
+                'connections_created': self._created,
+                'connections_recycled': self._recycled,
+                'health_checks': self._health_checks,
+                'health_check_failures': self._health_failures,
+            }
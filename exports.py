@@ -0,0 +1,192 @@
+"""Streaming exports of the clients table"""
+import csv
+import io
+import json
+import logging
+import zlib
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+# Exportable client columns: request name -> CSV header
+CLIENT_EXPORT_COLUMNS = {
+    'id': 'ID',
+    'name': 'Client Name',
+    'category': 'Category',
+    'email': 'Email',
+    'phone': 'Phone',
+    'address': 'Address',
+    'notes': 'Notes',
+    'created_at': 'Created At',
+    'updated_at': 'Updated At',
+}
+DEFAULT_EXPORT_COLUMNS = ['id', 'name', 'category']
+EXPORT_CHUNK_SIZE = 1000
+CLIENT_BATCH_CHUNK_SIZE = 500
+
+
+def parse_export_columns(raw):
+    """Turn a comma-separated ?columns= value into a validated column list"""
+    if not raw:
+        return list(DEFAULT_EXPORT_COLUMNS)
+    columns = []
+    for column in raw.split(','):
+        column = column.strip().lower()
+        if not column:
+            continue
+        if column not in CLIENT_EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export column: {column}")
+        if column not in columns:
+            columns.append(column)
+    if not columns:
+        raise ValueError("No export columns selected")
+    return columns
+
+
+def iter_row_chunks(pool, sql, params=(), chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of rows read incrementally from an unbuffered cursor.
+
+    The rows stay on the server until fetched, so memory is bounded by
+    chunk_size no matter how large the result is. A dedicated connection is
+    used because a streamed response outlives the request that started it.
+    """
+    with pool.connection() as db:
+        cursor = db.cursor(buffered=False)
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+
+
+def client_export_query(columns):
+    return f"SELECT {', '.join(columns)} FROM clients ORDER BY id"
+
+
+def iter_clients_by_id(pool, ids, columns, chunk_size=CLIENT_BATCH_CHUNK_SIZE):
+    """Yield (rows, missing_ids) per chunk of ids, with rows in the order the ids were given.
+
+    columns must start with 'id'. Each chunk is one `WHERE id IN (...)` lookup
+    on the primary key, so the placeholder list stays bounded however many
+    ids are asked for; all chunks share one dedicated connection.
+    """
+    select = ', '.join(columns)
+    with pool.connection() as db:
+        cursor = db.cursor()
+        try:
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"SELECT {select} FROM clients WHERE id IN ({placeholders})", tuple(chunk))
+                found = {row[0]: row for row in cursor.fetchall()}
+                yield [found[i] for i in chunk if i in found], [i for i in chunk if i not in found]
+        finally:
+            cursor.close()
+
+
+def counted(chunks, label):
+    """Pass chunks through, logging how many rows were exported or where it failed"""
+    count = 0
+    try:
+        for rows in chunks:
+            count += len(rows)
+            yield rows
+    except Exception as e:
+        logger.error(f"{label} failed after {count} records: {e}")
+        raise
+    logger.info(f"{label} completed with {count} records")
+
+
+def csv_stream(chunks, headers, label='CSV export'):
+    """Encode row chunks as CSV, yielding one block of bytes per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    # Send the header straight away so the download starts before the query finishes
+    yield buffer.getvalue().encode('utf-8')
+
+    for rows in counted(chunks, label):
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _json_encoder(indent=None):
+    if indent:
+        return json.JSONEncoder(indent=indent, default=_json_default, ensure_ascii=False).encode
+    return json.JSONEncoder(separators=(',', ':'), default=_json_default, ensure_ascii=False).encode
+
+
+def ndjson_stream(chunks, columns, label='NDJSON export'):
+    """One compact JSON object per client per line"""
+    encode = _json_encoder()
+    for rows in counted(chunks, label):
+        yield ''.join(encode(dict(zip(columns, row))) + '\n' for row in rows).encode('utf-8')
+
+
+def json_stream(chunks, columns, envelope=True, indent=None, label='JSON export'):
+    """A JSON document written incrementally, one chunk of clients at a time.
+
+    With envelope=True the output keeps the original export shape
+    {"export_date", "clients", "total_clients"}; the total is written last
+    because it is only known once every row has been sent. Otherwise the
+    output is a bare array of clients.
+    """
+    encode = _json_encoder(indent)
+    separator = ',\n' if indent else ','
+    if envelope:
+        yield f'{{"export_date":{encode(datetime.now().isoformat())},"clients":['.encode('utf-8')
+    else:
+        yield b'['
+
+    count = 0
+    for rows in counted(chunks, label):
+        items = separator.join(encode(dict(zip(columns, row))) for row in rows)
+        yield ((separator if count else '') + items).encode('utf-8')
+        count += len(rows)
+
+    yield (f'],"total_clients":{count}}}' if envelope else ']').encode('utf-8')
+
+
+def client_batch_stream(chunks, columns, label='Client batch'):
+    """{"clients": [...], "missing": [...], "count": n} written one chunk of (rows, missing ids) at a time"""
+    encode = _json_encoder()
+    yield b'{"clients":['
+    count = 0
+    missing = []
+    try:
+        for rows, absent in chunks:
+            if rows:
+                items = ','.join(encode(dict(zip(columns, row))) for row in rows)
+                yield ((',' if count else '') + items).encode('utf-8')
+            count += len(rows)
+            missing.extend(absent)
+    except Exception as e:
+        logger.error(f"{label} failed after {count} records: {e}")
+        raise
+    yield f'],"missing":{encode(missing)},"count":{count}}}'.encode('utf-8')
+
+
+def gzip_stream(blocks, level=6):
+    """Gzip a stream of byte blocks without buffering the whole output"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    first = True
+    for block in blocks:
+        data = compressor.compress(block)
+        if first:
+            # Flush the first block so the download starts immediately
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
@@ -0,0 +1,51 @@
+"""gunicorn settings for serving the app in production:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each setting can be overridden with the GUNICORN_* variable next to it.
+Size the database side with them: every worker has its own connection
+pool, so up to workers x DB_POOL_MAX_SIZE connections can be open, which
+has to stay below MySQL's max_connections (151 by default).
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Threads rather than more processes: requests spend most of their time waiting on MySQL
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', min(multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Every open live dashboard holds a thread for its event stream. The app caps streams at a share of
+# this many threads per worker and makes the other pages poll, so streams cannot take every thread.
+os.environ.setdefault('SERVER_THREADS', str(threads))
+
+# Create the app and build the assets once in the master; workers fork from it and share its memory.
+# Creating it opens no connections, and each worker drops anything inherited (see server.reset_after_fork).
+# A preloaded app is not reloaded on HUP; restart the master to deploy new code.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+# Seconds a worker may go without reporting to the master; gthread workers report between requests,
+# so long exports and event streams are not cut off by it
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Replace workers now and then so caches and fragmentation cannot grow without bound;
+# the jitter keeps them from restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+# The heartbeat file is touched constantly; keep it off a disk that might stall
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """Open this worker's own pool connections and record how long it took to become ready"""
+    from server import init_worker
+    init_worker(worker.wsgi)
@@ -0,0 +1,182 @@
+"""Streaming, batched CSV import of clients"""
+import csv
+import io
+from collections import Counter
+
+from category_stats import apply_category_deltas
+
+IMPORT_COLUMNS = ['name', 'category', 'email', 'phone', 'address', 'notes']
+IMPORT_BATCH_SIZE = 1000
+IMPORT_COMMIT_ROWS = 10000
+IMPORT_MAX_ERRORS = 100
+
+# Maximum lengths of the clients columns; TEXT columns are not checked
+_COLUMN_LIMITS = {'name': 255, 'category': 255, 'email': 255, 'phone': 50}
+
+_INSERT_CLIENTS = """
+    INSERT INTO clients (name, category, email, phone, address, notes)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+class ImportResult:
+    """Counts and per-row errors of one import run"""
+
+    def __init__(self, max_errors=IMPORT_MAX_ERRORS):
+        self.processed = 0
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.categories = Counter()
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'errors_truncated': self.skipped > len(self.errors),
+        }
+
+
+def _column_positions(header):
+    """Map the header row onto IMPORT_COLUMNS, falling back to the documented column order"""
+    names = [h.strip().lower().replace('client name', 'name') for h in header]
+    if 'name' in names and 'category' in names:
+        return [names.index(column) if column in names else None for column in IMPORT_COLUMNS]
+    return list(range(len(IMPORT_COLUMNS)))
+
+
+def iter_valid_rows(stream, result):
+    """Yield validated (name, category, email, phone, address, notes) tuples from a CSV upload.
+
+    Invalid rows are recorded on `result` and skipped; the first row is the header.
+    Malformed quoting is an invalid row too, rather than a quoted field that
+    silently runs on to the end of the file.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''), strict=True)
+    header = next(reader, None)
+    if header is None:
+        return
+    positions = _column_positions(header)
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            result.add_error(reader.line_num, f"Malformed CSV row: {e}")
+            continue
+        if not any(field.strip() for field in row):
+            continue
+        values = [row[pos].strip() if pos is not None and pos < len(row) else '' for pos in positions]
+        record = dict(zip(IMPORT_COLUMNS, values))
+        if not record['name'] or not record['category']:
+            result.add_error(reader.line_num, 'Name and category are required')
+            continue
+        too_long = [column for column, limit in _COLUMN_LIMITS.items() if len(record[column]) > limit]
+        if too_long:
+            result.add_error(reader.line_num, f"Value too long for {', '.join(too_long)}")
+            continue
+        yield tuple(values)
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_clients_csv(db, stream, batch_size=IMPORT_BATCH_SIZE, commit_rows=IMPORT_COMMIT_ROWS,
+                       max_errors=IMPORT_MAX_ERRORS, progress=None):
+    """Insert clients with executemany in batches, committing every commit_rows rows.
+
+    category_stats is updated in the same transaction as each committed chunk,
+    so a failure part-way leaves the rows imported so far consistently counted.
+    """
+    result = ImportResult(max_errors)
+    cursor = db.cursor()
+    pending = Counter()
+    uncommitted = 0
+    try:
+        for batch in _batches(iter_valid_rows(stream, result), batch_size):
+            cursor.executemany(_INSERT_CLIENTS, batch)
+            pending.update(row[1] for row in batch)
+            uncommitted += len(batch)
+            result.processed += len(batch)
+            if uncommitted >= commit_rows:
+                apply_category_deltas(cursor, pending)
+                db.commit()
+                result.imported += uncommitted
+                result.categories.update(pending)
+                pending.clear()
+                uncommitted = 0
+            if progress:
+                progress(result)
+        if uncommitted:
+            apply_category_deltas(cursor, pending)
+            db.commit()
+            result.imported += uncommitted
+            result.categories.update(pending)
+    finally:
+        cursor.close()
+    return result
+
+
+def import_clients_csv_staged(db, stream, batch_size=IMPORT_BATCH_SIZE, max_errors=IMPORT_MAX_ERRORS,
+                              progress=None):
+    """Load the upload into a temporary staging table, then move it into clients in one statement.
+
+    The staging table has no indexes or triggers, so loading it is cheap;
+    the final INSERT ... SELECT and the category_stats update run in a
+    single transaction, making the whole import all-or-nothing.
+    """
+    result = ImportResult(max_errors)
+    cursor = db.cursor()
+    try:
+        cursor.execute("""
+            CREATE TEMPORARY TABLE clients_import_staging (
+                name VARCHAR(255), category VARCHAR(255), email VARCHAR(255),
+                phone VARCHAR(50), address TEXT, notes TEXT
+            )
+        """)
+        for batch in _batches(iter_valid_rows(stream, result), batch_size):
+            cursor.executemany("""
+                INSERT INTO clients_import_staging (name, category, email, phone, address, notes)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, batch)
+            result.processed += len(batch)
+            if progress:
+                progress(result)
+
+        cursor.execute("""
+            INSERT INTO clients (name, category, email, phone, address, notes)
+            SELECT name, category, email, phone, address, notes FROM clients_import_staging
+        """)
+        cursor.execute("SELECT category, COUNT(*) FROM clients_import_staging GROUP BY category")
+        categories = Counter(dict(cursor.fetchall()))
+        apply_category_deltas(cursor, categories)
+        db.commit()
+        result.imported = result.processed
+        result.categories = categories
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        try:
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS clients_import_staging")
+        finally:
+            cursor.close()
+    return result
@@ -0,0 +1,291 @@
+"""Background jobs for long-running operations (imports, exports, backups, optimize)"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the "still working on it" updates a process writes for its unfinished jobs
+JOB_HEARTBEAT_INTERVAL = 30
+# Unfinished jobs without a heartbeat for this many intervals belong to a process that is gone
+JOB_MISSED_HEARTBEATS = 3
+
+
+class JobRejected(Exception):
+    """Raised when a job cannot be queued right now (its type's queue is full)"""
+
+
+class UnknownJobType(JobRejected):
+    """Raised when no handler is registered for the requested job type"""
+
+
+class JobContext:
+    """Handed to a job function: its parameters, a place for its output and a progress hook"""
+
+    def __init__(self, runner, job_id, job_type, params):
+        self.runner = runner
+        self.id = job_id
+        self.type = job_type
+        self.params = params
+        self.result_path = None
+        self.result_name = None
+        self.result_mimetype = None
+        self.processed = 0
+        self._last_progress_write = 0.0
+
+    def result_file(self, name, mimetype):
+        """Path the job should write its downloadable output to"""
+        self.result_name = name
+        self.result_mimetype = mimetype
+        self.result_path = os.path.join(self.runner.result_dir, f"{self.id}_{name}")
+        return self.result_path
+
+    def progress(self, processed, message=None, force=False):
+        """Record rows processed so far; database writes are throttled to one per interval"""
+        self.processed = processed
+        now = time.monotonic()
+        if not force and now - self._last_progress_write < self.runner.progress_interval:
+            return
+        self._last_progress_write = now
+        self.runner._update(self.id, progress=processed, message=message)
+
+    def track(self, chunks):
+        """Pass row chunks through while reporting how many have gone by"""
+        processed = 0
+        for rows in chunks:
+            processed += len(rows)
+            self.progress(processed)
+            yield rows
+
+
+class JobRunner:
+    """A local worker pool whose job state lives in the `jobs` table.
+
+    Each job type has its own concurrency limit and queue length, so a burst
+    of heavy exports cannot occupy every worker or grow without bound.
+
+    Jobs run in the process that accepted them. While it has unfinished jobs,
+    that process stamps their heartbeat_at every `heartbeat_interval` seconds,
+    so recover_interrupted() can tell the jobs of a process that stopped
+    (a restart, a recycled worker, a crash) from those still in progress.
+    """
+
+    def __init__(self, pool, result_dir, max_workers=4, limits=None, max_queued=20,
+                 progress_interval=1.0, retention=24 * 3600, heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+        self.pool = pool
+        self.result_dir = result_dir
+        self.max_workers = max_workers
+        self.limits = dict(limits or {})
+        self.max_queued = max_queued
+        self.progress_interval = progress_interval
+        self.retention = retention
+        self.heartbeat_interval = heartbeat_interval
+
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._pending = defaultdict(deque)
+        self._running = defaultdict(int)
+        self._active = set()
+        self._executor = None
+        self._heartbeat = None
+
+    def register(self, job_type, handler, limit=1):
+        """handler(ctx) does the work and returns a JSON-serialisable summary"""
+        self._handlers[job_type] = handler
+        self.limits.setdefault(job_type, limit)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        return self._executor
+
+    def reset_after_fork(self):
+        """In a freshly forked child, leave the parent's executor and queued jobs to the parent"""
+        self._lock = threading.Lock()
+        self._pending = defaultdict(deque)
+        self._running = defaultdict(int)
+        self._active = set()
+        self._executor = None
+        self._heartbeat = None
+
+    def submit(self, job_type, params=None, created_by=None):
+        """Record the job as queued and hand it to a worker when its type has a free slot"""
+        if job_type not in self._handlers:
+            raise UnknownJobType(f"Unknown job type: {job_type}")
+        with self._lock:
+            if len(self._pending[job_type]) >= self.max_queued:
+                raise JobRejected(f"Too many queued {job_type} jobs, try again later")
+
+        params = params or {}
+        job_id = uuid.uuid4().hex
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("""
+                INSERT INTO jobs (id, job_type, status, params, created_by, heartbeat_at)
+                VALUES (%s, %s, 'queued', %s, %s, CURRENT_TIMESTAMP)
+            """, (job_id, job_type, json.dumps(params), created_by))
+            db.commit()
+            cursor.close()
+
+        with self._lock:
+            self._pending[job_type].append(JobContext(self, job_id, job_type, params))
+            self._active.add(job_id)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+            self._dispatch()
+        logger.info(f"Job {job_id} ({job_type}) queued by {created_by}")
+        return job_id
+
+    def _dispatch(self):
+        """Start queued jobs whose type is under its concurrency limit; caller holds the lock"""
+        for job_type, queue in self._pending.items():
+            while queue and self._running[job_type] < self.limits.get(job_type, 1):
+                ctx = queue.popleft()
+                self._running[job_type] += 1
+                self._get_executor().submit(self._run, ctx)
+
+    def _run(self, ctx):
+        try:
+            self._update(ctx.id, status='running', started=True)
+            os.makedirs(self.result_dir, exist_ok=True)
+            summary = self._handlers[ctx.type](ctx)
+            self._update(ctx.id, status='succeeded', finished=True, result=summary, progress=ctx.processed,
+                         result_path=ctx.result_path, result_name=ctx.result_name,
+                         result_mimetype=ctx.result_mimetype)
+            logger.info(f"Job {ctx.id} ({ctx.type}) succeeded")
+        except Exception as e:
+            logger.error(f"Job {ctx.id} ({ctx.type}) failed: {e}")
+            if ctx.result_path and os.path.exists(ctx.result_path):
+                os.remove(ctx.result_path)
+            try:
+                self._update(ctx.id, status='failed', finished=True, error=str(e))
+            except Exception as update_error:
+                logger.error(f"Could not record failure of job {ctx.id}: {update_error}")
+        finally:
+            with self._lock:
+                self._running[ctx.type] -= 1
+                self._active.discard(ctx.id)
+                self._dispatch()
+
+    def _beat(self):
+        """Stamp this process's unfinished jobs until it has none left"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._active)
+                if not job_ids:
+                    self._heartbeat = None
+                    return
+            try:
+                with self.pool.connection() as db:
+                    cursor = db.cursor()
+                    placeholders = ','.join(['%s'] * len(job_ids))
+                    cursor.execute(f"UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders})",
+                                   tuple(job_ids))
+                    db.commit()
+                    cursor.close()
+            except Exception as e:
+                logger.warning(f"Could not record the heartbeat of {len(job_ids)} jobs: {e}")
+
+    def recover_interrupted(self, db):
+        """Mark queued and running jobs whose process stopped as failed; returns how many there were.
+
+        A job left unfinished by a restart would otherwise show as in
+        progress forever. Only jobs that missed several heartbeats count,
+        so jobs running in other live processes are left alone.
+        """
+        cursor = db.cursor()
+        cursor.execute("""
+            UPDATE jobs
+            SET status = 'failed', finished_at = CURRENT_TIMESTAMP,
+                error = 'Interrupted: the server process running this job stopped'
+            WHERE status IN ('queued', 'running')
+              AND COALESCE(heartbeat_at, started_at, created_at) < NOW() - INTERVAL %s SECOND
+        """, (int(self.heartbeat_interval * JOB_MISSED_HEARTBEATS),))
+        recovered = cursor.rowcount
+        db.commit()
+        cursor.close()
+        if recovered:
+            logger.warning(f"Marked {recovered} interrupted jobs as failed")
+        return recovered
+
+    def _update(self, job_id, status=None, progress=None, message=None, result=None, error=None,
+                result_path=None, result_name=None, result_mimetype=None, started=False, finished=False):
+        assignments = []
+        params = []
+        for column, value in (('status', status), ('progress', progress), ('message', message),
+                              ('error', error), ('result_path', result_path),
+                              ('result_name', result_name), ('result_mimetype', result_mimetype)):
+            if value is not None:
+                assignments.append(f"{column} = %s")
+                params.append(value)
+        if result is not None:
+            assignments.append("result = %s")
+            params.append(json.dumps(result))
+        if started:
+            assignments.append("started_at = CURRENT_TIMESTAMP")
+        if finished:
+            assignments.append("finished_at = CURRENT_TIMESTAMP")
+        if not assignments:
+            return
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = %s", tuple(params) + (job_id,))
+            db.commit()
+            cursor.close()
+
+    def get(self, db, job_id):
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT id, job_type, status, progress, message, result, error, result_path, result_name,
+                   result_mimetype, created_by, created_at, started_at, finished_at
+            FROM jobs WHERE id = %s
+        """, (job_id,))
+        job = cursor.fetchone()
+        cursor.close()
+        return job
+
+    def recent(self, db, created_by=None, limit=50):
+        cursor = db.cursor(dictionary=True)
+        where = "WHERE created_by = %s" if created_by else ""
+        params = (created_by, limit) if created_by else (limit,)
+        cursor.execute(f"""
+            SELECT id, job_type, status, progress, message, error, created_by, created_at, started_at, finished_at
+            FROM jobs {where} ORDER BY created_at DESC LIMIT %s
+        """, params)
+        jobs = cursor.fetchall()
+        cursor.close()
+        return jobs
+
+    def prune(self, db):
+        """Delete finished jobs, and their result files, older than the retention period"""
+        cursor = db.cursor()
+        cursor.execute("""
+            SELECT id, result_path FROM jobs
+            WHERE finished_at IS NOT NULL AND finished_at < NOW() - INTERVAL %s SECOND
+        """, (int(self.retention),))
+        expired = cursor.fetchall()
+        for job_id, result_path in expired:
+            if result_path and os.path.exists(result_path):
+                os.remove(result_path)
+        if expired:
+            placeholders = ','.join(['%s'] * len(expired))
+            cursor.execute(f"DELETE FROM jobs WHERE id IN ({placeholders})", tuple(row[0] for row in expired))
+            db.commit()
+        cursor.close()
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'limits': dict(self.limits),
+                'running': {t: n for t, n in self._running.items() if n},
+                'queued': {t: len(q) for t, q in self._pending.items() if q},
+            }
@@ -0,0 +1,265 @@
+"""Shared change feed that pushes dashboard deltas to Server-Sent Events subscribers"""
+import json
+import logging
+import queue
+import threading
+import time
+
+from category_stats import read_category_stats, read_uncategorized_count
+
+logger = logging.getLogger(__name__)
+
+LIVE_POLL_INTERVAL = 15.0
+LIVE_MIN_INTERVAL = 0.5
+LIVE_HEARTBEAT = 20.0
+# Each stream holds a server thread while it is open, so the limit must stay well below the thread count
+LIVE_MAX_SUBSCRIBERS = 4
+# Streams are closed after this many seconds; the browser reconnects, or polls if the feed is full by then
+LIVE_MAX_STREAM_SECONDS = 300.0
+LIVE_QUEUE_SIZE = 50
+LIVE_RECENT_LIMIT = 10
+
+
+class FeedFull(Exception):
+    """Raised when the feed already has its maximum number of subscribers"""
+
+
+def load_snapshot(db, recent_limit=LIVE_RECENT_LIMIT):
+    """Category counts and the newest clients, the state the live dashboard shows"""
+    cursor = db.cursor()
+    try:
+        categories = [(row[0], row[1]) for row in read_category_stats(cursor)]
+        uncategorized = read_uncategorized_count(cursor)
+        cursor.execute("SELECT id, name, category FROM clients ORDER BY id DESC LIMIT %s", (recent_limit,))
+        recent = [{'id': row[0], 'name': row[1], 'category': row[2]} for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        db.rollback()
+    return {'categories': categories, 'uncategorized': uncategorized, 'recent_clients': recent}
+
+
+def snapshot_totals(snapshot):
+    counts = [count for _, count in snapshot['categories']]
+    # Clients without a category count towards the total, as on the dashboard page
+    total = sum(counts) + snapshot.get('uncategorized', 0)
+    return {
+        'total_clients': total,
+        'total_categories': len(counts),
+        'largest_category': max(counts) if counts else 0,
+        'avg_clients_per_category': round(total / len(counts), 1) if counts else 0,
+    }
+
+
+def snapshot_delta(old, new):
+    """What changed between two snapshots, or None when nothing did"""
+    old_counts = dict(old['categories'])
+    new_counts = dict(new['categories'])
+    changed = {name: count for name, count in new['categories'] if old_counts.get(name) != count}
+    removed = [name for name in old_counts if name not in new_counts]
+    seen = {client['id'] for client in old['recent_clients']}
+    added = [client for client in new['recent_clients'] if client['id'] not in seen]
+    # New clients push older ones off the end; anything else (a delete, a rename) resends the list
+    shifted = (added + old['recent_clients'])[:len(new['recent_clients'])]
+    recent_replaced = shifted != new['recent_clients']
+    uncategorized_changed = old.get('uncategorized', 0) != new.get('uncategorized', 0)
+    if not changed and not removed and not added and not recent_replaced and not uncategorized_changed:
+        return None
+    delta = {'categories': changed, 'removed_categories': removed}
+    if recent_replaced:
+        delta['recent_clients'] = new['recent_clients']
+    else:
+        delta['new_clients'] = added
+    delta.update(snapshot_totals(new))
+    return delta
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class ChangeFeed:
+    """Loads the dashboard state once per change and fans the delta out to every subscriber.
+
+    Writers call notify() after committing. A single background thread then
+    reloads the snapshot through `load` (which receives a connection from
+    `pool`), diffs it with the previous one and queues the delta for each
+    subscriber, so N open dashboards cost one query per change rather than N.
+    Notifications arriving closer together than `min_interval` are coalesced.
+    Writes from other processes are picked up by polling every
+    `poll_interval` seconds, but only while someone is subscribed.
+
+    Pages that could not subscribe poll current() instead, which shares one
+    load between all of them until the next change or `poll_interval`.
+    """
+
+    def __init__(self, pool, load=load_snapshot, poll_interval=LIVE_POLL_INTERVAL,
+                 min_interval=LIVE_MIN_INTERVAL, max_subscribers=LIVE_MAX_SUBSCRIBERS,
+                 queue_size=LIVE_QUEUE_SIZE):
+        self.pool = pool
+        self.load = load
+        self.poll_interval = poll_interval
+        self.min_interval = min_interval
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._subscribers = set()
+        self._snapshot = None
+        self._sequence = 0
+        self._worker = None
+        self._version = 0
+        self._current = None
+        self._current_lock = threading.Lock()
+        self._published = 0
+        self._refreshes = 0
+        self._dropped = 0
+
+    def notify(self):
+        """Signal that clients or categories changed; cheap enough to call after every write"""
+        self._version += 1
+        self._changed.set()
+
+    def current(self):
+        """Snapshot data for pages that poll, reloaded after a change or once `poll_interval` has passed"""
+        with self._current_lock:
+            cached = self._current
+            if (cached is None or cached[0] != self._version
+                    or time.monotonic() - cached[1] > self.poll_interval):
+                version = self._version
+                with self.pool.connection() as db:
+                    snapshot = self.load(db)
+                cached = self._current = (version, time.monotonic(), self._snapshot_data(snapshot))
+        return cached[2]
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='live-change-feed', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            self._changed.wait(self.poll_interval)
+            self._changed.clear()
+            with self._lock:
+                idle = not self._subscribers
+            if idle:
+                continue
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.warning(f"Live feed refresh failed: {e}")
+            time.sleep(self.min_interval)
+
+    def _refresh(self):
+        with self.pool.connection() as db:
+            snapshot = self.load(db)
+        self._refreshes += 1
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = snapshot
+            if previous is None:
+                self._sequence += 1
+                message = format_event('snapshot', self._snapshot_data(snapshot), self._sequence)
+            else:
+                delta = snapshot_delta(previous, snapshot)
+                if delta is None:
+                    return
+                self._sequence += 1
+                message = format_event('delta', delta, self._sequence)
+            self._published += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self._deliver(subscriber, message)
+
+    def _snapshot_data(self, snapshot):
+        data = {'categories': dict(snapshot['categories']), 'recent_clients': snapshot['recent_clients']}
+        data.update(snapshot_totals(snapshot))
+        return data
+
+    def _deliver(self, subscriber, message):
+        try:
+            subscriber.put_nowait(message)
+        except queue.Full:
+            # A subscriber this far behind is cut off; its browser reconnects and gets a fresh snapshot
+            self._dropped += 1
+            self.unsubscribe(subscriber)
+            try:
+                subscriber.get_nowait()
+                subscriber.put_nowait(None)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def subscribe(self):
+        """Register a subscriber; returns its queue, primed with the current snapshot when there is one"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise FeedFull(f"Live updates are limited to {self.max_subscribers} connections")
+            self._subscribers.add(subscriber)
+            if self._snapshot is not None:
+                subscriber.put_nowait(format_event('snapshot', self._snapshot_data(self._snapshot),
+                                                   self._sequence))
+        self._ensure_worker()
+        # The kept snapshot may be stale if nobody was listening; refresh so the delta catches up
+        self.notify()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def reset_after_fork(self):
+        """Start over in a freshly forked child: the parent's worker thread and subscribers stay behind"""
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._subscribers = set()
+        self._snapshot = None
+        self._worker = None
+        self._current = None
+        self._current_lock = threading.Lock()
+
+    def stream(self, subscriber, heartbeat=LIVE_HEARTBEAT, lifetime=LIVE_MAX_STREAM_SECONDS):
+        """Yield SSE messages for one subscriber until it is cut off, the client goes away or `lifetime` ends.
+
+        Ending long streams hands their thread back; the browser reconnects
+        after the retry delay and starts again from a snapshot.
+        """
+        closes_at = time.monotonic() + lifetime
+        try:
+            # Browsers wait this long before reconnecting after the stream drops
+            yield b"retry: 5000\n\n"
+            while True:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    message = subscriber.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    if time.monotonic() >= closes_at:
+                        return
+                    # A comment line keeps proxies from closing an idle connection
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'published': self._published,
+                'refreshes': self._refreshes,
+                'dropped_subscribers': self._dropped,
+                'sequence': self._sequence,
+            }
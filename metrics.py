@@ -0,0 +1,253 @@
+"""In-process latency metrics rendered in the Prometheus text format"""
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds; fine-grained at the low end where most queries and renders land
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def process_age():
+    """Seconds since this process was started (or forked), from /proc; None where there is no /proc"""
+    try:
+        with open('/proc/self/stat') as f:
+            # starttime is field 22, counted after the parenthesised command name
+            started = int(f.read().rsplit(')', 1)[1].split()[19]) / os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    return max(uptime - started, 0.0)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return lines
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        lines = []
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = [('le', _format_value(float(bound)))]
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            inf = [('le', '+Inf')]
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {values[-1]}")
+        return lines
+
+
+class GaugeFunction(Metric):
+    """A gauge whose values are read when the metrics are rendered.
+
+    fn returns a number, or {label values tuple: number} when labelnames are given.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def samples(self):
+        values = self.fn()
+        if not self.labelnames:
+            return [f"{self.name} {_format_value(values)}"]
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(values.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_VALUES_ROWS = re.compile(r'(VALUES\s*\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+', re.IGNORECASE)
+
+
+def normalize_sql(sql, max_length=300):
+    """Reduce a statement to its shape: literals and placeholders become ?, lists become (...)"""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql.replace('%s', '?'))
+    sql = _VALUES_ROWS.sub(r'\1', sql)
+    return sql if len(sql) <= max_length else sql[:max_length - 3] + '...'
+
+
+class InstrumentedCursor:
+    """Wraps a mysql-connector cursor, timing each statement and counting the rows it returns"""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+        self._statement = None
+        self._count_fetches = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, run, operation, params):
+        started = time.perf_counter()
+        try:
+            return run()
+        finally:
+            duration = time.perf_counter() - started
+            self._statement = normalize_sql(operation)
+            rowcount = self._cursor.rowcount
+            # Unbuffered SELECTs report -1 until read; their rows are counted as they are fetched
+            self._count_fetches = rowcount is None or rowcount < 0
+            self._connection.observe(self._cursor, self._statement, operation, params, duration,
+                                     0 if self._count_fetches else rowcount)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        return self._timed(lambda: self._cursor.execute(operation, params, *args, **kwargs), operation, params)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._timed(lambda: self._cursor.executemany(operation, seq_params, *args, **kwargs),
+                           operation, seq_params)
+
+    def _fetched(self, count):
+        if self._count_fetches and count:
+            self._connection.count_fetched(self._statement, count)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._fetched(1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._fetched(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._fetched(len(rows))
+        return rows
+
+
+class InstrumentedConnection:
+    """Wraps a mysql-connector connection so every cursor it hands out is instrumented.
+
+    on_statement(connection, cursor, statement, sql, params, duration, rows) is
+    called after every execute()/executemany() with the raw connection and
+    cursor, where statement is the normalized SQL;
+    on_rows(statement, rows) is called for rows read later from an unbuffered cursor.
+    """
+
+    def __init__(self, connection, on_statement, on_rows=None):
+        self._connection = connection
+        self._on_statement = on_statement
+        self._on_rows = on_rows
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self)
+
+    def observe(self, cursor, statement, sql, params, duration, rows):
+        try:
+            self._on_statement(self._connection, cursor, statement, sql, params, duration, rows)
+        except Exception as e:
+            # Instrumentation must never break the query it measures
+            logger.debug(f"Statement observer failed: {e}")
+
+    def count_fetched(self, statement, rows):
+        if self._on_rows:
+            try:
+                self._on_rows(statement, rows)
+            except Exception as e:
+                logger.debug(f"Row observer failed: {e}")
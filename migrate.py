@@ -0,0 +1,152 @@
+"""Versioned schema migrations tracked in the schema_migrations table"""
+import hashlib
+import logging
+import os
+import re
+import time
+
+from mysql.connector import errorcode
+from mysql.connector.errors import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_LOCK = 'client_data.schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+# Errors meaning the object a statement creates is already there. Databases
+# set up with the old hand-run scripts contain some of the early migrations'
+# tables, columns and indexes; those statements are skipped instead of failing.
+ALREADY_APPLIED_ERRORS = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME,
+}
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+_STATEMENT_END = re.compile(r';\s*$', re.MULTILINE)
+
+
+class MigrationError(Exception):
+    """Raised when the migration files or the recorded history are inconsistent"""
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as f:
+            self.source = f.read().decode('utf-8')
+        self.checksum = hashlib.sha256(self.source.encode('utf-8')).hexdigest()
+
+    def statements(self):
+        """Split the file on semicolons that end a line; comment lines are dropped"""
+        lines = [line for line in self.source.splitlines() if not line.lstrip().startswith('--')]
+        return [statement.strip() for statement in _STATEMENT_END.split('\n'.join(lines)) if statement.strip()]
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """Migrations found in directory, ordered by version"""
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: "
+                                 f"{os.path.basename(migrations[version].path)} and {filename}")
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            duration_ms INT NOT NULL DEFAULT 0,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_migrations(cursor):
+    """{version: (name, checksum, applied_at)} of every recorded migration"""
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+
+def migration_status(db, directory=MIGRATIONS_DIR):
+    """One entry per known or recorded version with its state: applied, pending, changed or missing"""
+    cursor = db.cursor()
+    try:
+        ensure_migrations_table(cursor)
+        applied = applied_migrations(cursor)
+    finally:
+        cursor.close()
+
+    status = []
+    for migration in discover_migrations(directory):
+        record = applied.pop(migration.version, None)
+        if record is None:
+            state = 'pending'
+        elif record[1] != migration.checksum:
+            state = 'changed'
+        else:
+            state = 'applied'
+        status.append({'version': migration.version, 'name': migration.name, 'state': state,
+                       'applied_at': record[2] if record else None})
+    # Recorded versions whose file has gone away
+    for version, (name, _checksum, applied_at) in sorted(applied.items()):
+        status.append({'version': version, 'name': name, 'state': 'missing', 'applied_at': applied_at})
+    return sorted(status, key=lambda entry: entry['version'])
+
+
+def migrate(db, target=None, dry_run=False, directory=MIGRATIONS_DIR):
+    """Apply pending migrations up to target (all of them by default) and return those applied.
+
+    MySQL commits DDL implicitly, so a migration is recorded only after all of
+    its statements have run. A migration that failed part-way can be re-run:
+    statements whose table, column or index already exists are skipped.
+    A named lock keeps concurrently starting processes from migrating twice.
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise MigrationError("Another process is running migrations")
+    try:
+        ensure_migrations_table(cursor)
+        applied = applied_migrations(cursor)
+        pending = [m for m in discover_migrations(directory)
+                   if m.version not in applied and (target is None or m.version <= target)]
+        if dry_run:
+            return pending
+
+        for migration in pending:
+            started = time.monotonic()
+            for statement in migration.statements():
+                try:
+                    cursor.execute(statement)
+                    if cursor.with_rows:
+                        cursor.fetchall()
+                except DatabaseError as e:
+                    if e.errno not in ALREADY_APPLIED_ERRORS:
+                        db.rollback()
+                        raise MigrationError(f"Migration {migration.version}_{migration.name} failed: {e}") from e
+                    logger.info(f"Migration {migration.version}: skipped, already applied ({e.msg})")
+            duration_ms = int((time.monotonic() - started) * 1000)
+            cursor.execute("""
+                INSERT INTO schema_migrations (version, name, checksum, duration_ms)
+                VALUES (%s, %s, %s, %s)
+            """, (migration.version, migration.name, migration.checksum, duration_ms))
+            db.commit()
+            logger.info(f"Applied migration {migration.version}_{migration.name} in {duration_ms} ms")
+        return pending
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.fetchall()
+        cursor.close()
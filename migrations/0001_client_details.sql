@@ -0,0 +1,8 @@
+-- Contact details and timestamps on clients (formerly update_database.sql and add_timestamps.sql).
+-- One column per statement, so databases that ran either old script pick up only what is missing.
+ALTER TABLE clients ADD COLUMN email VARCHAR(255) AFTER category;
+ALTER TABLE clients ADD COLUMN phone VARCHAR(50) AFTER email;
+ALTER TABLE clients ADD COLUMN address TEXT AFTER phone;
+ALTER TABLE clients ADD COLUMN notes TEXT AFTER address;
+ALTER TABLE clients ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE clients ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
@@ -1,6 +1,4 @@
-USE client_data;
-
--- Create users table for authentication
+-- Users table for authentication (formerly create_users_table.sql)
 CREATE TABLE IF NOT EXISTS users (
     id INT AUTO_INCREMENT PRIMARY KEY,
     username VARCHAR(50) UNIQUE NOT NULL,
@@ -14,14 +12,13 @@ CREATE TABLE IF NOT EXISTS users (
     last_login TIMESTAMP NULL
 );
 
--- Insert default admin user (password: admin123)
+-- Default users (see README for the passwords)
 -- Using SHA256 hash for demo purposes (in production, use bcrypt or similar)
-INSERT INTO users (username, password_hash, email, full_name, role) VALUES
+INSERT IGNORE INTO users (username, password_hash, email, full_name, role) VALUES
 ('admin', '240be518fabd2724ddb6f04eeb1da5967448d7e831c08c8fa822809f74c720a9', 'admin@example.com', 'System Administrator', 'admin'),
 ('manager', '8c6976e5b5410415bde908bd4dee15dfb167a9c873fc4bb8a81f6f2ab448a918', 'manager@example.com', 'System Manager', 'manager'),
 ('user', '04f8996da763b7a969b1028ee3007569eaf3a635486ddab211d512c85b9df8fb', 'user@example.com', 'Regular User', 'user');
 
--- Create indexes for better performance
 CREATE INDEX idx_username ON users(username);
 CREATE INDEX idx_role ON users(role);
-CREATE INDEX idx_is_active ON users(is_active); 
\ No newline at end of file
+CREATE INDEX idx_is_active ON users(is_active);
@@ -0,0 +1,13 @@
+-- Per-category client counts, kept up to date by the application's write paths
+-- so dashboards do not have to GROUP BY the whole clients table
+CREATE TABLE IF NOT EXISTS category_stats (
+    category VARCHAR(255) NOT NULL PRIMARY KEY,
+    client_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_client_count (client_count)
+);
+
+-- Backfill from the existing clients
+INSERT INTO category_stats (category, client_count)
+SELECT category, COUNT(*) FROM clients WHERE category IS NOT NULL GROUP BY category
+ON DUPLICATE KEY UPDATE client_count = VALUES(client_count);
@@ -0,0 +1,21 @@
+-- Background jobs (imports, exports, backups, optimize) and their results
+CREATE TABLE IF NOT EXISTS jobs (
+    id CHAR(32) PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+    params TEXT,
+    progress INT NOT NULL DEFAULT 0,
+    message VARCHAR(255),
+    result TEXT,
+    error TEXT,
+    result_path VARCHAR(500),
+    result_name VARCHAR(255),
+    result_mimetype VARCHAR(100),
+    created_by VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    INDEX idx_jobs_created_by (created_by, created_at),
+    INDEX idx_jobs_created_at (created_at),
+    INDEX idx_jobs_finished_at (finished_at)
+);
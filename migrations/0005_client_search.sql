@@ -0,0 +1,5 @@
+-- Full-text indexes for /clients/search. InnoDB maintains them on every
+-- INSERT, UPDATE and DELETE, so the search always reflects committed data.
+-- ft_clients_name lets name matches be ranked above matches elsewhere.
+ALTER TABLE clients ADD FULLTEXT INDEX ft_clients_search (name, email, phone, address, notes);
+ALTER TABLE clients ADD FULLTEXT INDEX ft_clients_name (name);
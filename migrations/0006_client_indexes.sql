@@ -0,0 +1,16 @@
+-- Secondary indexes for the clients queries. InnoDB appends the primary key to
+-- every secondary index, so idx_clients_category is effectively (category, id).
+
+-- Category filter in id order (/clients/api default sort), delete_category,
+-- and the per-category GROUP BY used to backfill and reconcile category_stats
+CREATE INDEX idx_clients_category ON clients (category);
+
+-- Covers the category filter sorted by name: SELECT id, name, category ... WHERE category = ? ORDER BY name, id
+CREATE INDEX idx_clients_category_name ON clients (category, name);
+
+-- Covers the name sort and name prefix search: SELECT id, name, category ... ORDER BY name, id
+CREATE INDEX idx_clients_name_category ON clients (name, category);
+
+-- Recent clients and change tracking
+CREATE INDEX idx_clients_created_at ON clients (created_at);
+CREATE INDEX idx_clients_updated_at ON clients (updated_at);
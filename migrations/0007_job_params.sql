@@ -0,0 +1,2 @@
+-- Bulk jobs carry their client id lists in params, which can exceed TEXT's 64 KB
+ALTER TABLE jobs MODIFY params MEDIUMTEXT;
@@ -0,0 +1,13 @@
+-- Clients whose category is NULL. category_stats is keyed by category and has
+-- no row for them, so totals add this count to the per-category counts.
+-- Maintained by category_stats.py, always in the single row with id 1.
+CREATE TABLE IF NOT EXISTS uncategorized_clients (
+    id TINYINT NOT NULL PRIMARY KEY,
+    client_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Backfill from the existing clients; idx_clients_category covers the count
+INSERT INTO uncategorized_clients (id, client_count)
+SELECT 1, COUNT(*) FROM clients WHERE category IS NULL
+ON DUPLICATE KEY UPDATE client_count = VALUES(client_count);
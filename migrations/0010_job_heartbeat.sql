@@ -0,0 +1,6 @@
+-- Last time the process running a job confirmed it is still working on it.
+-- Unfinished jobs whose heartbeat stopped are marked failed (see jobs.py).
+ALTER TABLE jobs ADD COLUMN heartbeat_at TIMESTAMP NULL;
+
+-- Finds the unfinished jobs without reading the finished ones
+CREATE INDEX idx_jobs_status ON jobs (status, heartbeat_at);
@@ -0,0 +1,207 @@
+"""Minimal PDF writer that streams each page to the output as soon as it is laid out"""
+import time
+import zlib
+
+A4 = (595, 842)
+# Rough Helvetica advance width per character, as a fraction of the font size
+_CHAR_WIDTH = 0.52
+
+# Fixed object numbers; pages and their content streams are numbered from _FIRST_FREE_OBJECT on
+_CATALOG, _PAGES, _FONT_REGULAR, _FONT_BOLD, _INFO = 1, 2, 3, 4, 5
+_FIRST_FREE_OBJECT = 6
+
+
+def _number(value):
+    return (f"{value:.2f}".rstrip('0').rstrip('.') or '0').encode('ascii')
+
+
+def _string(text):
+    """A PDF literal string in WinAnsi encoding; characters it cannot encode become '?'"""
+    text = ' '.join(str(text).split())
+    data = text.encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def fit_text(text, width, size):
+    """Cut text to roughly fit `width` points at `size`"""
+    text = ' '.join(str(text).split())
+    limit = max(int(width / (size * _CHAR_WIDTH)), 1)
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+class PdfWriter:
+    """Lays out headings, paragraphs and tables top-down on A4 pages.
+
+    A page is written to `out` as soon as the next one starts. Only the byte
+    offset of each object and the object numbers of the pages stay in memory,
+    so a long listing costs one page of memory at a time. Tables repeat their
+    header row at the top of every page they continue on. Uses the standard
+    Helvetica fonts, so nothing has to be embedded.
+    """
+
+    def __init__(self, out, title='', page_size=A4, margin=48, compress=True):
+        self.out = out
+        self.title = title
+        self.width, self.height = page_size
+        self.margin = margin
+        self.compress = compress
+        self.y = None
+        self._position = 0
+        self._offsets = {}
+        self._pages = []
+        self._next_object = _FIRST_FREE_OBJECT
+        self._content = None
+        self._table = None
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    @property
+    def content_width(self):
+        return self.width - 2 * self.margin
+
+    @property
+    def page_count(self):
+        return len(self._pages) + (1 if self._content is not None else 0)
+
+    def _write(self, data):
+        self.out.write(data)
+        self._position += len(data)
+
+    def _object(self, number, body):
+        self._offsets[number] = self._position
+        self._write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+
+    def _allocate(self):
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def _text(self, x, y, text, size, bold=False, gray=0):
+        self._content.append(b'%s g BT /%s %s Tf %s %s Td %s Tj ET' % (
+            _number(gray), b'F2' if bold else b'F1', _number(size), _number(x), _number(y), _string(text)))
+
+    def _rect(self, x, y, width, height, gray):
+        self._content.append(b'%s g %s %s %s %s re f' % (
+            _number(gray), _number(x), _number(y), _number(width), _number(height)))
+
+    def _start_page(self):
+        self._content = []
+        if self.title:
+            self._text(self.margin, self.height - self.margin / 2, fit_text(self.title, self.content_width, 8), 8,
+                       gray=0.45)
+        self.y = self.height - self.margin
+
+    def _finish_page(self):
+        self._text(self.width - self.margin - 40, self.margin / 2, f"Page {len(self._pages) + 1}", 8, gray=0.45)
+        stream = b'\n'.join(self._content)
+        options = b''
+        if self.compress:
+            stream = zlib.compress(stream)
+            options = b' /Filter /FlateDecode'
+        content_object = self._allocate()
+        page_object = self._allocate()
+        self._object(content_object, b'<< /Length %d%s >>\nstream\n' % (len(stream), options) + stream
+                     + b'\nendstream')
+        self._object(page_object, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] '
+                                  b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>' % (
+                                      _PAGES, _number(self.width), _number(self.height),
+                                      _FONT_REGULAR, _FONT_BOLD, content_object))
+        self._pages.append(page_object)
+        self._content = None
+
+    def ensure_space(self, height):
+        """Start a new page unless `height` points are left on this one"""
+        if self._content is None:
+            self._start_page()
+        elif self.y - height < self.margin:
+            self._finish_page()
+            self._start_page()
+            if self._table is not None:
+                self._table_header()
+
+    def new_page(self):
+        if self._content is not None:
+            self._finish_page()
+        self._start_page()
+
+    def heading(self, text, size=14):
+        self._table = None
+        self.ensure_space(size * 3)
+        self.y -= size * 1.6
+        self._text(self.margin, self.y, fit_text(text, self.content_width, size), size, bold=True)
+        self.y -= size * 0.6
+
+    def paragraph(self, text, size=10):
+        """Text wrapped at word boundaries to the page width"""
+        self._table = None
+        limit = max(int(self.content_width / (size * _CHAR_WIDTH)), 1)
+        line = ''
+        for word in str(text).split():
+            if line and len(line) + 1 + len(word) > limit:
+                self._line(line, size)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        if line:
+            self._line(line, size)
+        self.y -= size * 0.5
+
+    def _line(self, text, size):
+        self.ensure_space(size * 1.5)
+        self.y -= size * 1.4
+        self._text(self.margin, self.y, fit_text(text, self.content_width, size), size)
+
+    def begin_table(self, columns, size=9):
+        """Start a table of (header, width in points) columns; the last column may be a bar"""
+        self._table = (columns, size)
+        self.ensure_space(size * 4)
+        self._table_header()
+
+    def _table_header(self):
+        columns, size = self._table
+        self.y -= size * 1.8
+        self._rect(self.margin, self.y - size * 0.45, self.content_width, size * 1.6, 0.9)
+        x = self.margin
+        for header, width in columns:
+            self._text(x + 2, self.y, fit_text(header, width - 4, size), size, bold=True)
+            x += width
+
+    def row(self, cells, bar=None):
+        """One table row; `bar` (0-1) fills the column after the last cell as a horizontal bar"""
+        columns, size = self._table
+        self.ensure_space(size * 1.6)
+        self.y -= size * 1.5
+        x = self.margin
+        for value, (_, width) in zip(cells, columns):
+            self._text(x + 2, self.y, fit_text('' if value is None else value, width - 4, size), size)
+            x += width
+        if bar is not None and len(columns) > len(cells):
+            width = columns[len(cells)][1] - 4
+            self._rect(x + 2, self.y - size * 0.1, max(width * min(bar, 1), 0.5), size * 0.8, 0.55)
+
+    def end_table(self):
+        self._table = None
+        self.y -= 6
+
+    def close(self, author=''):
+        """Write the last page, the page tree and the cross-reference table"""
+        if self._content is None and not self._pages:
+            self._start_page()
+        if self._content is not None:
+            self._finish_page()
+        self._object(_FONT_REGULAR, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                                    b'/Encoding /WinAnsiEncoding >>')
+        self._object(_FONT_BOLD, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold '
+                                 b'/Encoding /WinAnsiEncoding >>')
+        self._object(_INFO, b'<< /Title %s /Author %s /CreationDate (D:%s) >>' % (
+            _string(self.title), _string(author), time.strftime('%Y%m%d%H%M%S').encode('ascii')))
+        kids = b' '.join(b'%d 0 R' % page for page in self._pages)
+        self._object(_PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self._pages)))
+        self._object(_CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % _PAGES)
+
+        xref_position = self._position
+        # Each entry is exactly 20 bytes: 10-digit offset, generation, type, space, newline
+        entries = [b'0000000000 65535 f \n'] + [b'%010d 00000 n \n' % self._offsets[number]
+                                                 for number in range(1, self._next_object)]
+        self._write(b'xref\n0 %d\n' % self._next_object + b''.join(entries))
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            self._next_object, _CATALOG, _INFO, xref_position))
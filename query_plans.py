@@ -0,0 +1,162 @@
+"""EXPLAIN every SQL statement in the application source and flag full table scans"""
+import ast
+import os
+import re
+
+from search import SEARCH_COLUMNS, SEARCH_NAME_WEIGHT
+
+# Statements that read a whole table on purpose, keyed by (file, enclosing function)
+ALLOWED_FULL_SCANS = {
+    ('server.py', 'users'): 'the user list shows every user',
+    ('category_stats.py', 'read_category_stats'): 'category_stats has one row per category',
+    ('category_stats.py', 'reconcile_category_stats'): 'recounts every client; run from the CLI',
+    ('reports.py', 'report_data_version'): 'category_stats has one row per category',
+    ('rollups.py', '_drift'): 'compares per-category totals, one row per category',
+    ('rollups.py', '_rebuild'): 'rebuilds the whole rollup; run from the CLI or a job',
+    ('importer.py', 'import_clients_csv_staged'): 'copies the whole staging table of one import',
+    ('migrate.py', 'applied_migrations'): 'schema_migrations has one row per migration',
+    ('slow_queries.py', '_rows_examined'): 'performance_schema tables are in memory',
+}
+
+# Stand-ins for the f-string fields used to build SQL, per file
+SAMPLE_FIELDS = {
+    'placeholders': '%s, %s',
+    'where': 'WHERE category = %s',
+    'order_by': 'name ASC, id ASC',
+}
+FILE_SAMPLE_FIELDS = {
+    'bulk.py': {'join': '', 'condition': 'clients.id IN (%s, %s)'},
+    'jobs.py': {'where': 'WHERE created_by = %s'},
+    'rollups.py': {'condition': 'created_at >= %s', 'join': '', 'locking': '', 'ordering': '',
+                   'where': 'day >= %s AND day <= %s'},
+    'search.py': {'SEARCH_COLUMNS': SEARCH_COLUMNS, 'SEARCH_NAME_WEIGHT': str(SEARCH_NAME_WEIGHT),
+                  'where': f"MATCH({SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)"},
+}
+
+# Development tools that are never run by the application itself
+NOT_APPLICATION_MODULES = {'benchmark.py', 'datagen.py', 'query_plans.py', 'gunicorn.conf.py', 'wsgi.py'}
+
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT\s+INTO\s+\S+\s*(\([^)]*\))?\s*SELECT)\b', re.IGNORECASE)
+_NUMERIC_PARAMS = re.compile(r'\b(LIMIT|OFFSET)\s+%s', re.IGNORECASE)
+
+
+class Statement:
+    def __init__(self, filename, function, line, sql):
+        self.filename = filename
+        self.function = function
+        self.line = line
+        self.sql = sql
+
+    @property
+    def location(self):
+        return f"{self.filename}:{self.line} ({self.function})"
+
+
+def application_modules(directory):
+    """Every module of the application in directory, the default set of files to check"""
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.endswith('.py') and name not in NOT_APPLICATION_MODULES]
+
+
+def _render_sql(node, fields):
+    """SQL text of an execute() argument, or None when it cannot be known statically"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and value.value.id in fields:
+                parts.append(fields[value.value.id])
+            else:
+                return None
+        return ''.join(parts)
+    return None
+
+
+def extract_statements(path, filename=None):
+    """Return (statements, skipped) for every cursor.execute()/executemany() call in a source file.
+
+    skipped lists the calls whose SQL is built at runtime in a way that has no
+    sample in SAMPLE_FIELDS or the file's FILE_SAMPLE_FIELDS.
+    """
+    filename = filename or path
+    fields = dict(SAMPLE_FIELDS, **FILE_SAMPLE_FIELDS.get(os.path.basename(filename), {}))
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    statements = []
+    skipped = []
+
+    def visit(node, function):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                visit(child, child.name)
+                continue
+            if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                    and child.func.attr in ('execute', 'executemany') and child.args):
+                sql = _render_sql(child.args[0], fields)
+                if sql is None:
+                    skipped.append(Statement(filename, function, child.lineno, None))
+                else:
+                    statements.append(Statement(filename, function, child.lineno, ' '.join(sql.split())))
+            visit(child, function)
+
+    visit(tree, '<module>')
+    return statements, skipped
+
+
+def sample_params(sql):
+    """Fill %s placeholders with literals so the statement can be EXPLAINed without real values"""
+    sql = _NUMERIC_PARAMS.sub(lambda m: f"{m.group(1)} 10", sql)
+    return sql.replace('%s', "'1'")
+
+
+def explain(cursor, sql):
+    cursor.execute(f"EXPLAIN {sample_params(sql)}")
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Plan rows that read an entire table.
+
+    A scan counts whether or not there were candidate keys: type ALL with
+    possible_keys means the optimizer judged every index it had too
+    unselective, which is as slow as having none.
+    """
+    return [row for row in plan
+            if row.get('type') == 'ALL' and row.get('table') and not str(row['table']).startswith('<')]
+
+
+def check_query_plans(db, paths):
+    """EXPLAIN the statements in paths; return a report with failures, allowed scans and skipped calls"""
+    report = {'checked': 0, 'failures': [], 'allowed': [], 'skipped': [], 'errors': []}
+    cursor = db.cursor()
+    try:
+        for path in paths:
+            statements, skipped = extract_statements(path, filename=os.path.basename(path))
+            report['skipped'].extend(skipped)
+            for statement in statements:
+                if not _EXPLAINABLE.match(statement.sql):
+                    continue
+                try:
+                    plan = explain(cursor, statement.sql)
+                except Exception as e:
+                    report['errors'].append((statement, str(e)))
+                    continue
+                report['checked'] += 1
+                scans = full_scans(plan)
+                if not scans:
+                    continue
+                tables = ', '.join(sorted({str(row['table']) for row in scans}))
+                reason = ALLOWED_FULL_SCANS.get((statement.filename, statement.function))
+                if reason:
+                    report['allowed'].append((statement, tables, reason))
+                else:
+                    report['failures'].append((statement, tables))
+    finally:
+        db.rollback()
+        cursor.close()
+    return report
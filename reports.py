@@ -0,0 +1,289 @@
+"""Client reports rendered to PDF or HTML and kept on disk as snapshots"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from email.message import EmailMessage
+
+from category_stats import read_category_stats, read_uncategorized_count
+from exports import iter_row_chunks
+from pdf import PdfWriter
+from rollups import client_growth
+
+logger = logging.getLogger(__name__)
+
+REPORT_FORMATS = {'pdf': 'application/pdf', 'html': 'text/html'}
+REPORT_GROWTH_MONTHS = 12
+REPORT_MAX_GROWTH_MONTHS = 120
+REPORT_LISTING_CHUNK_SIZE = 1000
+REPORT_RETENTION = 3600
+REPORT_MAX_SNAPSHOTS = 50
+
+# Per-category listing: header and PDF column width in points (499 points fit between the A4 margins)
+REPORT_LISTING_COLUMNS = [('ID', 45), ('Name', 140), ('Email', 150), ('Phone', 90), ('Created', 74)]
+
+
+def parse_report_params(values):
+    """Validate report options from query args or a JSON body; returns them in canonical form"""
+    fmt = str(values.get('format') or 'pdf').lower()
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(REPORT_FORMATS)}")
+    try:
+        months = int(values.get('months') or REPORT_GROWTH_MONTHS)
+    except (TypeError, ValueError):
+        raise ValueError("months must be a number")
+    if not 1 <= months <= REPORT_MAX_GROWTH_MONTHS:
+        raise ValueError(f"months must be between 1 and {REPORT_MAX_GROWTH_MONTHS}")
+    listings = values.get('listings', True)
+    if isinstance(listings, str):
+        listings = listings.lower() not in ('0', 'false', 'no', 'off', '')
+    category = str(values.get('category') or '').strip() or None
+    return {'format': fmt, 'months': months, 'listings': bool(listings), 'category': category}
+
+
+def report_data_version(cursor):
+    """Changes whenever a client is added, edited or deleted, in this process or any other.
+
+    These lookups are cheap: the newest updated_at comes from its index, and
+    category_stats has one row per category. Deletes change category_stats,
+    or uncategorized_clients for clients without a category.
+    """
+    cursor.execute("SELECT MAX(updated_at) FROM clients")
+    newest_client = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(client_count), 0), MAX(updated_at) FROM category_stats")
+    categories, clients, newest_count = cursor.fetchone()
+    uncategorized = read_uncategorized_count(cursor)
+    return f"{newest_client}|{categories}|{clients}|{newest_count}|{uncategorized}"
+
+
+def report_key(version, params):
+    payload = json.dumps([version, params], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:24]
+
+
+def load_report_summary(cursor, params, today=None):
+    """Category breakdown and monthly growth; the listings are streamed separately"""
+    today = today or date.today()
+    categories = [(row[0], row[1]) for row in read_category_stats(cursor)]
+    total = sum(count for _, count in categories) + read_uncategorized_count(cursor)
+    month = today.month - params['months']
+    start = date(today.year + (month // 12), month % 12 + 1, 1)
+    growth = client_growth(cursor, 'month', start, today, category=params['category'], top=1)
+    return {
+        'generated_at': datetime.now(),
+        'params': params,
+        'total_clients': total,
+        'total_categories': len(categories),
+        'categories': [{'category': name, 'count': count, 'share': count / total if total else 0}
+                       for name, count in categories],
+        'growth': [{'month': label, 'new': new, 'total': cumulative}
+                   for label, new, cumulative in zip(growth['labels'], growth['totals'], growth['cumulative'])],
+    }
+
+
+def iter_category_listings(pool, category=None, chunk_size=REPORT_LISTING_CHUNK_SIZE):
+    """Yield (category, rows) with the clients of each category in name order.
+
+    The rows come from one unbuffered query walking the (category, name)
+    index, so `rows` is a lazy iterator and only one chunk is held at a time.
+    Consume each group before moving on to the next.
+    """
+    sql = "SELECT category, id, name, email, phone, created_at FROM clients WHERE category "
+    if category:
+        sql += "= %s ORDER BY name, id"
+        params = (category,)
+    else:
+        sql += "IS NOT NULL ORDER BY category, name, id"
+        params = ()
+    rows = itertools.chain.from_iterable(iter_row_chunks(pool, sql, params, chunk_size))
+    for name, group in itertools.groupby(rows, key=lambda row: row[0]):
+        yield name, (row[1:] for row in group)
+
+
+def _listing_cells(row):
+    client_id, name, email, phone, created_at = row
+    return [client_id, name, email or '', phone or '', created_at.strftime('%Y-%m-%d') if created_at else '']
+
+
+def write_pdf_report(out, summary, listings, title='Client Report'):
+    """Render the report as PDF; pages go to `out` as they fill up"""
+    pdf = PdfWriter(out, title=f"{title} - {summary['generated_at']:%Y-%m-%d %H:%M}")
+    pdf.heading(title, size=18)
+    pdf.paragraph(f"Generated on {summary['generated_at']:%Y-%m-%d %H:%M:%S}. "
+                  f"{summary['total_clients']} clients in {summary['total_categories']} categories.")
+
+    pdf.heading('Category Breakdown')
+    largest = max([entry['count'] for entry in summary['categories']] or [0])
+    pdf.begin_table([('Category', 200), ('Clients', 70), ('Share', 60), ('', 169)])
+    for entry in summary['categories']:
+        pdf.row([entry['category'], entry['count'], f"{entry['share']:.1%}"],
+                bar=entry['count'] / largest if largest else 0)
+    pdf.end_table()
+
+    scope = f" in {summary['params']['category']}" if summary['params']['category'] else ''
+    pdf.heading(f"Growth over the Last {summary['params']['months']} Months{scope}")
+    busiest = max([entry['new'] for entry in summary['growth']] or [0])
+    pdf.begin_table([('Month', 110), ('New Clients', 80), ('Total Clients', 90), ('', 219)])
+    for entry in summary['growth']:
+        pdf.row([entry['month'][:7], entry['new'], entry['total']], bar=entry['new'] / busiest if busiest else 0)
+    pdf.end_table()
+
+    counts = {entry['category']: entry['count'] for entry in summary['categories']}
+    for category, rows in listings:
+        pdf.new_page()
+        pdf.heading(f"{category} ({counts.get(category, 0)} clients)")
+        pdf.begin_table(REPORT_LISTING_COLUMNS)
+        for row in rows:
+            pdf.row(_listing_cells(row))
+        pdf.end_table()
+    pdf.close()
+    return pdf.page_count
+
+
+def write_html_report(out, template, summary, listings, title='Client Report'):
+    """Render the report through a Jinja template, writing its output as it is generated"""
+    rows = ((category, (_listing_cells(row) for row in group)) for category, group in listings)
+    for part in template.generate(title=title, listings=rows, columns=REPORT_LISTING_COLUMNS, **summary):
+        out.write(part.encode('utf-8'))
+
+
+class ReportSnapshots:
+    """Rendered reports on disk, one file per report key.
+
+    Requests for a report that is being rendered wait for that render
+    instead of starting their own. After each render, files older than
+    `retention` seconds are removed, and then the least recently served
+    files above `max_snapshots`.
+    """
+
+    def __init__(self, directory, retention=REPORT_RETENTION, max_snapshots=REPORT_MAX_SNAPSHOTS):
+        self.directory = directory
+        self.retention = retention
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._rendering = {}
+        self.hits = 0
+        self.renders = 0
+
+    def path(self, key, fmt):
+        return os.path.join(self.directory, f"report_{key}.{fmt}")
+
+    def get(self, key, fmt, render):
+        """Path of the snapshot, calling render(out) to write it first if there is none"""
+        path = self.path(key, fmt)
+        if self._touch(path):
+            return path
+        with self._lock:
+            # Requests for the same report share one lock for as long as one of them is waiting on it
+            entry = self._rendering.setdefault(path, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                # Rendered while this request waited for the lock
+                if self._touch(path):
+                    return path
+                partial = f"{path}.{uuid.uuid4().hex}.tmp"
+                started = time.monotonic()
+                # Created by the first render, so constructing the store writes nothing
+                os.makedirs(self.directory, exist_ok=True)
+                try:
+                    with open(partial, 'wb') as out:
+                        render(out)
+                    os.replace(partial, path)
+                except BaseException:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+                    raise
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._rendering.pop(path, None)
+        self.renders += 1
+        logger.info(f"Rendered report {os.path.basename(path)} ({os.path.getsize(path)} bytes) "
+                    f"in {time.monotonic() - started:.2f}s")
+        self.cleanup()
+        return path
+
+    def _touch(self, path):
+        """Count a hit on an existing snapshot, marking it recently served so the next cleanup keeps it"""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        self.hits += 1
+        return True
+
+    def reset_after_fork(self):
+        """Renders running in the parent do not exist in a forked child; their locks would never be released"""
+        self._lock = threading.Lock()
+        self._rendering = {}
+
+    def cleanup(self):
+        now = time.time()
+        snapshots = []
+        with self._lock:
+            rendering = set(self._rendering)
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.startswith('report_'):
+                continue
+            path = os.path.join(self.directory, name)
+            # A render in progress may have been writing its .tmp file for longer than the retention
+            if name.endswith('.tmp') and path.rsplit('.', 2)[0] in rendering:
+                continue
+            try:
+                modified = os.path.getmtime(path)
+                if now - modified > self.retention:
+                    os.remove(path)
+                elif not name.endswith('.tmp'):
+                    snapshots.append((modified, path))
+            except OSError:
+                continue
+        snapshots.sort()
+        for _, path in snapshots[:max(len(snapshots) - self.max_snapshots, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'hits': self.hits, 'renders': self.renders}
+
+
+def parse_allowed_recipients(value):
+    """REPORT_MAIL_ALLOWED as a set: comma-separated addresses, or domains written as @example.com"""
+    return {entry.strip().lower() for entry in str(value or '').split(',') if entry.strip()}
+
+
+def recipient_allowed(recipient, own_address, allowed=()):
+    """Reports go to the requesting user's own address, or to an address or domain on the allow-list"""
+    recipient = recipient.strip().lower()
+    if own_address and recipient == own_address.strip().lower():
+        return True
+    domain = '@' + recipient.rpartition('@')[2]
+    return recipient in allowed or (domain != '@' and domain in allowed)
+
+
+def send_report_email(path, filename, mimetype, recipient, host, port=25, sender='reports@localhost',
+                      subject='Client Report'):
+    """Mail a rendered snapshot as an attachment"""
+    message = EmailMessage()
+    message['Subject'] = subject
+    message['From'] = sender
+    message['To'] = recipient
+    message.set_content(f"The requested client report is attached ({filename}).")
+    maintype, subtype = mimetype.split('/')
+    with open(path, 'rb') as report:
+        message.add_attachment(report.read(), maintype=maintype, subtype=subtype, filename=filename)
+    with smtplib.SMTP(host, port, timeout=30) as smtp:
+        smtp.send_message(message)
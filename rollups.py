@@ -0,0 +1,330 @@
+"""Client growth rollup: clients per creation day and category, refreshed incrementally from watermarks"""
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = 'client_daily_counts'
+ROLLUP_LOCK = 'client_rollup_refresh'
+# Transactions may commit this long after their created_at/updated_at was set
+ROLLUP_SETTLE = timedelta(minutes=5)
+# Beyond this many changed days a full rebuild is cheaper than recounting them one by one
+ROLLUP_MAX_DIRTY_DAYS = 366
+# Minimum seconds between the rebuild jobs one process schedules when the rollup needs repair
+ROLLUP_REBUILD_INTERVAL = 3600
+ROLLUP_INSERT_BATCH = 1000
+ROLLUP_INTERVALS = ('day', 'week', 'month')
+ROLLUP_MAX_PERIODS = 1000
+ROLLUP_TOP_CATEGORIES = 8
+ROLLUP_MAX_AGE = 60
+
+# Start of the period each rollup day belongs to; weeks start on Monday
+_PERIOD_SQL = {
+    'day': 'day',
+    'week': 'DATE_SUB(day, INTERVAL WEEKDAY(day) DAY)',
+    'month': 'DATE_SUB(day, INTERVAL DAYOFMONTH(day) - 1 DAY)',
+}
+
+
+def _count_days(cursor, condition, params=(), lock=False):
+    # A locking read waits for deletes in flight, which subtract their clients from the rows rewritten here
+    locking = ' LOCK IN SHARE MODE' if lock else ''
+    cursor.execute(f"""
+        SELECT DATE(created_at), category, COUNT(*) FROM clients
+        WHERE {condition} AND category IS NOT NULL
+        GROUP BY DATE(created_at), category{locking}
+    """, params)
+    return cursor.fetchall()
+
+
+def _insert_counts(cursor, rows):
+    for start in range(0, len(rows), ROLLUP_INSERT_BATCH):
+        cursor.executemany("INSERT INTO client_daily_counts (day, category, client_count) VALUES (%s, %s, %s)",
+                           rows[start:start + ROLLUP_INSERT_BATCH])
+
+
+def remove_clients_from_rollup(cursor, condition, params=(), join='', order_by=None, limit=None):
+    """Subtract the clients matching `condition`, which the caller is about to delete, from client_daily_counts.
+
+    Run it in the deleting transaction, before the DELETE; the rows are
+    locked until the commit. Deletes leave nothing for the watermark refresh
+    to follow, so without this they would show up as drift. For a
+    DELETE ... ORDER BY ... LIMIT, pass the same `order_by` and `limit` so
+    the same rows are subtracted.
+    """
+    ordering = f" ORDER BY {order_by}" if order_by else ''
+    if limit is not None:
+        ordering += " LIMIT %s"
+        params = tuple(params) + (limit,)
+    cursor.execute(f"SELECT clients.created_at, clients.category FROM clients {join} WHERE {condition}{ordering} "
+                   f"FOR UPDATE", params)
+    counts = Counter((_as_date(created_at), category) for created_at, category in cursor.fetchall()
+                     if created_at is not None and category is not None)
+    if not counts:
+        return 0
+    keys = sorted(counts)
+    cursor.executemany("UPDATE client_daily_counts SET client_count = GREATEST(client_count - %s, 0) "
+                       "WHERE day = %s AND category = %s", [(counts[key],) + key for key in keys])
+    cursor.executemany("DELETE FROM client_daily_counts WHERE day = %s AND category = %s AND client_count = 0",
+                       keys)
+    return sum(counts.values())
+
+
+def _drift(cursor, lock=False):
+    """Categories whose rolled-up total differs from category_stats"""
+    # After a locking recount, a plain snapshot read would miss clients committed since the snapshot began
+    locking = ' LOCK IN SHARE MODE' if lock else ''
+    cursor.execute(f"SELECT category, SUM(client_count) FROM client_daily_counts GROUP BY category{locking}")
+    rolled = {category: int(count) for category, count in cursor.fetchall()}
+    cursor.execute(f"SELECT category, client_count FROM category_stats{locking}")
+    expected = dict(cursor.fetchall())
+    return sorted(category for category in set(rolled) | set(expected)
+                  if rolled.get(category, 0) != expected.get(category, 0))
+
+
+def refresh_client_rollup(db, rebuild=False, wait=0, repair=False):
+    """Bring client_daily_counts up to date and return what was done.
+
+    Incremental refreshes recount two sets of days. The first is every day
+    from the created_at watermark onwards, which covers new clients. The
+    second is the creation days of older clients whose updated_at passed the
+    updated_at watermark, which covers edits and category moves. Both are
+    index range reads on clients. Deletes subtract their clients themselves
+    (remove_clients_from_rollup). Each refresh still compares the rolled-up
+    totals with category_stats and reports the categories that differ as
+    `drift`.
+
+    A full rebuild reads every client, so it only runs with `rebuild`, or
+    with `repair` when the rollup was never built, is too far behind or has
+    drifted. Request handlers pass neither; they get {'mode': 'repair_needed'}
+    instead and leave the rebuild to the CLI or a background job.
+
+    Returns {'mode': 'skipped'} without waiting when another process holds
+    the refresh lock longer than `wait` seconds.
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (ROLLUP_LOCK, wait))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        return {'mode': 'skipped'}
+    try:
+        result = _refresh(cursor, rebuild, repair)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (ROLLUP_LOCK,))
+        cursor.fetchall()
+        cursor.close()
+
+
+def _refresh(cursor, rebuild, repair):
+    cursor.execute("SELECT NOW()")
+    now = cursor.fetchone()[0]
+    cursor.execute("SELECT created_watermark, updated_watermark, rebuilt_at FROM rollup_state WHERE name = %s",
+                   (ROLLUP_NAME,))
+    state = cursor.fetchone()
+
+    rebuilt_at = state[2] if state else None
+    if not rebuild and (state is None or state[0] is None):
+        if not repair:
+            return {'mode': 'repair_needed', 'rows': 0, 'reason': 'never built'}
+        rebuild = True
+    if rebuild:
+        result = _rebuild(cursor)
+    else:
+        created_watermark, updated_watermark, _ = state
+        start = (created_watermark - ROLLUP_SETTLE).date()
+        since = updated_watermark - ROLLUP_SETTLE
+        if rebuilt_at:
+            # A rebuild already counted every change committed before it
+            since = max(since, rebuilt_at - ROLLUP_SETTLE)
+        cursor.execute("SELECT DISTINCT DATE(created_at) FROM clients WHERE updated_at >= %s AND created_at < %s",
+                       (since, start))
+        dirty = sorted(row[0] for row in cursor.fetchall())
+
+        if len(dirty) > ROLLUP_MAX_DIRTY_DAYS:
+            if not repair:
+                return {'mode': 'repair_needed', 'rows': 0, 'reason': f'{len(dirty)} changed days'}
+            result = _rebuild(cursor)
+        else:
+            rows = list(_count_days(cursor, "created_at >= %s", (start,), lock=True))
+            cursor.execute("DELETE FROM client_daily_counts WHERE day >= %s", (start,))
+            for day in dirty:
+                rows.extend(_count_days(cursor, "created_at >= %s AND created_at < %s",
+                                        (day, day + timedelta(days=1)), lock=True))
+                cursor.execute("DELETE FROM client_daily_counts WHERE day = %s", (day,))
+            _insert_counts(cursor, rows)
+            result = {'mode': 'incremental', 'rows': len(rows), 'recounted_from': start.isoformat(),
+                      'dirty_days': len(dirty)}
+
+            drift = _drift(cursor, lock=True)
+            if drift and repair:
+                logger.info(f"Client rollup drifted for {len(drift)} categories, rebuilding")
+                result = _rebuild(cursor)
+            elif drift:
+                result['drift'] = drift
+
+    if result['mode'] == 'rebuild':
+        rebuilt_at = now
+    cursor.execute("""
+        INSERT INTO rollup_state (name, created_watermark, updated_watermark, rebuilt_at, refreshed_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE created_watermark = VALUES(created_watermark),
+            updated_watermark = VALUES(updated_watermark), rebuilt_at = VALUES(rebuilt_at),
+            refreshed_at = VALUES(refreshed_at)
+    """, (ROLLUP_NAME, now, now, rebuilt_at, now))
+    return result
+
+
+def _rebuild(cursor):
+    rows = list(_count_days(cursor, "created_at IS NOT NULL"))
+    cursor.execute("DELETE FROM client_daily_counts")
+    _insert_counts(cursor, rows)
+    return {'mode': 'rebuild', 'rows': len(rows)}
+
+
+class RollupRefresher:
+    """Refreshes the rollup from request handlers, at most once every `max_age` seconds per process.
+
+    The refresh does not wait for the lock; when another process is already
+    refreshing, readers get the rollup as it is. It never rebuilds: when the
+    rollup needs repair (or has drifted), `schedule_rebuild()` is called, at
+    most once every `rebuild_interval` seconds, to hand the rebuild to a
+    background job.
+    """
+
+    def __init__(self, pool, max_age=ROLLUP_MAX_AGE, schedule_rebuild=None,
+                 rebuild_interval=ROLLUP_REBUILD_INTERVAL):
+        self.pool = pool
+        self.max_age = max_age
+        self.schedule_rebuild = schedule_rebuild
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._refreshed = None
+        self._rebuild_scheduled = None
+        self.last_result = None
+
+    def maybe_refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshed is not None and now - self._refreshed < self.max_age:
+                return None
+            self._refreshed = now
+        with self.pool.connection() as db:
+            self.last_result = refresh_client_rollup(db)
+        if self.last_result['mode'] == 'repair_needed' or self.last_result.get('drift'):
+            self._request_rebuild(now)
+        return self.last_result
+
+    def _request_rebuild(self, now):
+        with self._lock:
+            if self._rebuild_scheduled is not None and now - self._rebuild_scheduled < self.rebuild_interval:
+                return
+            self._rebuild_scheduled = now
+        if self.schedule_rebuild is None:
+            logger.warning("Client rollup needs a rebuild: run flask refresh-rollups --rebuild")
+            return
+        try:
+            self.schedule_rebuild()
+            logger.info(f"Client rollup needs repair ({self.last_result}), rebuild job scheduled")
+        except Exception as e:
+            logger.warning(f"Could not schedule the client rollup rebuild: {e}")
+
+
+def period_start(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(start, interval):
+    if interval == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=7 if interval == 'week' else 1)
+
+
+def periods(start, end, interval):
+    """Start dates of every period from the one containing `start` through the one containing `end`"""
+    current = period_start(start, interval)
+    result = []
+    while current <= end:
+        result.append(current)
+        if len(result) > ROLLUP_MAX_PERIODS:
+            raise ValueError(f"At most {ROLLUP_MAX_PERIODS} periods can be charted at once")
+        current = _next_period(current, interval)
+    return result
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def client_growth(cursor, interval, start, end, category=None, top=ROLLUP_TOP_CATEGORIES):
+    """Clients created per period from start to end (inclusive dates), per category.
+
+    Only the `top` categories with the most new clients in the range get
+    their own series; the rest are summed into "Other". `cumulative` adds the
+    clients created before `start` to the running total of `totals`.
+    """
+    if interval not in _PERIOD_SQL:
+        raise ValueError(f"interval must be one of {', '.join(ROLLUP_INTERVALS)}")
+    buckets = periods(start, end, interval)
+    index = {period: i for i, period in enumerate(buckets)}
+
+    conditions = ["day >= %s", "day <= %s"]
+    params = [buckets[0] if buckets else start, end]
+    if category:
+        conditions.append("category = %s")
+        params.append(category)
+    where = ' AND '.join(conditions)
+    cursor.execute(f"""
+        SELECT {_PERIOD_SQL[interval]} AS period, category, SUM(client_count)
+        FROM client_daily_counts WHERE {where}
+        GROUP BY period, category
+    """, tuple(params))
+    series = {}
+    for period, name, count in cursor.fetchall():
+        position = index.get(_as_date(period))
+        if position is not None:
+            series.setdefault(name, [0] * len(buckets))[position] += int(count)
+
+    cursor.execute("SELECT COALESCE(SUM(client_count), 0) FROM client_daily_counts WHERE day < %s"
+                   + (" AND category = %s" if category else ""),
+                   (params[0], category) if category else (params[0],))
+    opening = int(cursor.fetchone()[0])
+
+    ranked = sorted(series, key=lambda name: (-sum(series[name]), name))
+    shown = [{'category': name, 'data': series[name], 'total': sum(series[name])} for name in ranked[:top]]
+    if len(ranked) > top:
+        other = [sum(series[name][i] for name in ranked[top:]) for i in range(len(buckets))]
+        shown.append({'category': 'Other', 'data': other, 'total': sum(other)})
+
+    totals = [sum(values[i] for values in series.values()) for i in range(len(buckets))]
+    cumulative = []
+    running = opening
+    for count in totals:
+        running += count
+        cumulative.append(running)
+    return {
+        'interval': interval,
+        'start': params[0].isoformat(),
+        'end': end.isoformat(),
+        'category': category,
+        'labels': [period.isoformat() for period in buckets],
+        'series': shown,
+        'totals': totals,
+        'opening_total': opening,
+        'cumulative': cumulative,
+    }
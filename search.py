@@ -0,0 +1,65 @@
+"""Full-text search over the clients table"""
+import re
+
+# Column lists must match the FULLTEXT indexes in migrations/0005_client_search.sql exactly
+SEARCH_COLUMNS = 'name, email, phone, address, notes'
+SEARCH_NAME_WEIGHT = 2
+# Words shorter than innodb_ft_min_token_size are not in the index
+SEARCH_MIN_TOKEN = 3
+SEARCH_MAX_TERMS = 8
+# Ranked results cannot be keyset-paginated, so deep offsets are refused instead
+SEARCH_MAX_OFFSET = 1000
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def boolean_query(text, min_token=SEARCH_MIN_TOKEN, max_terms=SEARCH_MAX_TERMS):
+    """Turn free text into a BOOLEAN MODE query where every word is a required prefix.
+
+    Boolean operators typed by the user are dropped rather than interpreted,
+    so "+acme -corp" requires both acme and corp. Returns None
+    when no word is long enough to be looked up in the index.
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if len(word) >= min_token and word not in terms:
+            terms.append(word)
+    if not terms:
+        return None
+    return ' '.join(f'+{term}*' for term in terms[:max_terms])
+
+
+def search_clients(cursor, query, category=None, limit=20, offset=0):
+    """Return (rows, facets) for a boolean query built by boolean_query().
+
+    rows are (id, name, category, email, phone, score) ordered by relevance,
+    with matches in the name weighted above matches in other columns.
+    facets are [(category, count), ...] over every match, ignoring the
+    category filter so the caller can show what switching category would give.
+    """
+    where = f"MATCH({SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)"
+    params = [query]
+    if category:
+        where += " AND category = %s"
+        params.append(category)
+
+    cursor.execute(f"""
+        SELECT id, name, category, email, phone,
+               MATCH(name) AGAINST (%s IN BOOLEAN MODE) * {SEARCH_NAME_WEIGHT}
+               + MATCH({SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) AS score
+        FROM clients
+        WHERE {where}
+        ORDER BY score DESC, id DESC
+        LIMIT %s OFFSET %s
+    """, (query, query, *params, limit, offset))
+    rows = cursor.fetchall()
+
+    cursor.execute(f"""
+        SELECT category, COUNT(*) FROM clients
+        WHERE MATCH({SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)
+        GROUP BY category
+        ORDER BY COUNT(*) DESC, category
+    """, (query,))
+    facets = cursor.fetchall()
+    return rows, facets
@@ -1,113 +1,358 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file, g, Response
+from flask import Blueprint, current_app
+from flask import make_response
+from flask import before_render_template, has_request_context, template_rendered
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
 import mysql.connector
-from datetime import datetime
+import click
+from datetime import date, datetime, timedelta, timezone
 import os
-import csv
-import io
+import functools
+import itertools
 import json
 import logging
 import hashlib
+import hmac
+import base64
+import subprocess
+import sys
+import time
+import uuid
+import weakref
+from collections import Counter
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'  # Change this in production
+from assets import ASSET_HASH_LENGTH, ASSET_MAX_AGE, AssetPipeline, vendor_assets
+from backup import BACKUP_BATCH_SIZE, sql_dump_stream
+from bulk import (BULK_MAX_IDS, bulk_delete, bulk_update_category as bulk_move_clients, delete_category_clients,
+                  parse_bulk_ids)
+from cache import VersionedCache
+from category_stats import (apply_category_deltas, lock_client_categories, read_category_stats,
+                            read_uncategorized_count, reconcile_category_stats)
+from columnar import (COLUMNAR_COMPRESSION, COLUMNAR_FORMATS, COLUMNAR_MAX_ROW_GROUP_SIZE,
+                      COLUMNAR_MIN_ROW_GROUP_SIZE, COLUMNAR_ROW_GROUP_SIZE, columnar_available, columnar_stream,
+                      load_categories)
+from compression import CompressionMiddleware, negotiate_encoding
+from config import flag, secret_key, setting
+from datagen import SEED_USER_PASSWORD, seed_database
+from db_pool import ConnectionPool
+from exports import (CLIENT_EXPORT_COLUMNS, EXPORT_CHUNK_SIZE, client_batch_stream, client_export_query, csv_stream,
+                     gzip_stream, iter_clients_by_id, iter_row_chunks, json_stream, ndjson_stream,
+                     parse_export_columns)
+from importer import IMPORT_BATCH_SIZE, IMPORT_COMMIT_ROWS, import_clients_csv, import_clients_csv_staged
+from jobs import JobRejected, JobRunner, UnknownJobType
+from live import ChangeFeed, FeedFull
+from metrics import Counter as MetricCounter, GaugeFunction, Histogram, InstrumentedConnection, Registry, process_age
+from migrate import MigrationError, migrate, migration_status
+from query_plans import application_modules, check_query_plans
+from reports import (REPORT_FORMATS, ReportSnapshots, iter_category_listings, load_report_summary,
+                     parse_allowed_recipients, parse_report_params, recipient_allowed, report_data_version,
+                     report_key, send_report_email, write_html_report, write_pdf_report)
+from rollups import (ROLLUP_INTERVALS, ROLLUP_TOP_CATEGORIES, RollupRefresher, client_growth,
+                     refresh_client_rollup, remove_clients_from_rollup)
+from search import SEARCH_MAX_OFFSET, SEARCH_MIN_TOKEN, boolean_query, search_clients
+from slow_queries import SlowQueryLog
+
+# Every route, template helper and CLI command; create_app() registers them on its app
+bp = Blueprint('main', __name__, cli_group=None)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MySQL connection (XAMPP compatible)
-def get_db_connection():
+def load_settings(instance_path):
+    """The app's configuration from the environment, the APP_CONFIG file or the defaults (see config.py)"""
+    return {
+        # MySQL connection settings; the defaults match a local XAMPP install
+        'DB_HOST': setting('DB_HOST', 'localhost'),
+        'DB_PORT': setting('DB_PORT', 3306, int),
+        # Without a configured user, root is tried and then the usird account
+        'DB_USER': setting('DB_USER'),
+        'DB_PASSWORD': setting('DB_PASSWORD', ''),  # XAMPP MySQL root has no password by default
+        'DB_NAME': setting('DB_NAME', 'client_data'),
+        'DB_CONNECT_TIMEOUT': setting('DB_CONNECT_TIMEOUT', 10, int),
+        # Connection pool: every request checks out its own connection and returns it at teardown
+        'DB_POOL_MIN_SIZE': setting('DB_POOL_MIN_SIZE', 2, int),
+        'DB_POOL_MAX_SIZE': setting('DB_POOL_MAX_SIZE', 10, int),
+        'DB_POOL_TIMEOUT': setting('DB_POOL_TIMEOUT', 10, float),
+        'DB_POOL_RECYCLE': setting('DB_POOL_RECYCLE', 3600, int),
+        'DB_POOL_IDLE_CHECK': setting('DB_POOL_IDLE_CHECK', 30, int),
+        'DB_POOL_MAX_IDLE': setting('DB_POOL_MAX_IDLE', 300, int),
+        # Sessions must survive restarts and be readable by every worker; see config.secret_key()
+        'SECRET_KEY': setting('SECRET_KEY'),
+        # Compiled templates persist across restarts, so a new worker skips compiling them again
+        'JINJA_CACHE_DIR': setting('JINJA_CACHE_DIR', os.path.join(instance_path, 'jinja_cache')),
+        'METRICS_TOKEN': setting('METRICS_TOKEN'),
+        'SLOW_QUERY_THRESHOLD_MS': setting('SLOW_QUERY_THRESHOLD_MS', 200, float),
+        'SLOW_QUERY_CAPACITY': setting('SLOW_QUERY_CAPACITY', 500, int),
+        'SLOW_QUERY_LOG': setting('SLOW_QUERY_LOG', os.path.join(instance_path, 'slow_queries.log')),
+        'SLOW_QUERY_EXPLAIN': flag('SLOW_QUERY_EXPLAIN'),
+        # Response compression: gzip always, zstd and brotli when their packages are installed
+        'COMPRESSION': flag('COMPRESSION'),
+        'COMPRESSION_GZIP_LEVEL': setting('COMPRESSION_GZIP_LEVEL', 6, int),
+        'COMPRESSION_BROTLI_LEVEL': setting('COMPRESSION_BROTLI_LEVEL', 4, int),
+        'COMPRESSION_ZSTD_LEVEL': setting('COMPRESSION_ZSTD_LEVEL', 3, int),
+        'COMPRESSION_MIN_SIZE': setting('COMPRESSION_MIN_SIZE', 1024, int),
+        # Request threads per process; gunicorn.conf.py exports it
+        'SERVER_THREADS': setting('SERVER_THREADS', 16, int),
+        # None: a quarter of SERVER_THREADS (see live_max_subscribers)
+        'LIVE_MAX_SUBSCRIBERS': setting('LIVE_MAX_SUBSCRIBERS', None, int),
+        'LIVE_POLL_INTERVAL': setting('LIVE_POLL_INTERVAL', 15, float),
+        'LIVE_MAX_STREAM_SECONDS': setting('LIVE_MAX_STREAM_SECONDS', 300, float),
+        'DASHBOARD_CACHE_TTL': setting('DASHBOARD_CACHE_TTL', 30, int),
+        'ROLLUP_MAX_AGE': setting('ROLLUP_MAX_AGE', 60, int),
+        'ROLLUP_REBUILD_INTERVAL': setting('ROLLUP_REBUILD_INTERVAL', 3600, int),
+        'ASSET_BUILD_DIR': setting('ASSET_BUILD_DIR', os.path.join(instance_path, 'assets')),
+        'REPORT_DIR': setting('REPORT_DIR', os.path.join(instance_path, 'reports')),
+        'REPORT_RETENTION': setting('REPORT_RETENTION', 3600, int),
+        'REPORT_MAX_SNAPSHOTS': setting('REPORT_MAX_SNAPSHOTS', 50, int),
+        'REPORT_SMTP_HOST': setting('REPORT_SMTP_HOST'),
+        'REPORT_SMTP_PORT': setting('REPORT_SMTP_PORT', 25, int),
+        'REPORT_MAIL_FROM': setting('REPORT_MAIL_FROM', 'reports@localhost'),
+        # Besides their own address, users may only send reports to these addresses and @domains
+        'REPORT_MAIL_ALLOWED': setting('REPORT_MAIL_ALLOWED', ''),
+        # Ids accepted by one /clients/batch request; they are looked up in chunks of CLIENT_BATCH_CHUNK_SIZE
+        'CLIENT_BATCH_MAX_IDS': setting('CLIENT_BATCH_MAX_IDS', 5000, int),
+        'JOB_RESULT_DIR': setting('JOB_RESULT_DIR', os.path.join(instance_path, 'jobs')),
+        'JOB_WORKERS': setting('JOB_WORKERS', 4, int),
+        'JOB_MAX_QUEUED': setting('JOB_MAX_QUEUED', 20, int),
+        'JOB_RESULT_RETENTION': setting('JOB_RESULT_RETENTION', 24 * 3600, int),
+        'JOB_HEARTBEAT_INTERVAL': setting('JOB_HEARTBEAT_INTERVAL', 30, int),
+        'JOB_LIMIT_EXPORT': setting('JOB_LIMIT_EXPORT', 2, int),
+        'JOB_LIMIT_BACKUP': setting('JOB_LIMIT_BACKUP', 1, int),
+        'JOB_LIMIT_IMPORT': setting('JOB_LIMIT_IMPORT', 1, int),
+        'COLD_START_TARGET_MS': setting('COLD_START_TARGET_MS', 1500, float),
+    }
+
+def connect_mysql(config):
+    """Open a MySQL connection with the DB_* settings of an app's config"""
+    db_config = {
+        'host': config['DB_HOST'],
+        'port': config['DB_PORT'],
+        'user': config['DB_USER'] or 'root',
+        'password': config['DB_PASSWORD'],
+        'database': config['DB_NAME'],
+        'connection_timeout': config['DB_CONNECT_TIMEOUT'],
+    }
     try:
-        # Try with root user first (XAMPP default)
-        return mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",  # XAMPP MySQL root has no password by default
-            database="client_data",
-            port=3306
-        )
+        return mysql.connector.connect(**db_config)
     except mysql.connector.Error as err:
-        # If root doesn't work, try with usird user
-        if err.errno == 1045:  # Access denied
-            print("Trying with usird user...")
-            return mysql.connector.connect(
-                host="localhost",
-                user="usird",
-                password="usrid",
-                database="client_data",
-                port=3306
-            )
+        # Without a configured user, fall back to the usird account when root is refused
+        if err.errno == 1045 and not config['DB_USER']:  # Access denied
+            logger.info("Trying with usird user...")
+            return mysql.connector.connect(**dict(db_config, user='usird', password='usrid'))
         else:
             raise err
 
-# Global database connection
-db = get_db_connection()
+def app_resource(name):
+    """The current app's instance of a shared object (see AppResources), usable as a module-level name"""
+    return LocalProxy(lambda: getattr(current_app.extensions['client_data'], name))
 
-def ensure_db_connection():
-    """Ensure database connection is active, reconnect if needed"""
-    global db
-    try:
-        # Test if connection is still alive
-        cursor = db.cursor()
-        cursor.execute("SELECT 1")
-        cursor.fetchall()  # Consume any unread results
-        cursor.close()
-    except Exception as e:
-        logger.warning(f"Database connection lost, attempting to reconnect: {e}")
-        try:
-            db = get_db_connection()
-        except Exception as reconnect_error:
-            logger.error(f"Failed to reconnect to database: {reconnect_error}")
-            raise reconnect_error
+# Latency metrics, exposed on /metrics and summarised per response in a Server-Timing header
+metrics_registry = Registry()
+REQUEST_LATENCY = metrics_registry.register(Histogram(
+    'app_request_duration_seconds', 'Time from request start until the response headers are ready',
+    ('method', 'route', 'status')))
+SQL_LATENCY = metrics_registry.register(Histogram(
+    'app_sql_duration_seconds', 'Time spent in execute() per normalized statement', ('statement',)))
+SQL_ROWS = metrics_registry.register(MetricCounter(
+    'app_sql_rows_total', 'Rows returned or affected per normalized statement', ('statement',)))
+POOL_WAIT = metrics_registry.register(Histogram(
+    'app_db_pool_wait_seconds', 'Time spent waiting to check out a pooled connection'))
+TEMPLATE_RENDER = metrics_registry.register(Histogram(
+    'app_template_render_seconds', 'Time spent rendering each page template', ('template',)))
+
+def request_timings():
+    """Per-request totals for the Server-Timing header; None outside a request"""
+    if not has_request_context():
+        return None
+    if 'timings' not in g:
+        g.timings = {'db': 0.0, 'queries': 0, 'pool': 0.0, 'render': 0.0}
+    return g.timings
+
+# Statements slower than the threshold, with their plan, kept for the /logs page and in a rotating file
+slow_query_log = app_resource('slow_query_log')
+
+def record_statement(slow_query_log, connection, cursor, statement, sql, params, duration, rows):
+    SQL_LATENCY.observe(duration, statement)
+    slow_query_log.observe(connection, cursor, statement, sql, params, duration, rows)
+    if rows:
+        SQL_ROWS.inc(rows, statement)
+    timings = request_timings()
+    if timings is not None:
+        timings['db'] += duration
+        timings['queries'] += 1
+
+def record_fetched_rows(statement, rows):
+    SQL_ROWS.inc(rows, statement)
+
+def record_pool_wait(waited):
+    POOL_WAIT.observe(waited)
+    timings = request_timings()
+    if timings is not None:
+        timings['pool'] += waited
+
+def instrumented_db_connection(config, slow_query_log):
+    return InstrumentedConnection(connect_mysql(config), functools.partial(record_statement, slow_query_log),
+                                  record_fetched_rows)
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+def start_template_timer(sender, template, context, **extra):
+    if has_request_context():
+        g.template_started = time.perf_counter()
+
+def record_template_render(sender, template, context, **extra):
+    started = g.pop('template_started', None) if has_request_context() else None
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    TEMPLATE_RENDER.observe(duration, template.name or 'string')
+    request_timings()['render'] += duration
+
+@bp.after_app_request
+def record_request_timing(response):
+    """Observe the route latency and attach the db / pool / render breakdown.
+
+    Streamed responses are timed up to their headers; the body is produced
+    after this point.
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(duration, request.method, route, str(response.status_code))
+    
+    timings = request_timings()
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={timings["db"] * 1000:.2f};desc="{timings["queries"]} queries"',
+        f'pool;dur={timings["pool"] * 1000:.2f}',
+        f'render;dur={timings["render"] * 1000:.2f}',
+        f'total;dur={duration * 1000:.2f}',
+    ])
+    return response
+
+# Response compression: gzip always, zstd and brotli when their packages are installed
+COMPRESSED_BYTES = metrics_registry.register(MetricCounter(
+    'app_response_bytes_total', 'Body bytes of compressed responses, before and after compression',
+    ('encoding', 'stage')))
+
+def record_compression(encoding, raw, sent):
+    COMPRESSED_BYTES.inc(raw, encoding, 'raw')
+    COMPRESSED_BYTES.inc(sent, encoding, 'sent')
+
+# Connection pool: every request checks out its own connection and returns it at teardown
+db_pool = app_resource('db_pool')
+
+def pool_gauges():
+    stats = db_pool.stats()
+    return {('in_use',): stats['in_use'], ('idle',): stats['idle'], ('waiting',): stats['waiting']}
+
+metrics_registry.register(GaugeFunction(
+    'app_db_pool_connections', 'Pooled connections by state', pool_gauges, ('state',)))
+
+def get_db():
+    """Get the current request's database connection, checking one out of the pool on first use"""
+    if 'db_conn' not in g:
+        g.db_conn = db_pool.acquire()
+    return g.db_conn.connection
+
+def release_db(exception):
+    """Return the request's connection to the pool"""
+    pooled = g.pop('db_conn', None)
+    if pooled is not None:
+        db_pool.release(pooled)
+
+# Live dashboard updates: one feed reloads the state after each write and pushes the delta to every open page.
+# Every open stream holds one of the process's request threads (gunicorn.conf.py exports SERVER_THREADS),
+# so streams get a quarter of them by default and never more than half; other pages poll instead.
+live_feed = app_resource('live_feed')
+
+def live_max_subscribers(config):
+    threads = config['SERVER_THREADS']
+    subscribers = config['LIVE_MAX_SUBSCRIBERS']
+    if subscribers is None:
+        return max(threads // 4, 1)
+    if subscribers > threads // 2:
+        logger.warning(f"LIVE_MAX_SUBSCRIBERS={subscribers} would leave too few of the {threads} "
+                       f"threads for other requests; using {max(threads // 2, 1)}")
+        return max(threads // 2, 1)
+    return subscribers
+
+metrics_registry.register(GaugeFunction(
+    'app_live_subscribers', 'Open live dashboard streams', lambda: live_feed.stats()['subscribers']))
+
+# Dashboard data cache, invalidated by every client/category write
+dashboard_cache = app_resource('dashboard_cache')
+
+# Validators of recently served client details, so a revalidation can be answered without a query
+client_validators = app_resource('client_validators')
+# Rendered template fragments that depend only on dashboard data (sidebar, chart data, recent clients)
+fragment_cache = app_resource('fragment_cache')
+
+# Clients per day and category for the growth charts, brought up to date by the requests that read it.
+# Requests never rebuild it; a rollup that needs repair gets a rollup_rebuild job (registered below).
+rollup_refresher = app_resource('rollup_refresher')
+
+def invalidate_dashboard_cache():
+    """Call after committing a write that changes clients or categories"""
+    dashboard_cache.bump()
+    client_validators.bump()
+    fragment_cache.bump()
+    live_feed.notify()
+
+def load_dashboard_data():
+    """Run the dashboard queries"""
+    db = get_db()
+    cursor = db.cursor()
+    
+    # Get category distribution from the maintained summary table
+    category_data = read_category_stats(cursor)
+    
+    categories = [row[0] for row in category_data]
+    category_counts = [row[1] for row in category_data]
+    
+    # Totals follow from the per-category counts plus the clients without a category
+    total_clients = sum(category_counts) + read_uncategorized_count(cursor)
+    total_categories = len(categories)
+    
+    # Calculate average clients per category
+    avg_clients_per_category = round(total_clients / total_categories, 1) if total_categories > 0 else 0
+    
+    # Get largest category
+    largest_category = max(category_counts) if category_counts else 0
+    
+    # Get recent clients (last 10)
+    cursor.execute("SELECT name, category FROM clients ORDER BY id DESC LIMIT 10")
+    recent_clients = [{'name': row[0], 'category': row[1]} for row in cursor.fetchall()]
+    
+    cursor.close()
+    
+    return {
+        'categories': categories,
+        'category_counts': category_counts,
+        'total_clients': total_clients,
+        'total_categories': total_categories,
+        'avg_clients_per_category': avg_clients_per_category,
+        'largest_category': largest_category,
+        'recent_clients': recent_clients
+    }
 
 def get_dashboard_data():
     """Get common dashboard data"""
     try:
-        ensure_db_connection()
-        cursor = db.cursor()
-        
-        # Get category distribution
-        cursor.execute("SELECT category, COUNT(*) FROM clients GROUP BY category ORDER BY COUNT(*) DESC")
-        category_data = cursor.fetchall()
-        
-        categories = [row[0] for row in category_data]
-        category_counts = [row[1] for row in category_data]
-        
-        # Get total clients
-        cursor.execute("SELECT COUNT(*) FROM clients")
-        total_clients = cursor.fetchone()[0]
-        
-        # Get total categories
-        cursor.execute("SELECT COUNT(DISTINCT category) FROM clients")
-        total_categories = cursor.fetchone()[0]
-        
-        # Calculate average clients per category
-        avg_clients_per_category = round(total_clients / total_categories, 1) if total_categories > 0 else 0
-        
-        # Get largest category
-        largest_category = max(category_counts) if category_counts else 0
-        
-        # Get recent clients (last 10)
-        cursor.execute("SELECT name, category FROM clients ORDER BY id DESC LIMIT 10")
-        recent_clients = [{'name': row[0], 'category': row[1]} for row in cursor.fetchall()]
-        
-        # Get current time
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.close()
-        
-        return {
-            'categories': categories,
-            'category_counts': category_counts,
-            'total_clients': total_clients,
-            'total_categories': total_categories,
-            'avg_clients_per_category': avg_clients_per_category,
-            'largest_category': largest_category,
-            'recent_clients': recent_clients,
-            'current_time': current_time
-        }
+        data = dashboard_cache.get_or_compute('dashboard', load_dashboard_data)
+        # Routes add their own keys, so hand out a copy of the cached dict
+        data = dict(data)
+        data['current_time'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return data
     except Exception as e:
         logger.error(f"Database error: {e}")
+        g.data_unavailable = True
         return {
             'categories': [],
             'category_counts': [],
@@ -119,20 +364,130 @@ def get_dashboard_data():
             'current_time': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
-@app.route('/')
+@bp.app_template_global()
+def cached_fragment(name, **params):
+    """Render templates/partials/<name> from the dashboard data plus params, once per data version.
+
+    Fragments see only the dashboard data and params, not the page's context,
+    so the same HTML can be reused by every page and user.
+    """
+    key = (name, tuple(sorted(params.items())))
+    html = fragment_cache.get(key)
+    if html is None:
+        version = fragment_cache.version
+        context = get_dashboard_data()
+        context.update(params)
+        html = Markup(current_app.jinja_env.get_template(f'partials/{name}').render(context))
+        # Fallback data from a failed query is not worth keeping
+        if not g.get('data_unavailable'):
+            fragment_cache.set(key, html, version)
+    return html
+
+# Static assets under content-hashed names, so browsers keep them until they change
+asset_pipeline = app_resource('asset_pipeline')
+
+@bp.app_template_global()
+def asset_url(name):
+    """URL of a file under static/ that may be cached forever"""
+    return asset_pipeline.url(name) or url_for('static', filename=name)
+
+@bp.route('/assets/<path:filename>')
+def serve_asset(filename):
+    asset, current = asset_pipeline.lookup(filename)
+    if asset is None:
+        return Response('Not found\n', status=404, mimetype='text/plain')
+    
+    # The best precompressed variant the browser accepts; nothing is compressed per request
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), asset.variants)
+    response = send_file(
+        asset.variants[encoding] if encoding else asset.path,
+        mimetype=asset.mimetype,
+        etag=f"{asset.digest[:ASSET_HASH_LENGTH]}-{encoding or 'identity'}",
+        conditional=True
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # A page rendered before a deploy may still ask for an old fingerprint; it gets today's file, briefly cached
+    response.headers['Cache-Control'] = (f'public, max-age={ASSET_MAX_AGE}, immutable' if current
+                                         else 'public, no-cache')
+    return response
+
+# Conditional GETs: validators come from the in-process data version, so a 304 costs no query
+CONDITIONAL_BOOT_ID = uuid.uuid4().hex
+
+def data_validators():
+    """(etag, last_modified) for the current data as this user sees it, or None when caching is off.
+
+    Writes made here bump the version at once; writes from other processes are
+    only seen once the cache TTL window rolls over, the same staleness bound as
+    the dashboard cache. The session fields the pages show are part of the
+    etag, and the login time is part of Last-Modified, so a 304 never crosses users.
+    """
+    ttl = current_app.config['DASHBOARD_CACHE_TTL']
+    if ttl <= 0:
+        return None
+    now = time.time()
+    window = int(now // ttl)
+    user = [session.get(key) for key in ('user_id', 'username', 'full_name', 'email', 'role', 'login_at')]
+    seed = json.dumps([CONDITIONAL_BOOT_ID, dashboard_cache.version, window, request.full_path, user])
+    etag = hashlib.sha1(seed.encode('utf-8')).hexdigest()
+    changed = max(dashboard_cache.last_modified, window * ttl, session.get('login_at', 0))
+    return etag, datetime.fromtimestamp(int(changed), timezone.utc)
+
+def not_modified(etag, last_modified):
+    """Whether the request's validators still match; If-None-Match wins over If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+def set_validators(response, etag, last_modified, weak=False):
+    response.set_etag(etag, weak=weak)
+    response.last_modified = last_modified
+    # Browsers may keep the page, but must check back every time; shared caches must not keep it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def conditional_on_data(view):
+    """Serve If-None-Match / If-Modified-Since requests for a view built from client data with a 304.
+
+    The view only runs when the validators no longer match. Pages that carry a
+    flashed message or were built while the database was unreachable get no validators.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or 'logged_in' not in session or '_flashes' in session:
+            return view(*args, **kwargs)
+        validators = data_validators()
+        if validators is None:
+            return view(*args, **kwargs)
+        etag, last_modified = validators
+        if not_modified(etag, last_modified):
+            return set_validators(Response(status=304), etag, last_modified, weak=True)
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or g.get('data_unavailable'):
+            return response
+        # Weak: the body also carries the render time
+        return set_validators(response, etag, last_modified, weak=True)
+    return wrapper
+
+@bp.route('/')
 def index():
     if 'logged_in' in session:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         
         try:
-            ensure_db_connection()
+            db = get_db()
             cursor = db.cursor()
             
             # Hash the password for comparison
@@ -162,9 +517,10 @@ def login():
                 session['email'] = user[2]
                 session['full_name'] = user[3]
                 session['role'] = user[4]
+                session['login_at'] = int(time.time())
                 
                 logger.info(f"User {username} logged in successfully")
-                return redirect(url_for('dashboard'))
+                return redirect(url_for('main.dashboard'))
             else:
                 logger.warning(f"Failed login attempt for username: {username}")
                 return render_template('login.html', error='Invalid credentials')
@@ -175,64 +531,237 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
+@conditional_on_data
 def dashboard():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('dashboard.html', **data)
 
-@app.route('/overview')
+@bp.route('/overview')
+@conditional_on_data
 def overview():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('overview.html', **data)
 
-@app.route('/analytics')
+@bp.route('/analytics')
+@conditional_on_data
 def analytics():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('analytics.html', **data)
 
-@app.route('/clients')
+@bp.route('/analytics/timeseries')
+@conditional_on_data
+def analytics_timeseries():
+    """New clients per day, week or month, read from the daily rollup instead of the clients table"""
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    interval = request.args.get('interval', 'month')
+    if interval not in ROLLUP_INTERVALS:
+        return jsonify({'error': f"interval must be one of {', '.join(ROLLUP_INTERVALS)}"}), 400
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates (YYYY-MM-DD)'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    category = request.args.get('category', '').strip() or None
+    top = min(max(request.args.get('top', ROLLUP_TOP_CATEGORIES, type=int), 1), 20)
+    
+    try:
+        rollup_refresher.maybe_refresh()
+    except Exception as e:
+        # Serve the rollup as it stands; the next request tries again after ROLLUP_MAX_AGE
+        logger.warning(f"Client rollup refresh failed: {e}")
+    
+    try:
+        db = get_db()
+        cursor = db.cursor()
+        growth = client_growth(cursor, interval, start, end, category=category, top=top)
+        cursor.close()
+        return jsonify(growth)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Time series error: {e}")
+        return jsonify({'error': 'Failed to load time series'}), 500
+
+@bp.route('/clients')
 def clients():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
+    
+    # The table itself is loaded page by page from /clients/api
+    data = get_dashboard_data()
+    return render_template('clients.html', **data)
+
+# Keyset pagination for the clients table
+CLIENT_SORT_COLUMNS = {'id': 'id', 'name': 'name', 'category': 'category'}
+CLIENT_PAGE_SIZE = 10
+CLIENT_PAGE_MAX = 100
+
+def encode_page_cursor(value, client_id):
+    """Opaque cursor pointing just past the row with this sort value and id"""
+    raw = json.dumps([value, client_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_page_cursor(token):
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    value, client_id = json.loads(raw)
+    if not isinstance(client_id, int) or not (value is None or isinstance(value, (str, int))):
+        raise ValueError("Malformed cursor")
+    return value, client_id
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def keyset_condition(column, order, value, last_id):
+    """WHERE clause selecting the rows after (value, last_id) in ORDER BY column, id"""
+    if column == 'id':
+        return ("id < %s", [last_id]) if order == 'desc' else ("id > %s", [last_id])
+    # NULLs sort first ascending and last descending in MySQL
+    if order == 'asc':
+        if value is None:
+            return (f"(({column} IS NULL AND id > %s) OR {column} IS NOT NULL)", [last_id])
+        return (f"({column} > %s OR ({column} = %s AND id > %s))", [value, value, last_id])
+    if value is None:
+        return (f"({column} IS NULL AND id < %s)", [last_id])
+    return (f"({column} < %s OR ({column} = %s AND id < %s) OR {column} IS NULL)", [value, value, last_id])
+
+@bp.route('/clients/api')
+def clients_api():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    sort = request.args.get('sort', 'id')
+    order = request.args.get('order', 'desc' if sort == 'id' else 'asc')
+    if sort not in CLIENT_SORT_COLUMNS or order not in ('asc', 'desc'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    column = CLIENT_SORT_COLUMNS[sort]
+    limit = min(max(request.args.get('limit', CLIENT_PAGE_SIZE, type=int), 1), CLIENT_PAGE_MAX)
+    category = request.args.get('category', '').strip()
+    search = request.args.get('q', '').strip()
+    
+    conditions = []
+    params = []
+    if category:
+        conditions.append("category = %s")
+        params.append(category)
+    if search:
+        # Prefix match so an index on name can be used
+        conditions.append("name LIKE %s")
+        params.append(escape_like(search) + '%')
+    
+    page_cursor = request.args.get('cursor')
+    if page_cursor:
+        try:
+            value, last_id = decode_page_cursor(page_cursor)
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        condition, condition_params = keyset_condition(column, order, value, last_id)
+        conditions.append(condition)
+        params.extend(condition_params)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    direction = order.upper()
+    order_by = f"id {direction}" if column == 'id' else f"{column} {direction}, id {direction}"
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
-        cursor.execute("SELECT id, name, category FROM clients ORDER BY id DESC")
-        all_clients = [{'id': row[0], 'name': row[1], 'category': row[2]} for row in cursor.fetchall()]
+        # Fetch one extra row to learn whether another page follows
+        cursor.execute(f"SELECT id, name, category FROM clients {where} ORDER BY {order_by} LIMIT %s",
+                       tuple(params) + (limit + 1,))
+        rows = cursor.fetchall()
         cursor.close()
         
-        data = get_dashboard_data()
-        data['all_clients'] = all_clients
-        # Get unique categories for the filter dropdown
-        data['categories'] = data.get('categories', [])
-        return render_template('clients.html', **data)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            sort_value = last[('id', 'name', 'category').index(column)]
+            next_cursor = encode_page_cursor(sort_value, last[0])
+        
+        # Totals come from category_stats; a name search would need a count query, so it has none
+        total = None
+        if not search:
+            data = get_dashboard_data()
+            counts = dict(zip(data['categories'], data['category_counts']))
+            total = counts.get(category, 0) if category else data['total_clients']
+        
+        return jsonify({
+            'clients': [{'id': row[0], 'name': row[1], 'category': row[2]} for row in rows],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'total': total,
+            'limit': limit
+        })
     except Exception as e:
-        logger.error(f"Database error: {e}")
-        data = get_dashboard_data()
-        data['all_clients'] = []
-        data['categories'] = []
-        return render_template('clients.html', **data)
+        logger.error(f"Clients API error: {e}")
+        return jsonify({'error': 'Failed to load clients'}), 500
 
-@app.route('/categories')
+@bp.route('/clients/search')
+def clients_search():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    text = request.args.get('q', '').strip()
+    category = request.args.get('category', '').strip()
+    limit = min(max(request.args.get('limit', CLIENT_PAGE_SIZE, type=int), 1), CLIENT_PAGE_MAX)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    if offset > SEARCH_MAX_OFFSET:
+        return jsonify({'error': f'Offset is limited to {SEARCH_MAX_OFFSET}, refine the search instead'}), 400
+    
+    query = boolean_query(text)
+    if query is None:
+        return jsonify({'error': f'Enter at least one word of {SEARCH_MIN_TOKEN} or more characters'}), 400
+    
+    try:
+        db = get_db()
+        cursor = db.cursor()
+        # One extra row tells whether another page follows
+        rows, facets = search_clients(cursor, query, category or None, limit + 1, offset)
+        cursor.close()
+        
+        has_more = len(rows) > limit and offset + limit <= SEARCH_MAX_OFFSET
+        counts = dict(facets)
+        total = counts.get(category, 0) if category else sum(counts.values())
+        
+        return jsonify({
+            'query': text,
+            'clients': [{'id': row[0], 'name': row[1], 'category': row[2], 'email': row[3],
+                         'phone': row[4], 'score': round(float(row[5]), 4)} for row in rows[:limit]],
+            'facets': [{'category': name, 'count': count} for name, count in facets],
+            'has_more': has_more,
+            'total': total,
+            'limit': limit,
+            'offset': offset
+        })
+    except Exception as e:
+        logger.error(f"Client search error: {e}")
+        return jsonify({'error': 'Search failed'}), 500
+
+@bp.route('/categories')
+@conditional_on_data
 def categories():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
-        cursor.execute("SELECT category, COUNT(*) as count FROM clients GROUP BY category ORDER BY count DESC")
-        category_stats = [{'category': row[0], 'count': row[1]} for row in cursor.fetchall()]
+        category_stats = [{'category': row[0], 'count': row[1]} for row in read_category_stats(cursor)]
         cursor.close()
         
         data = get_dashboard_data()
@@ -240,280 +769,316 @@ def categories():
         return render_template('categories.html', **data)
     except Exception as e:
         logger.error(f"Database error: {e}")
+        g.data_unavailable = True
         data = get_dashboard_data()
         data['category_stats'] = []
         return render_template('categories.html', **data)
 
-@app.route('/recent')
+@bp.route('/recent')
+@conditional_on_data
 def recent():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('recent.html', **data)
 
-@app.route('/settings')
+@bp.route('/settings')
 def settings():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('settings.html', **data)
 
-@app.route('/database')
+@bp.route('/database')
 def database():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('database.html', **data)
 
-@app.route('/logs')
+@bp.route('/logs')
 def logs():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
+    data['slow_queries'] = slow_query_log.entries(limit=request.args.get('limit', 100, type=int))
+    data['slow_query_stats'] = slow_query_log.stats()
     return render_template('logs.html', **data)
 
-@app.route('/reports')
+@bp.route('/reports')
 def reports():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('reports.html', **data)
 
-@app.route('/export')
+@bp.route('/export')
 def export():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('export.html', **data)
 
-@app.route('/profile')
+@bp.route('/profile')
 def profile():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     data = get_dashboard_data()
     return render_template('profile.html', **data)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     logger.info(f"User {session.get('username', 'unknown')} logged out")
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 # Functional routes for buttons and actions
 
-@app.route('/export/csv')
+def export_filename(extension, prefix='clients_export'):
+    return f'{prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+def export_response(blocks, mimetype, filename):
+    """Wrap a stream of byte blocks as a download, gzipped on ?gzip=1"""
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        level = min(max(request.args.get('level', 6, type=int), 1), 9)
+        return Response(
+            gzip_stream(blocks, level),
+            mimetype='application/gzip',
+            headers={'Content-Disposition': f'attachment; filename={filename}.gz'}
+        )
+    return Response(
+        blocks,
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@bp.route('/export/csv')
+@conditional_on_data
 def export_csv():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        ensure_db_connection()
-        cursor = db.cursor()
-        cursor.execute("SELECT id, name, category FROM clients ORDER BY id")
-        clients = cursor.fetchall()
-        cursor.close()
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['ID', 'Client Name', 'Category'])
-        writer.writerows(clients)
-        
-        output.seek(0)
-        logger.info(f"CSV export completed with {len(clients)} records")
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'clients_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        )
-    except Exception as e:
-        logger.error(f"Export error: {e}")
-        return jsonify({'error': 'Export failed'}), 500
+        columns = parse_export_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Rows are streamed from an unbuffered cursor straight into the response
+    chunks = iter_row_chunks(db_pool, client_export_query(columns))
+    headers = [CLIENT_EXPORT_COLUMNS[column] for column in columns]
+    return export_response(csv_stream(chunks, headers), 'text/csv', export_filename('csv'))
 
-@app.route('/export/json')
+@bp.route('/export/json')
+@conditional_on_data
 def export_json():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        ensure_db_connection()
-        cursor = db.cursor()
-        cursor.execute("SELECT id, name, category FROM clients ORDER BY id")
-        clients = cursor.fetchall()
+        columns = parse_export_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Compact by default; ?indent=2 for human-readable output, ?format=array for a bare array
+    indent = request.args.get('indent', type=int)
+    envelope = request.args.get('format', 'object') != 'array'
+    chunks = iter_row_chunks(db_pool, client_export_query(columns))
+    return export_response(json_stream(chunks, columns, envelope=envelope, indent=indent),
+                           'application/json', export_filename('json'))
+
+@bp.route('/export/ndjson')
+@conditional_on_data
+def export_ndjson():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    try:
+        columns = parse_export_columns(request.args.get('columns'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    chunks = iter_row_chunks(db_pool, client_export_query(columns))
+    return export_response(ndjson_stream(chunks, columns), 'application/x-ndjson', export_filename('ndjson'))
+
+def columnar_export(fmt):
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    if not columnar_available():
+        return jsonify({'error': 'Parquet and Arrow exports need pyarrow on the server'}), 501
+    
+    try:
+        # All columns unless ?columns= narrows them
+        columns = (parse_export_columns(request.args.get('columns')) if request.args.get('columns')
+                   else list(CLIENT_EXPORT_COLUMNS))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    compression = request.args.get('compression', 'zstd').lower()
+    if compression not in COLUMNAR_COMPRESSION[fmt]:
+        return jsonify({'error': f"compression must be one of {', '.join(COLUMNAR_COMPRESSION[fmt])}"}), 400
+    row_group_size = min(max(request.args.get('row_group_size', COLUMNAR_ROW_GROUP_SIZE, type=int),
+                             COLUMNAR_MIN_ROW_GROUP_SIZE), COLUMNAR_MAX_ROW_GROUP_SIZE)
+    
+    try:
+        cursor = get_db().cursor()
+        categories = load_categories(cursor) if 'category' in columns else []
         cursor.close()
-        
-        data = {
-            'export_date': datetime.now().isoformat(),
-            'total_clients': len(clients),
-            'clients': [{'id': row[0], 'name': row[1], 'category': row[2]} for row in clients]
-        }
-        
-        logger.info(f"JSON export completed with {len(clients)} records")
-        return send_file(
-            io.BytesIO(json.dumps(data, indent=2).encode('utf-8')),
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=f'clients_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        )
     except Exception as e:
-        logger.error(f"Export error: {e}")
+        logger.error(f"{fmt} export error: {e}")
         return jsonify({'error': 'Export failed'}), 500
+    
+    # One row group (Parquet) or record batch (Arrow) per chunk read from the unbuffered cursor
+    chunks = iter_row_chunks(db_pool, client_export_query(columns), chunk_size=row_group_size)
+    mimetype, extension = COLUMNAR_FORMATS[fmt]
+    return export_response(columnar_stream(chunks, columns, categories, fmt, compression),
+                           mimetype, export_filename(extension))
+
+@bp.route('/export/parquet')
+@conditional_on_data
+def export_parquet():
+    return columnar_export('parquet')
 
-@app.route('/export/logs')
+@bp.route('/export/arrow')
+@conditional_on_data
+def export_arrow():
+    return columnar_export('arrow')
+
+@bp.route('/export/logs')
 def export_logs():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
-    
-    # Create sample log data
-    log_data = [
-        {'timestamp': '2024-01-15 14:30:25', 'level': 'INFO', 'message': 'User admin logged in successfully'},
-        {'timestamp': '2024-01-15 14:28:12', 'level': 'SUCCESS', 'message': 'Database backup completed'},
-        {'timestamp': '2024-01-15 14:25:45', 'level': 'WARNING', 'message': 'High memory usage detected'},
-        {'timestamp': '2024-01-15 14:22:18', 'level': 'ERROR', 'message': 'Failed to connect to external API'},
-        {'timestamp': '2024-01-15 14:20:33', 'level': 'INFO', 'message': 'New client added'},
-    ]
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Timestamp', 'Level', 'Message'])
-    for log in log_data:
-        writer.writerow([log['timestamp'], log['level'], log['message']])
-    
-    output.seek(0)
-    logger.info("Logs export completed")
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'system_logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    )
+        return redirect(url_for('main.login'))
+    
+    # The slow-query log, oldest first, with each captured plan as JSON
+    headers = ['Timestamp', 'Duration (ms)', 'Rows', 'Rows Examined', 'Rows Examined Source',
+               'Statement', 'Parameters', 'Explain']
+    rows = [[entry['timestamp'], entry['duration_ms'], entry['rows'], entry['rows_examined'],
+             entry['rows_examined_source'], entry['statement'], entry['params'],
+             json.dumps(entry['explain']) if entry['explain'] else entry['explain_error']]
+            for entry in reversed(slow_query_log.entries())]
+    return export_response(csv_stream([rows], headers, label='Slow query log export'), 'text/csv',
+                           export_filename('csv', prefix='slow_queries'))
 
-@app.route('/database/backup')
+@bp.route('/database/backup')
 def database_backup():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
+    # Streamed dump with multi-row INSERTs; ?batch=N rows per INSERT, ?gzip=1 to compress
+    batch_size = min(max(request.args.get('batch', BACKUP_BATCH_SIZE, type=int), 1), 10000)
+    return export_response(
+        sql_dump_stream(db_pool, batch_size=batch_size),
+        'application/sql',
+        export_filename('sql', prefix='database_backup')
+    )
+
+# Rendered reports, reused until the data or the parameters change
+report_snapshots = app_resource('report_snapshots')
+
+def report_snapshot(params):
+    """Path of the rendered report for these parameters, rendering it only if the data changed"""
     try:
-        ensure_db_connection()
-        cursor = db.cursor()
-        cursor.execute("SELECT id, name, category FROM clients ORDER BY id")
-        clients = cursor.fetchall()
-        cursor.close()
-        
-        # Create SQL backup
-        sql_backup = f"""-- Database Backup
--- Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
--- Total clients: {len(clients)}
-
-DROP TABLE IF EXISTS clients;
-CREATE TABLE clients (
-    id INT AUTO_INCREMENT PRIMARY KEY,
-    name VARCHAR(255) NOT NULL,
-    category VARCHAR(100) NOT NULL
-);
-
-"""
-        
-        for client in clients:
-            sql_backup += f"INSERT INTO clients (id, name, category) VALUES ({client[0]}, '{client[1]}', '{client[2]}');\n"
-        
-        logger.info(f"Database backup completed with {len(clients)} records")
-        return send_file(
-            io.BytesIO(sql_backup.encode('utf-8')),
-            mimetype='application/sql',
-            as_attachment=True,
-            download_name=f'database_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.sql'
-        )
+        rollup_refresher.maybe_refresh()
     except Exception as e:
-        logger.error(f"Backup error: {e}")
-        return jsonify({'error': 'Backup failed'}), 500
+        logger.warning(f"Client rollup refresh failed: {e}")
+    
+    cursor = get_db().cursor()
+    try:
+        version = f"{report_data_version(cursor)}|{dashboard_cache.version}"
+    finally:
+        cursor.close()
+    
+    def render(out):
+        cursor = get_db().cursor()
+        try:
+            summary = load_report_summary(cursor, params)
+        finally:
+            cursor.close()
+        listings = iter_category_listings(db_pool, params['category']) if params['listings'] else []
+        if params['format'] == 'pdf':
+            write_pdf_report(out, summary, listings)
+        else:
+            write_html_report(out, current_app.jinja_env.get_template('report.html'), summary, listings)
+    
+    return report_snapshots.get(report_key(version, params), params['format'], render)
 
-@app.route('/reports/pdf')
-def download_report_pdf():
+def report_download(fmt):
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
-    # For now, return a simple text file as PDF (in production, use a proper PDF library)
+    values = dict(request.args.to_dict(), format=fmt)
     try:
-        data = get_dashboard_data()
-        
-        report_content = f"""CLIENT MANAGEMENT SYSTEM REPORT
-Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-SUMMARY:
-- Total Clients: {data['total_clients']}
-- Total Categories: {data['total_categories']}
-- Average per Category: {data['avg_clients_per_category']}
-
-CATEGORY BREAKDOWN:
-"""
-        
-        for i, category in enumerate(data['categories']):
-            report_content += f"- {category}: {data['category_counts'][i]} clients\n"
-        
-        logger.info("PDF report generated successfully")
-        
-        # Create the file content
-        file_content = report_content.encode('utf-8')
-        file_obj = io.BytesIO(file_content)
-        file_obj.seek(0)
-        
+        params = parse_report_params(values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        path = report_snapshot(params)
+        logger.info(f"{params['format'].upper()} report served")
         return send_file(
-            file_obj,
-            mimetype='text/plain',
-            as_attachment=True,
-            download_name=f'client_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.txt'
+            path,
+            mimetype=REPORT_FORMATS[params['format']],
+            as_attachment=params['format'] == 'pdf',
+            download_name=export_filename(params['format'], prefix='client_report'),
+            conditional=True
         )
     except Exception as e:
         logger.error(f"Report error: {e}")
         return jsonify({'error': 'Report generation failed'}), 500
 
-@app.route('/logs/clear')
+@bp.route('/reports/pdf')
+def download_report_pdf():
+    return report_download('pdf')
+
+@bp.route('/reports/html')
+def download_report_html():
+    return report_download('html')
+
+@bp.route('/logs/clear')
 def clear_logs():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        # In a real application, this would clear actual log files
-        # For now, just return success
-        logger.info("Logs cleared by user")
+        # Empties the in-memory buffer shown on /logs; the rotating log file is kept
+        slow_query_log.clear()
+        logger.info(f"Slow query log cleared by {session.get('username')}")
         return jsonify({'message': 'Logs cleared successfully'})
     except Exception as e:
         logger.error(f"Clear logs error: {e}")
         return jsonify({'error': 'Failed to clear logs'}), 500
 
-@app.route('/database/optimize')
+@bp.route('/database/optimize')
 def optimize_database():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        ensure_db_connection()
-        cursor = db.cursor()
-        cursor.execute("OPTIMIZE TABLE clients")
-        cursor.fetchall()  # Consume any unread results
-        cursor.close()
-        logger.info("Database optimization completed")
-        return jsonify({'message': 'Database optimized successfully'})
+        # OPTIMIZE TABLE rebuilds the table, so it runs as a background job
+        job_id = job_runner.submit('optimize', created_by=session.get('username'))
+        return jsonify({
+            'message': 'Database optimization started',
+            'job_id': job_id,
+            'status_url': url_for('main.job_status', job_id=job_id)
+        }), 202
+    except JobRejected as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         logger.error(f"Optimization error: {e}")
         return jsonify({'error': 'Optimization failed'}), 500
 
-@app.route('/database/test-connection')
+@bp.route('/database/test-connection')
 def test_database_connection():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("SELECT 1")
         cursor.fetchall()  # Consume any unread results
@@ -524,10 +1089,60 @@ def test_database_connection():
         logger.error(f"Connection test error: {e}")
         return jsonify({'error': 'Database connection failed'}), 500
 
-@app.route('/settings/save', methods=['POST'])
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text format; needs a logged-in session or `Authorization: Bearer $METRICS_TOKEN`"""
+    authorization = request.headers.get('Authorization', '')
+    token = current_app.config['METRICS_TOKEN']
+    token_ok = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    if 'logged_in' not in session and not token_ok:
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/live/dashboard')
+def live_dashboard():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    # A snapshot first, then a delta after every change; no database work happens per connection
+    try:
+        subscriber = live_feed.subscribe()
+    except FeedFull as e:
+        # EventSource gives up on a 503, and live.js switches to polling /live/dashboard/snapshot
+        response = jsonify({'error': str(e), 'poll_url': url_for('main.live_dashboard_snapshot')})
+        response.headers['Retry-After'] = str(int(live_feed.poll_interval))
+        return response, 503
+    return Response(
+        live_feed.stream(subscriber, lifetime=current_app.config['LIVE_MAX_STREAM_SECONDS']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@bp.route('/live/dashboard/snapshot')
+def live_dashboard_snapshot():
+    """The state a stream's snapshot event carries, for pages that poll"""
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    try:
+        response = jsonify(live_feed.current())
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        logger.error(f"Live snapshot error: {e}")
+        return jsonify({'error': 'Failed to load dashboard data'}), 500
+
+@bp.route('/database/pool-stats')
+def database_pool_stats():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    return jsonify(db_pool.stats())
+
+@bp.route('/settings/save', methods=['POST'])
 def save_settings():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         # In a real application, you would save settings to database or config file
@@ -537,10 +1152,10 @@ def save_settings():
         logger.error(f"Save settings error: {e}")
         return jsonify({'error': 'Failed to save settings'}), 500
 
-@app.route('/settings/reset')
+@bp.route('/settings/reset')
 def reset_settings():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         # In a real application, you would reset to default settings
@@ -550,23 +1165,23 @@ def reset_settings():
         logger.error(f"Reset settings error: {e}")
         return jsonify({'error': 'Failed to reset settings'}), 500
 
-@app.route('/settings/clear-cache')
+@bp.route('/settings/clear-cache')
 def clear_cache():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        # In a real application, you would clear application cache
+        invalidate_dashboard_cache()
         logger.info("Cache cleared by user")
         return jsonify({'message': 'Cache cleared successfully'})
     except Exception as e:
         logger.error(f"Clear cache error: {e}")
         return jsonify({'error': 'Failed to clear cache'}), 500
 
-@app.route('/profile/save', methods=['POST'])
+@bp.route('/profile/save', methods=['POST'])
 def save_profile():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         # In a real application, you would save profile data
@@ -576,10 +1191,10 @@ def save_profile():
         logger.error(f"Save profile error: {e}")
         return jsonify({'error': 'Failed to save profile'}), 500
 
-@app.route('/profile/change-password', methods=['POST'])
+@bp.route('/profile/change-password', methods=['POST'])
 def change_password():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         current_password = request.form.get('current_password')
@@ -593,7 +1208,7 @@ def change_password():
         current_password_hash = hashlib.sha256(current_password.encode()).hexdigest()
         new_password_hash = hashlib.sha256(new_password.encode()).hexdigest()
         
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         
         # Verify current password
@@ -616,17 +1231,17 @@ def change_password():
         return jsonify({'error': 'Failed to update password'}), 500
 
 # User management routes
-@app.route('/users')
+@bp.route('/users')
 def users():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     # Only admin can access user management
     if session.get('role') != 'admin':
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("""
             SELECT id, username, email, full_name, role, is_active, 
@@ -657,7 +1272,7 @@ def users():
         data['all_users'] = []
         return render_template('users.html', **data)
 
-@app.route('/users/add', methods=['POST'])
+@bp.route('/users/add', methods=['POST'])
 def add_user():
     if 'logged_in' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -675,7 +1290,7 @@ def add_user():
         # Hash the password
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("""
             INSERT INTO users (username, password_hash, email, full_name, role) 
@@ -692,7 +1307,7 @@ def add_user():
         logger.error(f"Add user error: {e}")
         return jsonify({'error': 'Failed to add user'}), 500
 
-@app.route('/users/edit/<int:user_id>', methods=['POST'])
+@bp.route('/users/edit/<int:user_id>', methods=['POST'])
 def edit_user(user_id):
     if 'logged_in' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -703,7 +1318,7 @@ def edit_user(user_id):
         role = request.form.get('role', 'user')
         is_active = request.form.get('is_active', '1') == '1'
         
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("""
             UPDATE users SET email = %s, full_name = %s, role = %s, is_active = %s 
@@ -718,7 +1333,7 @@ def edit_user(user_id):
         logger.error(f"Edit user error: {e}")
         return jsonify({'error': 'Failed to update user'}), 500
 
-@app.route('/users/delete/<int:user_id>', methods=['DELETE'])
+@bp.route('/users/delete/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     if 'logged_in' not in session or session.get('role') != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
@@ -728,7 +1343,7 @@ def delete_user(user_id):
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
         db.commit()
@@ -740,10 +1355,10 @@ def delete_user(user_id):
         logger.error(f"Delete user error: {e}")
         return jsonify({'error': 'Failed to delete user'}), 500
 
-@app.route('/export/advanced')
+@bp.route('/export/advanced')
 def export_advanced():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         # In a real application, you would show advanced export options
@@ -753,10 +1368,10 @@ def export_advanced():
         logger.error(f"Advanced export error: {e}")
         return jsonify({'error': 'Failed to load advanced options'}), 500
 
-@app.route('/database/restore', methods=['POST'])
+@bp.route('/database/restore', methods=['POST'])
 def restore_database():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         # In a real application, you would handle file upload and restore
@@ -766,36 +1381,64 @@ def restore_database():
         logger.error(f"Database restore error: {e}")
         return jsonify({'error': 'Failed to restore database'}), 500
 
-@app.route('/database/clear-cache')
+@bp.route('/database/clear-cache')
 def clear_database_cache():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        # In a real application, you would clear database cache
+        invalidate_dashboard_cache()
         logger.info("Database cache cleared")
         return jsonify({'message': 'Cache cleared successfully'})
     except Exception as e:
         logger.error(f"Clear cache error: {e}")
         return jsonify({'error': 'Failed to clear cache'}), 500
 
-@app.route('/reports/email', methods=['POST'])
+@bp.route('/reports/email', methods=['POST'])
 def email_report():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
+    
+    values = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        params = parse_report_params(values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    config = current_app.config
+    recipient = str(values.get('to') or session.get('email') or '').strip()
+    allowed = parse_allowed_recipients(config['REPORT_MAIL_ALLOWED'])
+    if recipient and not recipient_allowed(recipient, session.get('email'), allowed):
+        logger.warning(f"User {session.get('username')} tried to email a report to {recipient}")
+        return jsonify({'error': 'Reports can only be sent to your own email address'}), 403
     
     try:
-        # In a real application, you would send email with report
-        logger.info("Email report requested")
-        return jsonify({'message': 'Email functionality would be implemented here'})
+        # The same snapshot a download would get; nothing is queried or rendered again if it exists
+        path = report_snapshot(params)
+        report = {
+            'format': params['format'],
+            'size': os.path.getsize(path),
+            'url': url_for(f"main.download_report_{params['format']}", months=params['months'],
+                           listings=int(params['listings']), category=params['category'])
+        }
+        if not config['REPORT_SMTP_HOST']:
+            logger.info("Email report requested, but REPORT_SMTP_HOST is not set")
+            return jsonify({'message': 'Report is ready; email delivery is not configured', 'report': report})
+        if not recipient:
+            return jsonify({'error': 'No recipient given and your profile has no email address'}), 400
+        
+        send_report_email(path, export_filename(params['format'], prefix='client_report'),
+                          REPORT_FORMATS[params['format']], recipient, config['REPORT_SMTP_HOST'],
+                          port=config['REPORT_SMTP_PORT'], sender=config['REPORT_MAIL_FROM'])
+        logger.info(f"Report emailed to {recipient}")
+        return jsonify({'message': f'Report sent to {recipient}', 'report': report})
     except Exception as e:
         logger.error(f"Email report error: {e}")
         return jsonify({'error': 'Failed to send email'}), 500
 
-@app.route('/export/save-template', methods=['POST'])
+@bp.route('/export/save-template', methods=['POST'])
 def save_export_template():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         # In a real application, you would save export template
@@ -806,10 +1449,10 @@ def save_export_template():
         return jsonify({'error': 'Failed to save template'}), 500
 
 # Add client management functionality
-@app.route('/clients/add', methods=['POST'])
+@bp.route('/clients/add', methods=['POST'])
 def add_client():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         name = request.form.get('name')
@@ -822,14 +1465,16 @@ def add_client():
         if not name or not category:
             return jsonify({'error': 'Name and category are required'}), 400
         
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("""
             INSERT INTO clients (name, category, email, phone, address, notes) 
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (name, category, email, phone, address, notes))
+        apply_category_deltas(cursor, {category: 1})
         db.commit()
         cursor.close()
+        invalidate_dashboard_cache()
         
         logger.info(f"New client added: {name} in category {category}")
         return jsonify({'message': 'Client added successfully'})
@@ -837,10 +1482,10 @@ def add_client():
         logger.error(f"Add client error: {e}")
         return jsonify({'error': 'Failed to add client'}), 500
 
-@app.route('/clients/edit/<int:client_id>', methods=['POST'])
+@bp.route('/clients/edit/<int:client_id>', methods=['POST'])
 def edit_client(client_id):
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         name = request.form.get('name')
@@ -853,14 +1498,20 @@ def edit_client(client_id):
         if not name or not category:
             return jsonify({'error': 'Name and category are required'}), 400
         
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
+        old_categories = lock_client_categories(cursor, [client_id])
         cursor.execute("""
             UPDATE clients SET name = %s, category = %s, email = %s, phone = %s, address = %s, notes = %s 
             WHERE id = %s
         """, (name, category, email, phone, address, notes, client_id))
+        if old_categories:
+            deltas = Counter({category: sum(old_categories.values())})
+            deltas.subtract(old_categories)
+            apply_category_deltas(cursor, deltas)
         db.commit()
         cursor.close()
+        invalidate_dashboard_cache()
         
         logger.info(f"Client {client_id} updated: {name} in category {category}")
         return jsonify({'message': 'Client updated successfully'})
@@ -868,17 +1519,21 @@ def edit_client(client_id):
         logger.error(f"Edit client error: {e}")
         return jsonify({'error': 'Failed to update client'}), 500
 
-@app.route('/clients/delete/<int:client_id>', methods=['DELETE'])
+@bp.route('/clients/delete/<int:client_id>', methods=['DELETE'])
 def delete_client(client_id):
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
+        old_categories = lock_client_categories(cursor, [client_id])
+        remove_clients_from_rollup(cursor, "clients.id = %s", (client_id,))
         cursor.execute("DELETE FROM clients WHERE id = %s", (client_id,))
+        apply_category_deltas(cursor, {category: -count for category, count in old_categories.items()})
         db.commit()
         cursor.close()
+        invalidate_dashboard_cache()
         
         logger.info(f"Client {client_id} deleted")
         return jsonify({'message': 'Client deleted successfully'})
@@ -887,10 +1542,10 @@ def delete_client(client_id):
         return jsonify({'error': 'Failed to delete client'}), 500
 
 # Add category management functionality
-@app.route('/categories/add', methods=['POST'])
+@bp.route('/categories/add', methods=['POST'])
 def add_category():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         category_name = request.form.get('category_name')
@@ -899,11 +1554,13 @@ def add_category():
             return jsonify({'error': 'Category name is required'}), 400
         
         # Add a sample client to the new category
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("INSERT INTO clients (name, category) VALUES (%s, %s)", (f'Sample Client - {category_name}', category_name))
+        apply_category_deltas(cursor, {category_name: 1})
         db.commit()
         cursor.close()
+        invalidate_dashboard_cache()
         
         logger.info(f"New category added: {category_name}")
         return jsonify({'message': 'Category added successfully'})
@@ -911,29 +1568,43 @@ def add_category():
         logger.error(f"Add category error: {e}")
         return jsonify({'error': 'Failed to add category'}), 500
 
-@app.route('/categories/delete/<category_name>', methods=['DELETE'])
+@bp.route('/categories/delete/<category_name>', methods=['DELETE'])
 def delete_category(category_name):
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
+    # ?dry_run=1 only counts the clients that would be deleted
+    dry_run = is_dry_run(request.args)
     try:
-        ensure_db_connection()
-        cursor = db.cursor()
-        cursor.execute("DELETE FROM clients WHERE category = %s", (category_name,))
-        db.commit()
-        cursor.close()
+        result = delete_category_clients(get_db(), category_name, dry_run=dry_run,
+                                         progress=bulk_progress(f"Delete category {category_name}"))
+        if dry_run:
+            return jsonify({'message': f'{result.affected} clients would be deleted', **result.to_dict()})
         
-        logger.info(f"Category deleted: {category_name}")
-        return jsonify({'message': 'Category deleted successfully'})
+        logger.info(f"Category deleted: {category_name} ({result.affected} clients)")
+        return jsonify({'message': 'Category deleted successfully', **result.to_dict()})
     except Exception as e:
         logger.error(f"Delete category error: {e}")
         return jsonify({'error': 'Failed to delete category'}), 500
+    finally:
+        # Chunks committed before a failure are deleted too
+        if not dry_run:
+            invalidate_dashboard_cache()
+
+# Bulk changes run in chunks with a commit after each, so row locks are only held for one chunk at a time
+def is_dry_run(values):
+    return str(values.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+def bulk_progress(label):
+    def report(result):
+        logger.info(f"{label}: {result.affected} clients after {result.chunks} chunks")
+    return report
 
 # Enhanced client management endpoints
-@app.route('/clients/import', methods=['POST'])
+@bp.route('/clients/import', methods=['POST'])
 def import_clients():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     try:
         if 'file' not in request.files:
@@ -946,111 +1617,103 @@ def import_clients():
         if not file.filename.endswith('.csv'):
             return jsonify({'error': 'Please upload a CSV file'}), 400
         
-        # Read CSV file
-        content = file.read().decode('utf-8')
-        lines = content.strip().split('\n')
-        
-        # Skip header row
-        data_lines = lines[1:] if len(lines) > 1 else []
-        
-        ensure_db_connection()
-        cursor = db.cursor()
-        
-        imported_count = 0
-        for line in data_lines:
-            if line.strip():
-                parts = line.split(',')
-                if len(parts) >= 2:
-                    name = parts[0].strip()
-                    category = parts[1].strip()
-                    email = parts[2].strip() if len(parts) > 2 else ''
-                    phone = parts[3].strip() if len(parts) > 3 else ''
-                    address = parts[4].strip() if len(parts) > 4 else ''
-                    notes = parts[5].strip() if len(parts) > 5 else ''
-                    
-                    if name and category:
-                        cursor.execute("""
-                            INSERT INTO clients (name, category, email, phone, address, notes) 
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                        """, (name, category, email, phone, address, notes))
-                        imported_count += 1
-        
-        db.commit()
-        cursor.close()
-        
-        logger.info(f"Imported {imported_count} clients from CSV")
-        return jsonify({'message': f'Successfully imported {imported_count} clients'})
+        # Stream the upload through a CSV reader and insert it in batches
+        staged = request.form.get('mode', request.args.get('mode', '')) == 'staging'
+        batch_size = min(max(request.form.get('batch_size', IMPORT_BATCH_SIZE, type=int), 1), 10000)
+        db = get_db()
+        if staged:
+            result = import_clients_csv_staged(db, file.stream, batch_size=batch_size)
+        else:
+            commit_rows = max(request.form.get('commit_rows', IMPORT_COMMIT_ROWS, type=int), batch_size)
+            result = import_clients_csv(db, file.stream, batch_size=batch_size, commit_rows=commit_rows)
+        invalidate_dashboard_cache()
+        
+        message = f'Successfully imported {result.imported} clients'
+        if result.skipped:
+            message += f' ({result.skipped} rows skipped)'
+        logger.info(f"Imported {result.imported} clients from CSV, skipped {result.skipped}")
+        return jsonify({'message': message, **result.to_dict()})
+    except UnicodeDecodeError:
+        invalidate_dashboard_cache()
+        return jsonify({'error': 'CSV file must be UTF-8 encoded'}), 400
     except Exception as e:
+        # Chunks committed before the failure stay imported
+        invalidate_dashboard_cache()
         logger.error(f"Import clients error: {e}")
         return jsonify({'error': 'Failed to import clients'}), 500
 
-@app.route('/clients/bulk-delete', methods=['POST'])
+@bp.route('/clients/bulk-delete', methods=['POST'])
 def bulk_delete_clients():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
+    data = request.get_json(silent=True) or {}
     try:
-        data = request.get_json()
-        client_ids = data.get('client_ids', [])
-        
-        if not client_ids:
-            return jsonify({'error': 'No clients selected'}), 400
-        
-        ensure_db_connection()
-        cursor = db.cursor()
-        
-        # Convert list to tuple for SQL IN clause
-        placeholders = ','.join(['%s'] * len(client_ids))
-        cursor.execute(f"DELETE FROM clients WHERE id IN ({placeholders})", tuple(client_ids))
-        deleted_count = cursor.rowcount
-        
-        db.commit()
-        cursor.close()
+        client_ids = parse_bulk_ids(data.get('client_ids', []), BULK_MAX_IDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not client_ids:
+        return jsonify({'error': 'No clients selected'}), 400
+    
+    dry_run = is_dry_run(data)
+    try:
+        result = bulk_delete(get_db(), client_ids, dry_run=dry_run, progress=bulk_progress('Bulk delete'))
+        if dry_run:
+            return jsonify({'message': f'{result.affected} clients would be deleted', **result.to_dict()})
         
-        logger.info(f"Bulk deleted {deleted_count} clients")
-        return jsonify({'message': f'Successfully deleted {deleted_count} clients'})
+        logger.info(f"Bulk deleted {result.affected} clients in {result.chunks} chunks")
+        return jsonify({'message': f'Successfully deleted {result.affected} clients', **result.to_dict()})
     except Exception as e:
         logger.error(f"Bulk delete error: {e}")
         return jsonify({'error': 'Failed to delete clients'}), 500
+    finally:
+        if not dry_run:
+            invalidate_dashboard_cache()
 
-@app.route('/clients/bulk-update-category', methods=['POST'])
+@bp.route('/clients/bulk-update-category', methods=['POST'])
 def bulk_update_category():
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
+    data = request.get_json(silent=True) or {}
+    new_category = str(data.get('category') or '').strip()
     try:
-        data = request.get_json()
-        client_ids = data.get('client_ids', [])
-        new_category = data.get('category', '')
-        
-        if not client_ids or not new_category:
-            return jsonify({'error': 'Client IDs and category are required'}), 400
-        
-        ensure_db_connection()
-        cursor = db.cursor()
-        
-        # Convert list to tuple for SQL IN clause
-        placeholders = ','.join(['%s'] * len(client_ids))
-        cursor.execute(f"UPDATE clients SET category = %s WHERE id IN ({placeholders})", 
-                      (new_category,) + tuple(client_ids))
-        updated_count = cursor.rowcount
-        
-        db.commit()
-        cursor.close()
-        
-        logger.info(f"Bulk updated category for {updated_count} clients to {new_category}")
-        return jsonify({'message': f'Successfully updated category for {updated_count} clients'})
+        client_ids = parse_bulk_ids(data.get('client_ids', []), BULK_MAX_IDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not client_ids or not new_category:
+        return jsonify({'error': 'Client IDs and category are required'}), 400
+    
+    dry_run = is_dry_run(data)
+    try:
+        result = bulk_move_clients(get_db(), client_ids, new_category, dry_run=dry_run,
+                                   progress=bulk_progress('Bulk category update'))
+        if dry_run:
+            return jsonify({'message': f'{result.affected} clients would be updated', **result.to_dict()})
+        
+        logger.info(f"Bulk updated category for {result.affected} clients to {new_category}")
+        return jsonify({'message': f'Successfully updated category for {result.affected} clients',
+                        **result.to_dict()})
     except Exception as e:
         logger.error(f"Bulk update category error: {e}")
         return jsonify({'error': 'Failed to update client categories'}), 500
+    finally:
+        if not dry_run:
+            invalidate_dashboard_cache()
 
-@app.route('/clients/<int:client_id>')
+@bp.route('/clients/<int:client_id>')
 def get_client_details(client_id):
     if 'logged_in' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
+    
+    # A validator served since the last write still describes the row, so no query is needed
+    cached = client_validators.get(client_id)
+    if cached and not_modified(*cached):
+        return set_validators(Response(status=304), *cached)
+    version = client_validators.version
     
     try:
-        ensure_db_connection()
+        db = get_db()
         cursor = db.cursor()
         cursor.execute("""
             SELECT id, name, category, email, phone, address, notes, created_at, updated_at 
@@ -1071,21 +1734,673 @@ def get_client_details(client_id):
                 'created_at': client[7].isoformat() if client[7] else '',
                 'updated_at': client[8].isoformat() if client[8] else ''
             }
-            return jsonify(client_data)
+            response = jsonify(client_data)
+            response.add_etag()
+            etag = response.get_etag()[0]
+            # updated_at is a naive TIMESTAMP in the server's local time zone
+            changed = client[8] or client[7]
+            last_modified = changed.astimezone(timezone.utc) if changed else None
+            client_validators.set(client_id, (etag, last_modified), version)
+            set_validators(response, etag, last_modified)
+            return response.make_conditional(request)
         else:
             return jsonify({'error': 'Client not found'}), 404
     except Exception as e:
         logger.error(f"Get client details error: {e}")
         return jsonify({'error': 'Failed to get client details'}), 500
 
+def parse_client_ids(raw):
+    """Client ids from a JSON list or a comma-separated string, de-duplicated in their original order"""
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list):
+        raise ValueError("ids must be a list of client ids")
+    ids = []
+    seen = set()
+    for value in raw:
+        try:
+            client_id = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid client id: {value!r}")
+        if client_id not in seen:
+            seen.add(client_id)
+            ids.append(client_id)
+    return ids
+
+@bp.route('/clients/batch', methods=['GET', 'POST'])
+def get_client_batch():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    # ?ids=1,2,3&fields=name,email or a JSON body {"ids": [...], "fields": [...]}
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+    else:
+        payload = request.args
+    fields = payload.get('fields')
+    if isinstance(fields, list):
+        fields = ','.join(str(field) for field in fields)
+    try:
+        ids = parse_client_ids(payload.get('ids', []))
+        columns = parse_export_columns(fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not ids:
+        return jsonify({'error': 'No client ids given'}), 400
+    max_ids = current_app.config['CLIENT_BATCH_MAX_IDS']
+    if len(ids) > max_ids:
+        return jsonify({'error': f'At most {max_ids} clients can be fetched at once'}), 400
+    # Rows are keyed by id, so it is always returned
+    columns = ['id'] + [column for column in columns if column != 'id']
+    
+    # Connect and run the first lookup before anything is sent, so a database failure is a 500 error
+    # rather than a 200 whose JSON stops after {"clients":[
+    chunks = iter_clients_by_id(db_pool, ids, columns)
+    try:
+        first = next(chunks)
+    except Exception as e:
+        chunks.close()
+        logger.error(f"Client batch error: {e}")
+        return jsonify({'error': 'Failed to load clients'}), 500
+    response = Response(client_batch_stream(itertools.chain([first], chunks), columns),
+                        mimetype='application/json')
+    # Returns the connection even if the client goes away before the last chunk
+    response.call_on_close(chunks.close)
+    return response
+
+# Background jobs
+job_runner = app_resource('job_runner')
+
+def write_blocks(path, blocks):
+    with open(path, 'wb') as f:
+        for block in blocks:
+            f.write(block)
+
+def run_export_job(ctx):
+    columns = ctx.params['columns']
+    export_format = ctx.params.get('format', 'csv')
+    chunk_size = COLUMNAR_ROW_GROUP_SIZE if export_format in COLUMNAR_FORMATS else EXPORT_CHUNK_SIZE
+    chunks = ctx.track(iter_row_chunks(db_pool, client_export_query(columns), chunk_size=chunk_size))
+    if export_format in COLUMNAR_FORMATS:
+        with db_pool.connection() as db:
+            cursor = db.cursor()
+            categories = load_categories(cursor) if 'category' in columns else []
+            cursor.close()
+        blocks = columnar_stream(chunks, columns, categories, export_format)
+        mimetype, extension = COLUMNAR_FORMATS[export_format]
+        filename = export_filename(extension)
+        write_blocks(ctx.result_file(filename, mimetype), blocks)
+        return {'rows': ctx.processed}
+    if export_format == 'json':
+        blocks, mimetype = json_stream(chunks, columns), 'application/json'
+    elif export_format == 'ndjson':
+        blocks, mimetype = ndjson_stream(chunks, columns), 'application/x-ndjson'
+    else:
+        headers = [CLIENT_EXPORT_COLUMNS[column] for column in columns]
+        blocks, mimetype = csv_stream(chunks, headers), 'text/csv'
+    filename = export_filename(export_format)
+    if ctx.params.get('gzip'):
+        blocks, mimetype, filename = gzip_stream(blocks), 'application/gzip', filename + '.gz'
+    write_blocks(ctx.result_file(filename, mimetype), blocks)
+    return {'rows': ctx.processed}
+
+def run_backup_job(ctx):
+    blocks = sql_dump_stream(db_pool, batch_size=ctx.params.get('batch', BACKUP_BATCH_SIZE))
+    filename, mimetype = export_filename('sql', prefix='database_backup'), 'application/sql'
+    if ctx.params.get('gzip'):
+        blocks, mimetype, filename = gzip_stream(blocks), 'application/gzip', filename + '.gz'
+    write_blocks(ctx.result_file(filename, mimetype), blocks)
+    return {'file': filename}
+
+def run_import_job(ctx):
+    upload = ctx.params['upload']
+    
+    def report(result):
+        ctx.progress(result.processed)
+    
+    try:
+        with db_pool.connection() as db, open(upload, 'rb') as f:
+            if ctx.params.get('mode') == 'staging':
+                result = import_clients_csv_staged(db, f, batch_size=ctx.params['batch_size'], progress=report)
+            else:
+                result = import_clients_csv(db, f, batch_size=ctx.params['batch_size'],
+                                            commit_rows=ctx.params['commit_rows'], progress=report)
+        ctx.processed = result.processed
+        logger.info(f"Imported {result.imported} clients from CSV, skipped {result.skipped}")
+        return result.to_dict()
+    finally:
+        # Chunks committed before a failure are imported too
+        invalidate_dashboard_cache()
+        os.remove(upload)
+
+def run_bulk_job(ctx):
+    def report(result):
+        ctx.progress(result.affected)
+    
+    try:
+        with db_pool.connection() as db:
+            if ctx.type == 'delete_category':
+                result = delete_category_clients(db, ctx.params['category'], progress=report)
+            elif ctx.type == 'bulk_update_category':
+                result = bulk_move_clients(db, ctx.params['client_ids'], ctx.params['category'], progress=report)
+            else:
+                result = bulk_delete(db, ctx.params['client_ids'], progress=report)
+        ctx.processed = result.affected
+        return result.to_dict()
+    finally:
+        invalidate_dashboard_cache()
+
+def run_optimize_job(ctx):
+    with db_pool.connection() as db:
+        cursor = db.cursor()
+        cursor.execute("OPTIMIZE TABLE clients")
+        rows = cursor.fetchall()
+        cursor.close()
+    logger.info("Database optimization completed")
+    return {'result': [[str(value) for value in row] for row in rows]}
+
+def run_rollup_rebuild_job(ctx):
+    with db_pool.connection() as db:
+        result = refresh_client_rollup(db, repair=True, wait=60)
+    if result['mode'] == 'skipped':
+        raise RuntimeError("Another client rollup refresh is still running")
+    return result
+
+def register_jobs(app, runner):
+    """Register the job handlers; each runs on a runner thread inside an app context of `app`"""
+    def in_app_context(handler):
+        @functools.wraps(handler)
+        def run(ctx):
+            with app.app_context():
+                return handler(ctx)
+        return run
+    
+    # Heavy jobs get a small limit each (exports two, the rest one) so they cannot starve interactive traffic
+    # of connections
+    config = app.config
+    runner.register('export', in_app_context(run_export_job), limit=config['JOB_LIMIT_EXPORT'])
+    runner.register('backup', in_app_context(run_backup_job), limit=config['JOB_LIMIT_BACKUP'])
+    runner.register('import', in_app_context(run_import_job), limit=config['JOB_LIMIT_IMPORT'])
+    runner.register('optimize', in_app_context(run_optimize_job), limit=1)
+    runner.register('rollup_rebuild', in_app_context(run_rollup_rebuild_job), limit=1)
+    for bulk_job_type in ('bulk_delete', 'bulk_update_category', 'delete_category'):
+        runner.register(bulk_job_type, in_app_context(run_bulk_job), limit=1)
+
+def job_to_dict(job):
+    data = {key: value for key, value in job.items() if key != 'result_path'}
+    for key in ('created_at', 'started_at', 'finished_at'):
+        data[key] = job[key].isoformat() if job[key] else None
+    data['result'] = json.loads(job['result']) if job['result'] else None
+    if job['status'] == 'succeeded' and job['result_path']:
+        data['download_url'] = url_for('main.job_download', job_id=job['id'])
+    return data
+
+def can_access_job(job):
+    return job['created_by'] == session.get('username') or session.get('role') == 'admin'
+
+@bp.route('/jobs/<job_type>', methods=['POST'])
+def submit_job(job_type):
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    params = {}
+    upload = None
+    try:
+        if job_type == 'export':
+            params['format'] = request.values.get('format', 'csv')
+            if params['format'] in COLUMNAR_FORMATS and request.values.get('columns') is None:
+                params['columns'] = list(CLIENT_EXPORT_COLUMNS)
+            else:
+                params['columns'] = parse_export_columns(request.values.get('columns'))
+            if params['format'] in COLUMNAR_FORMATS and not columnar_available():
+                return jsonify({'error': 'Parquet and Arrow exports need pyarrow on the server'}), 501
+            if params['format'] not in ('csv', 'json', 'ndjson', *COLUMNAR_FORMATS):
+                return jsonify({'error': 'Unsupported export format'}), 400
+            params['gzip'] = request.values.get('gzip', '').lower() in ('1', 'true', 'yes')
+        elif job_type == 'backup':
+            params['batch'] = min(max(request.values.get('batch', BACKUP_BATCH_SIZE, type=int), 1), 10000)
+            params['gzip'] = request.values.get('gzip', '').lower() in ('1', 'true', 'yes')
+        elif job_type == 'import':
+            file = request.files.get('file')
+            if file is None or file.filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            if not file.filename.endswith('.csv'):
+                return jsonify({'error': 'Please upload a CSV file'}), 400
+            # The upload only lives as long as the request, so keep a copy for the worker
+            upload_dir = os.path.join(current_app.config['JOB_RESULT_DIR'], 'uploads')
+            os.makedirs(upload_dir, exist_ok=True)
+            upload = os.path.join(upload_dir, f"{uuid.uuid4().hex}.csv")
+            file.save(upload)
+            batch_size = min(max(request.form.get('batch_size', IMPORT_BATCH_SIZE, type=int), 1), 10000)
+            params.update({
+                'upload': upload,
+                'mode': request.form.get('mode', ''),
+                'batch_size': batch_size,
+                'commit_rows': max(request.form.get('commit_rows', IMPORT_COMMIT_ROWS, type=int), batch_size)
+            })
+        elif job_type in ('bulk_delete', 'bulk_update_category', 'delete_category'):
+            # Same JSON bodies as the synchronous routes; progress is the number of clients changed so far
+            data = request.get_json(silent=True) or {}
+            if job_type != 'bulk_delete':
+                params['category'] = str(data.get('category') or '').strip()
+                if not params['category']:
+                    return jsonify({'error': 'A category is required'}), 400
+            if job_type != 'delete_category':
+                params['client_ids'] = parse_bulk_ids(data.get('client_ids', []), BULK_MAX_IDS)
+                if not params['client_ids']:
+                    return jsonify({'error': 'No clients selected'}), 400
+        
+        job_id = job_runner.submit(job_type, params, created_by=session.get('username'))
+        upload = None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except UnknownJobType as e:
+        return jsonify({'error': str(e)}), 404
+    except JobRejected as e:
+        return jsonify({'error': str(e)}), 429
+    except Exception as e:
+        logger.error(f"Submit job error: {e}")
+        return jsonify({'error': 'Failed to start job'}), 500
+    finally:
+        if upload and os.path.exists(upload):
+            os.remove(upload)
+    
+    try:
+        job_runner.prune(get_db())
+        job_runner.recover_interrupted(get_db())
+    except Exception as e:
+        logger.warning(f"Job cleanup failed: {e}")
+    
+    return jsonify({
+        'message': f'{job_type.capitalize()} job started',
+        'job_id': job_id,
+        'status_url': url_for('main.job_status', job_id=job_id)
+    }), 202
+
+@bp.route('/jobs')
+def list_jobs():
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    try:
+        created_by = None if session.get('role') == 'admin' else session.get('username')
+        # Jobs of a process that stopped would otherwise be listed as running forever
+        job_runner.recover_interrupted(get_db())
+        jobs = job_runner.recent(get_db(), created_by=created_by)
+        for job in jobs:
+            for key in ('created_at', 'started_at', 'finished_at'):
+                job[key] = job[key].isoformat() if job[key] else None
+        return jsonify({'jobs': jobs, 'runner': job_runner.stats()})
+    except Exception as e:
+        logger.error(f"List jobs error: {e}")
+        return jsonify({'error': 'Failed to list jobs'}), 500
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    try:
+        job = job_runner.get(get_db(), job_id)
+        if not job or not can_access_job(job):
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job_to_dict(job))
+    except Exception as e:
+        logger.error(f"Job status error: {e}")
+        return jsonify({'error': 'Failed to get job status'}), 500
+
+@bp.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    if 'logged_in' not in session:
+        return redirect(url_for('main.login'))
+    
+    try:
+        job = job_runner.get(get_db(), job_id)
+        if not job or not can_access_job(job):
+            return jsonify({'error': 'Job not found'}), 404
+        if job['status'] != 'succeeded' or not job['result_path'] or not os.path.exists(job['result_path']):
+            return jsonify({'error': 'No result available for this job'}), 404
+        return send_file(
+            job['result_path'],
+            mimetype=job['result_mimetype'],
+            as_attachment=True,
+            download_name=job['result_name']
+        )
+    except Exception as e:
+        logger.error(f"Job download error: {e}")
+        return jsonify({'error': 'Failed to download job result'}), 500
+
+# Maintenance commands
+@bp.cli.command('reconcile-category-stats')
+@click.option('--dry-run', is_flag=True, help='Report drift without rewriting category_stats')
+def reconcile_category_stats_command(dry_run):
+    """Rebuild category_stats from the clients table and report any drift"""
+    with db_pool.connection() as db:
+        drift = reconcile_category_stats(db, dry_run=dry_run)
+    
+    if not drift:
+        click.echo("category_stats is in sync with clients")
+        return
+    
+    for entry in drift:
+        recorded = 'missing' if entry['recorded'] is None else entry['recorded']
+        name = '(no category)' if entry['category'] is None else entry['category']
+        click.echo(f"{name}: recorded {recorded}, actual {entry['expected']}")
+    action = 'found (dry run, nothing changed)' if dry_run else 'repaired'
+    click.echo(f"{len(drift)} drifted categories {action}")
+    logger.info(f"Category stats reconcile: {len(drift)} drifted categories {action}")
+
+@bp.cli.command('refresh-rollups')
+@click.option('--rebuild', is_flag=True, help='Recount every day instead of only the changed ones')
+def refresh_rollups_command(rebuild):
+    """Bring the client growth rollup up to date"""
+    started = time.monotonic()
+    with db_pool.connection() as db:
+        # Unlike a request, the CLI may rebuild when the rollup is missing, far behind or drifted
+        result = refresh_client_rollup(db, rebuild=rebuild, wait=60, repair=True)
+    if result['mode'] == 'skipped':
+        raise click.ClickException("Another refresh is still running")
+    
+    click.echo(f"Client rollup {result['mode']}: {result['rows']} day/category rows "
+               f"in {time.monotonic() - started:.1f}s")
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static/ into ASSET_BUILD_DIR (also done at startup)"""
+    count = asset_pipeline.build()
+    stats = asset_pipeline.stats()
+    click.echo(f"{count} assets, {stats['precompressed']} precompressed variants in "
+               f"{current_app.config['ASSET_BUILD_DIR']}")
+    for name in stats['missing_vendor_files']:
+        click.echo(f"missing vendored file (served from its CDN): {name}")
+
+@bp.cli.command('vendor-assets')
+@click.option('--refresh', is_flag=True, help='Download again even if the file is already present')
+def vendor_assets_command(refresh):
+    """Fetch Chart.js and Font Awesome into static/vendor, checking them against vendor.json"""
+    def progress(name, size):
+        click.echo(f"{name}: {size} bytes")
+    try:
+        written = vendor_assets(current_app.static_folder, refresh=refresh, progress=progress)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+    asset_pipeline.build()
+    click.echo(f"Fetched {len(written)} files; commit static/vendor so offline deployments get them")
+
+@bp.cli.command('seed-data')
+@click.option('--clients', default=10000, show_default=True, help='Clients to generate')
+@click.option('--users', default=0, show_default=True, help='Users to generate (bench_000001, ...)')
+@click.option('--seed', default=42, show_default=True, help='Random seed; the same seed gives the same rows')
+@click.option('--skew', default=1.1, show_default=True, help='Zipf exponent of the category sizes (0 = uniform)')
+@click.option('--replace', is_flag=True, help='Delete all clients and generated users first')
+@click.option('--yes', is_flag=True, help='Do not ask before deleting with --replace')
+def seed_data_command(clients, users, seed, skew, replace, yes):
+    """Fill clients and users with reproducible synthetic data for benchmarks"""
+    if replace and not yes:
+        click.confirm('This deletes every client. Continue?', abort=True)
+    
+    started = time.monotonic()
+    def progress(table, inserted):
+        click.echo(f"{table}: {inserted} rows")
+    with db_pool.connection() as db:
+        counts = seed_database(db, clients=clients, users=users, seed=seed, skew=skew,
+                               replace=replace, progress=progress)
+        refresh_client_rollup(db, rebuild=True, wait=60)
+    invalidate_dashboard_cache()
+    click.echo(f"Inserted {counts['clients']} clients and {counts['users']} users "
+               f"in {time.monotonic() - started:.1f}s (user password: {SEED_USER_PASSWORD})")
+
+@bp.cli.command('migrate')
+@click.option('--target', type=int, help='Stop after this migration version')
+@click.option('--dry-run', is_flag=True, help='List pending migrations without applying them')
+def migrate_command(target, dry_run):
+    """Apply pending schema migrations from the migrations/ directory"""
+    try:
+        with db_pool.connection() as db:
+            migrations = migrate(db, target=target, dry_run=dry_run)
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    
+    if not migrations:
+        click.echo("Schema is up to date")
+        return
+    for migration in migrations:
+        click.echo(f"{'pending' if dry_run else 'applied'}  {migration.version:04d}_{migration.name}")
+    if not dry_run:
+        invalidate_dashboard_cache()
+
+@bp.cli.command('migration-status')
+def migration_status_command():
+    """List schema migrations and whether each has been applied"""
+    with db_pool.connection() as db:
+        status = migration_status(db)
+    for entry in status:
+        applied_at = entry['applied_at'] or ''
+        click.echo(f"{entry['state']:<8} {entry['version']:04d}_{entry['name']}  {applied_at}")
+    if any(entry['state'] in ('changed', 'missing') for entry in status):
+        raise click.ClickException("Applied migrations differ from the files in migrations/")
+
+@bp.cli.command('check-query-plans')
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option('--verbose', is_flag=True, help='Also list allowed scans and statements that were not checked')
+def check_query_plans_command(paths, verbose):
+    """EXPLAIN every SQL statement in the application modules (or PATHS) and fail on full table scans"""
+    paths = paths or application_modules(os.path.dirname(os.path.abspath(__file__)))
+    with db_pool.connection() as db:
+        report = check_query_plans(db, paths)
+    
+    for statement, tables in report['failures']:
+        click.echo(f"FULL SCAN  {statement.location} on {tables}: {statement.sql}")
+    for statement, error in report['errors']:
+        click.echo(f"ERROR      {statement.location}: {error}")
+    if verbose:
+        for statement, tables, reason in report['allowed']:
+            click.echo(f"allowed    {statement.location} on {tables}: {reason}")
+        for statement in report['skipped']:
+            click.echo(f"skipped    {statement.location}: SQL built at runtime")
+    click.echo(f"{report['checked']} statements checked, {len(report['failures'])} full scans, "
+               f"{len(report['allowed'])} allowed, {len(report['skipped'])} not checked")
+    if report['failures'] or report['errors']:
+        raise click.ClickException("Query plan check failed")
+
 # Error handlers
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     return render_template('500.html'), 500
 
+# Application setup and process lifecycle
+#
+# create_app() builds an app with its own pool, caches, logs and workers;
+# wsgi.py creates the one a server runs. Importing this module builds none of
+# them and writes no file. An app's pool, live feed, slow-query worker and job
+# executor start on first use in the process that uses them, which keeps
+# create_app() safe in a pre-fork master (gunicorn --preload) and keeps cold
+# starts short.
+
+# Seconds per startup stage: import (process start to end of import), init (create_app) and ready
+startup_times = {}
+# Resources of every app created in this process, so a forked child can reset them all
+_app_resources = weakref.WeakSet()
+
+class AppResources:
+    """What one app shares between its requests, jobs and CLI commands.
+
+    Kept in app.extensions['client_data']; the module-level names such as
+    db_pool and job_runner refer to the current app's instances.
+    """
+
+    def __init__(self, app):
+        config = app.config
+        self.slow_query_log = SlowQueryLog(
+            functools.partial(connect_mysql, config),
+            threshold=config['SLOW_QUERY_THRESHOLD_MS'] / 1000,
+            capacity=config['SLOW_QUERY_CAPACITY'],
+            path=config['SLOW_QUERY_LOG'],
+            explain=config['SLOW_QUERY_EXPLAIN']
+        )
+        self.db_pool = ConnectionPool(
+            functools.partial(instrumented_db_connection, config, self.slow_query_log),
+            min_size=config['DB_POOL_MIN_SIZE'],
+            max_size=config['DB_POOL_MAX_SIZE'],
+            timeout=config['DB_POOL_TIMEOUT'],
+            recycle=config['DB_POOL_RECYCLE'],
+            idle_check=config['DB_POOL_IDLE_CHECK'],
+            max_idle=config['DB_POOL_MAX_IDLE'],
+            on_checkout=record_pool_wait
+        )
+        self.live_feed = ChangeFeed(
+            self.db_pool,
+            poll_interval=config['LIVE_POLL_INTERVAL'],
+            max_subscribers=live_max_subscribers(config)
+        )
+        ttl = config['DASHBOARD_CACHE_TTL']
+        self.dashboard_cache = VersionedCache(ttl=ttl)
+        self.client_validators = VersionedCache(ttl=ttl, max_entries=10000)
+        self.fragment_cache = VersionedCache(ttl=ttl, max_entries=256)
+        self.job_runner = JobRunner(
+            self.db_pool,
+            config['JOB_RESULT_DIR'],
+            max_workers=config['JOB_WORKERS'],
+            max_queued=config['JOB_MAX_QUEUED'],
+            retention=config['JOB_RESULT_RETENTION'],
+            heartbeat_interval=config['JOB_HEARTBEAT_INTERVAL']
+        )
+        register_jobs(app, self.job_runner)
+        self.rollup_refresher = RollupRefresher(
+            self.db_pool,
+            max_age=config['ROLLUP_MAX_AGE'],
+            schedule_rebuild=lambda: self.job_runner.submit('rollup_rebuild'),
+            rebuild_interval=config['ROLLUP_REBUILD_INTERVAL']
+        )
+        self.report_snapshots = ReportSnapshots(
+            config['REPORT_DIR'],
+            retention=config['REPORT_RETENTION'],
+            max_snapshots=config['REPORT_MAX_SNAPSHOTS']
+        )
+        self.asset_pipeline = AssetPipeline(app.static_folder, config['ASSET_BUILD_DIR'])
+
+    def reset_after_fork(self):
+        self.db_pool.reset_after_fork()
+        self.slow_query_log.reset_after_fork()
+        self.live_feed.reset_after_fork()
+        self.job_runner.reset_after_fork()
+        self.report_snapshots.reset_after_fork()
+
+def create_app(config=None):
+    """Build the app from the settings (see load_settings), with `config` overriding any of them"""
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.update(load_settings(app.instance_path))
+    app.config.update(config or {})
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = secret_key(app.instance_path)
+    os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+    app.jinja_options = dict(app.jinja_options,
+                             bytecode_cache=FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR']))
+    
+    resources = AppResources(app)
+    app.extensions['client_data'] = resources
+    _app_resources.add(resources)
+    
+    app.register_blueprint(bp)
+    app.teardown_appcontext(release_db)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(record_template_render, app)
+    if app.config['COMPRESSION']:
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            levels={
+                'gzip': app.config['COMPRESSION_GZIP_LEVEL'],
+                'br': app.config['COMPRESSION_BROTLI_LEVEL'],
+                'zstd': app.config['COMPRESSION_ZSTD_LEVEL'],
+            },
+            min_size=app.config['COMPRESSION_MIN_SIZE'],
+            on_complete=record_compression
+        )
+    
+    # Without this the first page would build the assets while the user waits
+    resources.asset_pipeline.build()
+    startup_times['init'] = time.perf_counter() - started
+    logger.info(f"App created in {startup_times['init'] * 1000:.0f}ms")
+    return app
+
+def init_worker(app):
+    """Per-process startup once the process is the one that will serve; gunicorn calls it after each fork"""
+    resources = app.extensions['client_data']
+    try:
+        resources.db_pool.warm()
+    except Exception as e:
+        # The pool opens connections on demand anyway; a database that is down must not stop the worker
+        logger.warning(f"Could not open the initial pool connections: {e}")
+    try:
+        with resources.db_pool.connection() as db:
+            resources.job_runner.recover_interrupted(db)
+    except Exception as e:
+        logger.warning(f"Could not check for interrupted jobs: {e}")
+    ready = process_age()
+    if ready is None:
+        return
+    startup_times['ready'] = ready
+    target = app.config['COLD_START_TARGET_MS'] / 1000
+    if ready > target:
+        logger.warning(f"Worker {os.getpid()} took {ready * 1000:.0f}ms to become ready "
+                       f"(target {target * 1000:.0f}ms)")
+    else:
+        logger.info(f"Worker {os.getpid()} ready in {ready * 1000:.0f}ms")
+
+def reset_after_fork():
+    """Drop the connections, threads and locks a forked child inherited from its parent.
+
+    Runs in every forked child (gunicorn workers, multiprocessing) before it
+    does anything else, so no two processes ever share a MySQL socket.
+    """
+    for resources in list(_app_resources):
+        resources.reset_after_fork()
+    startup_times.pop('ready', None)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+metrics_registry.register(GaugeFunction(
+    'app_startup_seconds', 'Time this process spent per startup stage',
+    lambda: {(stage,): seconds for stage, seconds in startup_times.items()}, ('stage',)))
+
+@bp.cli.command('check-cold-start')
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreters to start')
+@click.option('--target-ms', type=float, help='Fail above this median; defaults to COLD_START_TARGET_MS')
+def check_cold_start_command(runs, target_ms):
+    """Time `import wsgi` in fresh interpreters and fail if the median is over the target"""
+    target = (target_ms if target_ms is not None else current_app.config['COLD_START_TARGET_MS']) / 1000
+    probe = "import json, wsgi, server; print(json.dumps(server.startup_times))"
+    root = os.path.dirname(os.path.abspath(__file__))
+    totals = []
+    for run in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', probe], cwd=root, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            raise click.ClickException(f"Importing wsgi failed:\n{result.stderr}")
+        stages = json.loads(result.stdout.strip().splitlines()[-1])
+        totals.append(elapsed)
+        click.echo(f"run {run + 1}: {elapsed * 1000:.0f}ms  "
+                   + '  '.join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in stages.items()))
+    median = sorted(totals)[len(totals) // 2]
+    click.echo(f"median {median * 1000:.0f}ms, target {target * 1000:.0f}ms")
+    if median > target:
+        raise click.ClickException("Cold start is over the target")
+
+# Last statement of the import, so this covers interpreter start-up and every module imported above
+imported_after = process_age()
+if imported_after is not None:
+    startup_times['import'] = imported_after
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server only; see wsgi.py and gunicorn.conf.py for production
+    app = create_app()
+    init_worker(app)
+    app.run(debug=flag('FLASK_DEBUG', False), host=setting('HOST', '0.0.0.0'), port=setting('PORT', 5000, int),
+            threaded=True)
\ No newline at end of file
@@ -53,7 +53,7 @@ fi
 
 echo "📝 Creating database and importing data..."
 echo "Note: If prompted for password, press Enter (XAMPP MySQL root has no password by default)"
-$MYSQL_CMD -u root < client_data_create.sql
+$MYSQL_CMD -u root < client_data_create.sql && python3 -m flask --app server migrate
 
 if [ $? -eq 0 ]; then
     echo "✅ Database setup completed successfully"
@@ -66,7 +66,8 @@ echo ""
 echo "🎉 Setup completed successfully!"
 echo ""
 echo "To start the application:"
-echo "   python3 server.py"
+echo "   python3 server.py                      (development)"
+echo "   gunicorn -c gunicorn.conf.py wsgi:app   (production)"
 echo ""
 echo "Then open your browser and go to:"
 echo "   http://localhost:5000"
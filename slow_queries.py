@@ -0,0 +1,243 @@
+"""Slow-query log: statements over a threshold, with the plan and rows examined captured as they happen"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD = 0.2
+SLOW_QUERY_CAPACITY = 500
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+# How many recent statements of a connection to look through for its rows examined
+_HISTORY_DEPTH = 10
+
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT|REPLACE)\b', re.IGNORECASE)
+
+
+def params_shape(params):
+    """Describe statement parameters by type and count only, never by value"""
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in params.items()) + '}'
+    if isinstance(params, (list, tuple)) and params and isinstance(params[0], (list, tuple, dict)):
+        # executemany: a sequence of rows
+        return f'{len(params)} x {params_shape(params[0])}'
+    if isinstance(params, (list, tuple)):
+        return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+    return type(params).__name__
+
+
+def _plain(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class SlowQueryLog:
+    """Records statements slower than `threshold` seconds.
+
+    The statement itself only pays for a dictionary being queued. EXPLAIN and
+    the rows-examined lookup run on a background thread with its own
+    connection (opened through `factory`), so they never touch a connection
+    that may still be streaming results. The last `capacity` records are kept
+    in memory for the /logs page; every record is also appended as a JSON
+    line to a size-rotated file.
+    """
+
+    def __init__(self, factory, threshold=SLOW_QUERY_THRESHOLD, capacity=SLOW_QUERY_CAPACITY, path=None,
+                 max_bytes=SLOW_QUERY_LOG_MAX_BYTES, backups=SLOW_QUERY_LOG_BACKUPS, explain=True):
+        self.factory = factory
+        self.threshold = threshold
+        self.explain = explain
+        self.path = path
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self._dropped = 0
+        self._queue = queue.Queue(maxsize=100)
+        self._worker = None
+        self._connection = None
+        self._inherited_connection = None
+        self._performance_schema = True
+
+        self._max_bytes = max_bytes
+        self._backups = backups
+        self._file_handler = None
+
+    def observe(self, connection, cursor, statement, sql, params, duration, rows):
+        """Statement observer for metrics.InstrumentedConnection"""
+        if duration < self.threshold:
+            return
+        entry = {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'duration_ms': round(duration * 1000, 2),
+            'statement': statement,
+            'params': params_shape(params),
+            'rows': rows,
+            'rows_examined': None,
+            'rows_examined_source': None,
+            'explain': None,
+            'explain_error': None,
+        }
+        with self._lock:
+            self._recorded += 1
+            self._entries.append(entry)
+        executed = getattr(cursor, 'statement', None)
+        job = (entry, executed if isinstance(executed, str) else None, getattr(connection, 'connection_id', None))
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            self._write(entry)
+            return
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            entry, executed, connection_id = self._queue.get()
+            try:
+                if self.explain and executed:
+                    self._capture(entry, executed, connection_id)
+            except Exception as e:
+                entry['explain_error'] = str(e)
+                self._close_connection()
+            finally:
+                self._write(entry)
+
+    def _get_connection(self):
+        if self._connection is None or not self._connection.is_connected():
+            self._connection = self.factory()
+        return self._connection
+
+    def _close_connection(self):
+        try:
+            if self._connection is not None:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+
+    def _capture(self, entry, executed, connection_id):
+        db = self._get_connection()
+        cursor = db.cursor()
+        try:
+            if connection_id is not None and self._performance_schema:
+                examined = self._rows_examined(cursor, executed, connection_id)
+                if examined is not None:
+                    entry['rows_examined'] = examined
+                    entry['rows_examined_source'] = 'performance_schema'
+
+            if not _EXPLAINABLE.match(executed):
+                return
+            try:
+                cursor.execute(f"EXPLAIN {executed}")
+                columns = [column[0] for column in cursor.description]
+                plan = [{column: _plain(value) for column, value in zip(columns, row)}
+                        for row in cursor.fetchall()]
+            except Exception as e:
+                # e.g. a temporary table that only exists on the original connection
+                entry['explain_error'] = str(e)
+                return
+            entry['explain'] = plan
+            if entry['rows_examined'] is None:
+                estimate = 1
+                for row in plan:
+                    estimate *= int(row.get('rows') or 1)
+                entry['rows_examined'] = estimate
+                entry['rows_examined_source'] = 'explain estimate'
+        finally:
+            cursor.close()
+            db.rollback()
+
+    def _rows_examined(self, cursor, executed, connection_id):
+        """ROWS_EXAMINED of the statement from performance_schema, when it is enabled"""
+        try:
+            cursor.execute("""
+                SELECT h.SQL_TEXT, h.ROWS_EXAMINED
+                FROM performance_schema.events_statements_history h
+                JOIN performance_schema.threads t ON t.THREAD_ID = h.THREAD_ID
+                WHERE t.PROCESSLIST_ID = %s
+                ORDER BY h.EVENT_ID DESC
+                LIMIT %s
+            """, (connection_id, _HISTORY_DEPTH))
+            history = cursor.fetchall()
+        except Exception as e:
+            logger.info(f"performance_schema unavailable, using EXPLAIN estimates for rows examined: {e}")
+            self._performance_schema = False
+            return None
+        for sql_text, rows_examined in history:
+            # SQL_TEXT is truncated to performance_schema_max_sql_text_length
+            sql_text = _plain(sql_text)
+            if sql_text and executed.startswith(sql_text):
+                return int(rows_examined)
+        return None
+
+    def reset_after_fork(self):
+        """Drop the parent's worker thread, its queue and its EXPLAIN connection in a freshly forked child.
+
+        The connection shares a socket with the parent, so it is left open
+        for the parent rather than closed.
+        """
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._worker = None
+        self._inherited_connection = self._connection
+        self._connection = None
+
+    def _write(self, entry):
+        if not self.path:
+            return
+        with self._lock:
+            # Opened by the first slow statement, so creating the log touches no file
+            if self._file_handler is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file_handler = RotatingFileHandler(self.path, maxBytes=self._max_bytes,
+                                                         backupCount=self._backups, encoding='utf-8', delay=True)
+                self._file_handler.setFormatter(logging.Formatter('%(message)s'))
+            handler = self._file_handler
+        handler.handle(logging.makeLogRecord({'msg': json.dumps(entry, default=str),
+                                              'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+    def entries(self, limit=None):
+        """Recorded entries, newest first"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            durations = [entry['duration_ms'] for entry in self._entries]
+            return {
+                'threshold_ms': round(self.threshold * 1000, 2),
+                'recorded': self._recorded,
+                'buffered': len(self._entries),
+                'capacity': self._entries.maxlen,
+                'dropped_explains': self._dropped,
+                'slowest_ms': max(durations) if durations else 0,
+                'log_file': self.path,
+            }
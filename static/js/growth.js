@@ -0,0 +1,25 @@
+// Loads /analytics/timeseries for the last `months` calendar months, this one included
+function loadClientGrowth(months, params) {
+    const now = new Date();
+    const first = new Date(now.getFullYear(), now.getMonth() - months + 1, 1);
+    const pad = value => String(value).padStart(2, '0');
+    const query = new URLSearchParams(Object.assign({
+        interval: 'month',
+        start: `${first.getFullYear()}-${pad(first.getMonth() + 1)}-01`,
+        end: `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`
+    }, params || {}));
+    return fetch(`/analytics/timeseries?${query}`, {credentials: 'same-origin'})
+        .then(response => response.ok ? response.json() : Promise.reject(response.status));
+}
+
+// "2024-03-01" -> "Mar 2024"
+function monthLabel(isoDate) {
+    const [year, month] = isoDate.split('-').map(Number);
+    return new Date(year, month - 1, 1).toLocaleString(undefined, {month: 'short', year: 'numeric'});
+}
+
+const growthColors = [
+    'rgba(102, 126, 234, 0.8)', 'rgba(255, 99, 132, 0.8)', 'rgba(54, 162, 235, 0.8)',
+    'rgba(255, 206, 86, 0.8)', 'rgba(75, 192, 192, 0.8)', 'rgba(153, 102, 255, 0.8)',
+    'rgba(255, 159, 64, 0.8)', 'rgba(199, 199, 199, 0.8)', 'rgba(83, 102, 255, 0.8)'
+];
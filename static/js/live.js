@@ -0,0 +1,79 @@
+// How often pages without a stream fetch /live/dashboard/snapshot; matches the server's LIVE_POLL_INTERVAL
+const LIVE_POLL_MS = 15000;
+
+// Applies the /live/dashboard stream: elements with data-live="<total>" get the new totals,
+// the given charts get the new category counts and #recentClients the newest clients.
+// When the server has no stream to spare (503) or the browser lacks EventSource, the page polls instead.
+function connectLiveUpdates(charts) {
+    const state = {counts: {}, recent: []};
+
+    function renderRecent() {
+        const list = document.getElementById('recentClients');
+        if (!list) {
+            return;
+        }
+        list.replaceChildren(...state.recent.map(client => {
+            const item = document.createElement('div');
+            item.className = 'client-item';
+            const name = document.createElement('span');
+            name.className = 'client-name';
+            name.textContent = client.name;
+            const category = document.createElement('span');
+            category.className = 'client-category';
+            category.textContent = client.category;
+            item.append(name, category);
+            return item;
+        }));
+    }
+
+    function apply(data) {
+        document.querySelectorAll('[data-live]').forEach(element => {
+            if (element.dataset.live in data) {
+                element.textContent = data[element.dataset.live];
+            }
+        });
+        charts.forEach(chart => {
+            chart.data.labels = Object.keys(state.counts);
+            chart.data.datasets[0].data = Object.values(state.counts);
+            chart.update('none');
+        });
+        renderRecent();
+    }
+
+    function applySnapshot(data) {
+        state.counts = data.categories;
+        state.recent = data.recent_clients;
+        apply(data);
+    }
+
+    function poll() {
+        fetch('/live/dashboard/snapshot', {credentials: 'same-origin'})
+            .then(response => response.ok ? response.json() : null)
+            .then(data => data && applySnapshot(data))
+            .catch(() => {})
+            .finally(() => setTimeout(poll, LIVE_POLL_MS));
+    }
+
+    if (!window.EventSource) {
+        setTimeout(poll, LIVE_POLL_MS);
+        return;
+    }
+    const source = new EventSource('/live/dashboard');
+
+    // A dropped stream reconnects by itself; a refused one (e.g. 503) is CLOSED and is not retried
+    source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(poll, LIVE_POLL_MS);
+        }
+    });
+
+    source.addEventListener('snapshot', event => applySnapshot(JSON.parse(event.data)));
+
+    source.addEventListener('delta', event => {
+        const data = JSON.parse(event.data);
+        Object.assign(state.counts, data.categories);
+        data.removed_categories.forEach(name => delete state.counts[name]);
+        state.recent = data.recent_clients || data.new_clients.concat(state.recent).slice(0, 10);
+        apply(data);
+    });
+}
@@ -0,0 +1,117 @@
+"""Stand-ins for mysql-connector cursors, connections and the pool, answering queries from canned rows,
+and an app from server.create_app() that uses them"""
+import contextlib
+import re
+import types
+
+import pytest
+
+
+class FakeCursor:
+    """Records every statement; a query gets the rows of the first `results` key its SQL contains"""
+
+    def __init__(self, results=None):
+        self.results = results or {}
+        self.executed = []
+        self.rowcount = 0
+        self.closed = False
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        self.executed.append((sql, params))
+        self._rows = []
+        for fragment, rows in self.results.items():
+            if fragment in sql:
+                self._rows = list(rows(params) if callable(rows) else rows)
+                break
+        self.rowcount = len(self._rows)
+
+    def executemany(self, sql, rows):
+        self.executed.append((' '.join(sql.split()), list(rows)))
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self):
+        self.closed = True
+
+    def statements(self, pattern):
+        """Executed (sql, params) pairs whose SQL matches the regular expression"""
+        return [(sql, params) for sql, params in self.executed if re.search(pattern, sql)]
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    """connection() and acquire() hand out one FakeConnection; `fail` makes them raise instead"""
+
+    def __init__(self, results=None, fail=None):
+        self.cursor = FakeCursor(results)
+        self.db = FakeConnection(self.cursor)
+        self.fail = fail
+        self.checkouts = 0
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self.acquire().connection
+
+    def acquire(self):
+        if self.fail:
+            raise self.fail
+        self.checkouts += 1
+        return types.SimpleNamespace(connection=self.db)
+
+    def release(self, pooled):
+        pass
+
+
+@pytest.fixture
+def cursor():
+    return FakeCursor()
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+@pytest.fixture(scope='session')
+def asset_build_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('assets'))
+
+
+@pytest.fixture
+def app(tmp_path, asset_build_dir):
+    """An app whose files all go under tmp_path and whose requests use a FakePool"""
+    import server
+    app = server.create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'JINJA_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+        'SLOW_QUERY_LOG': str(tmp_path / 'slow_queries.log'),
+        'ASSET_BUILD_DIR': asset_build_dir,
+        'REPORT_DIR': str(tmp_path / 'reports'),
+        'JOB_RESULT_DIR': str(tmp_path / 'jobs'),
+    })
+    app.extensions['client_data'].db_pool = FakePool()
+    return app
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+import server
+
+
+def test_importing_the_server_module_creates_no_app(tmp_path):
+    probe = "import server; print(hasattr(server, 'app'), len(server._app_resources))"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=tmp_path, capture_output=True, text=True,
+                            env={'PYTHONPATH': os.path.dirname(server.__file__)})
+
+    assert result.stdout.split() == ['False', '0']
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_each_app_gets_its_own_settings_and_resources(app, tmp_path):
+    other = server.create_app({'SECRET_KEY': 'other', 'DASHBOARD_CACHE_TTL': 0,
+                               'JINJA_CACHE_DIR': str(tmp_path / 'other_jinja_cache'),
+                               'ASSET_BUILD_DIR': app.config['ASSET_BUILD_DIR']})
+
+    assert other.config['DASHBOARD_CACHE_TTL'] == 0
+    assert app.config['DASHBOARD_CACHE_TTL'] == 30
+    assert other.extensions['client_data'].job_runner is not app.extensions['client_data'].job_runner
+    with app.app_context():
+        assert server.dashboard_cache._get_current_object() is app.extensions['client_data'].dashboard_cache
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+import assets
+from assets import AssetPipeline, fingerprint_name, vendor_assets
+
+FONT = b'\x00font' * 200
+SCRIPT = b'function hello() { return "world"; }\n' * 40
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write(directory, name, data):
+    path = directory / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = tmp_path / 'static'
+    write(source, 'js/app.js', SCRIPT)
+    write(source, 'fonts/icons.woff2', FONT)
+    write(source, 'css/style.css',
+          b'@font-face { src: url("../fonts/icons.woff2?v=2#iefix"), url(data:font/woff2;base64,AAAA); }\n'
+          b'.logo { background: url(/img/logo.png); }\n'
+          b'.chart { background: url(\'../vendor/lib/sprite.png\'); }\n'
+          b'.missing { background: url(../img/none.png); }\n')
+    manifest = {'lib': {'version': '1.0', 'files': {
+        'vendor/lib/lib.js': {'url': 'https://cdn.example.test/lib/1.0/lib.js'},
+        'vendor/lib/sprite.png': {'url': 'https://cdn.example.test/lib/1.0/sprite.png'},
+    }}}
+    write(source, 'vendor/vendor.json', json.dumps(manifest).encode())
+    return source
+
+
+@pytest.fixture
+def pipeline(source, tmp_path):
+    return AssetPipeline(str(source), str(tmp_path / 'build'), encoders=assets._encoders())
+
+
+def test_fingerprint_name():
+    assert fingerprint_name('css/style.css', '0123456789abcdef' * 4) == 'css/style.0123456789ab.css'
+
+
+def test_files_are_copied_under_content_hashed_names(pipeline, tmp_path):
+    assert pipeline.build() == 3
+
+    asset = pipeline.assets['js/app.js']
+    assert asset.fingerprinted == f"js/app.{digest(SCRIPT)[:12]}.js"
+    assert pipeline.url('js/app.js') == f"/assets/{asset.fingerprinted}"
+    assert (tmp_path / 'build' / asset.fingerprinted).read_bytes() == SCRIPT
+    assert asset.mimetype in ('application/javascript', 'text/javascript')
+    assert pipeline.url('js/other.js') is None
+
+
+def test_text_files_get_precompressed_variants(pipeline):
+    pipeline.build()
+
+    variants = pipeline.assets['js/app.js'].variants
+    with open(variants['gzip'], 'rb') as f:
+        assert gzip.decompress(f.read()) == SCRIPT
+    # Already compressed formats are left alone
+    assert pipeline.assets['fonts/icons.woff2'].variants == {}
+
+
+def test_css_urls_point_to_the_fingerprinted_files(pipeline):
+    pipeline.build()
+
+    with open(pipeline.assets['css/style.css'].path) as f:
+        css = f.read()
+    font = f"../fonts/icons.{digest(FONT)[:12]}.woff2"
+    assert f'url("{font}#iefix")' in css
+    assert 'url(data:font/woff2;base64,AAAA)' in css
+    assert 'url(/img/logo.png)' in css
+    assert "url('https://cdn.example.test/lib/1.0/sprite.png')" in css
+    assert 'url(../img/none.png)' in css
+
+
+def test_a_changed_font_renames_the_stylesheet(pipeline, source, tmp_path):
+    pipeline.build()
+    before = pipeline.url('css/style.css')
+
+    write(source, 'fonts/icons.woff2', FONT + b'v2')
+    rebuilt = AssetPipeline(str(source), str(tmp_path / 'build'), encoders={})
+    rebuilt.build()
+
+    assert rebuilt.url('css/style.css') != before
+
+
+def test_missing_vendor_files_fall_back_to_their_cdn(pipeline, source):
+    assert pipeline.url('vendor/lib/lib.js') == 'https://cdn.example.test/lib/1.0/lib.js'
+    assert pipeline.stats()['missing_vendor_files'] == ['vendor/lib/lib.js', 'vendor/lib/sprite.png']
+
+    write(source, 'vendor/lib/lib.js', b'var lib = 1;')
+    pipeline.build()
+    assert pipeline.url('vendor/lib/lib.js').startswith('/assets/vendor/lib/lib.')
+
+
+def test_lookup_recognises_current_and_older_fingerprints(pipeline):
+    pipeline.build()
+    asset = pipeline.assets['js/app.js']
+
+    assert pipeline.lookup(asset.fingerprinted) == (asset, True)
+    assert pipeline.lookup('js/app.0123456789ab.js') == (asset, False)
+    assert pipeline.lookup('js/gone.0123456789ab.js') == (None, False)
+
+
+def test_vendoring_pins_and_verifies_hashes(source, monkeypatch):
+    monkeypatch.setattr(assets.urllib.request, 'urlopen', lambda url, timeout: io.BytesIO(url.encode()))
+
+    written = vendor_assets(str(source))
+
+    assert written == ['vendor/lib/lib.js', 'vendor/lib/sprite.png']
+    assert (source / 'vendor/lib/lib.js').read_bytes() == b'https://cdn.example.test/lib/1.0/lib.js'
+    manifest = json.loads((source / 'vendor/vendor.json').read_text())
+    pinned = manifest['lib']['files']['vendor/lib/lib.js']['sha256']
+    assert pinned == digest(b'https://cdn.example.test/lib/1.0/lib.js')
+
+    assert vendor_assets(str(source)) == []
+    manifest['lib']['files']['vendor/lib/lib.js']['sha256'] = '0' * 64
+    (source / 'vendor/vendor.json').write_text(json.dumps(manifest))
+    with pytest.raises(ValueError, match='does not match'):
+        vendor_assets(str(source), refresh=True)
+    assert os.path.exists(source / 'vendor/lib/lib.js')
@@ -0,0 +1,135 @@
+import contextlib
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+
+from backup import quote_identifier, sql_dump_stream, sql_literal
+
+
+@pytest.mark.parametrize('value, literal', [
+    (None, 'NULL'),
+    (True, '1'),
+    (False, '0'),
+    (42, '42'),
+    (Decimal('10.50'), '10.50'),
+    (1.5, '1.5'),
+    ('plain', "'plain'"),
+    ("O'Brien", r"'O\'Brien'"),
+    ('say "hi"', r"""'say \"hi\"'"""),
+    ('C:\\temp\\', r"'C:\\temp\\'"),
+    ('\\\'', r"'\\\''"),
+    ('line\nbreak\r', r"'line\nbreak\r'"),
+    ('nul\0 and ctrl-z\x1a', r"'nul\0 and ctrl-z\Z'"),
+    ('Café ✓', "'Café ✓'"),
+    (b'\x00\xff\'', "X'00ff27'"),
+    (bytearray(b'ab'), "X'6162'"),
+    (b'', "''"),
+    (datetime(2024, 5, 1, 9, 30, 5), "'2024-05-01 09:30:05'"),
+    (date(2024, 5, 1), "'2024-05-01'"),
+    (time(9, 30), "'09:30:00'"),
+    (timedelta(hours=26), "'1 day, 2:00:00'"),
+])
+def test_sql_literal(value, literal):
+    assert sql_literal(value) == literal
+
+
+def test_identifiers_escape_backticks():
+    assert quote_identifier('odd`name') == '`odd``name`'
+
+
+class DumpCursor:
+    def __init__(self, tables, table=None):
+        self.tables = tables
+        self.table = table
+        self.column_names = ()
+        self._rows = []
+
+    def execute(self, sql, params=()):
+        table = re.search(r'`(\w+)`', sql).group(1)
+        if sql.startswith('SHOW CREATE TABLE'):
+            self._rows = [(table, f"CREATE TABLE `{table}` (...)")]
+        else:
+            self.column_names, rows = self.tables[table]
+            self._rows = list(rows)
+
+    def fetchone(self):
+        return self._rows.pop(0)
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class DumpPool:
+    def __init__(self, tables):
+        self.tables = tables
+        self.snapshot = None
+        self.rolled_back = False
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self
+
+    def start_transaction(self, consistent_snapshot=False, readonly=False):
+        self.snapshot = (consistent_snapshot, readonly)
+
+    def cursor(self, buffered=True):
+        return DumpCursor(self.tables)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def inserts(dump):
+    return [statement for statement in dump.split(b';\n') if statement.lstrip().startswith(b'INSERT')]
+
+
+def test_dump_is_read_in_one_snapshot_and_restores_every_row():
+    pool = DumpPool({
+        'clients': (('id', 'name', 'notes'), [(1, "O'Brien", None), (2, 'Café', 'a\nb')]),
+        'users': (('id',), []),
+    })
+
+    dump = b''.join(sql_dump_stream(pool, ['clients', 'users']))
+
+    assert pool.snapshot == (True, True) and pool.rolled_back
+    assert inserts(dump) == [b"INSERT INTO `clients` (`id`, `name`, `notes`) VALUES\n"
+                             b"(1,'O\\'Brien',NULL),\n(2,'Caf\xc3\xa9','a\\nb')"]
+    assert b'DROP TABLE IF EXISTS `users`;\nCREATE TABLE `users` (...);' in dump
+    assert dump.endswith(b'-- Rows: clients=2, users=0\n')
+
+
+def test_inserts_are_split_by_batch_size():
+    pool = DumpPool({'clients': (('id',), [(i,) for i in range(5)])})
+
+    statements = inserts(b''.join(sql_dump_stream(pool, ['clients'], batch_size=2)))
+
+    assert [statement.count(b'\n(') for statement in statements] == [2, 2, 1]
+
+
+def test_inserts_stay_within_the_statement_size_limit_in_bytes():
+    name = 'é' * 10  # 20 bytes in UTF-8
+    pool = DumpPool({'clients': (('name',), [(name,)] * 7)})
+    row = f"('{name}')".encode('utf-8')
+    prefix = b'INSERT INTO `clients` (`name`) VALUES\n'
+    # Room for exactly three rows with their ",\n" separators and the closing ";\n"
+    limit = len(prefix) + 3 * (len(row) + 2)
+
+    dump = b''.join(sql_dump_stream(pool, ['clients'], max_statement_bytes=limit))
+
+    statements = [statement + b';\n' for statement in inserts(dump)]
+    assert [statement.count(row) for statement in statements] == [3, 3, 1]
+    assert max(len(statement.lstrip(b'\n')) for statement in statements) == limit
+
+
+def test_a_row_larger_than_the_limit_still_gets_its_own_statement():
+    pool = DumpPool({'clients': (('notes',), [('x' * 100,), ('y',)])})
+
+    statements = inserts(b''.join(sql_dump_stream(pool, ['clients'], max_statement_bytes=50)))
+
+    assert len(statements) == 2
@@ -0,0 +1,103 @@
+import logging
+from datetime import datetime
+
+import pytest
+
+from bulk import bulk_delete, bulk_update_category, delete_category_clients, parse_bulk_ids
+from conftest import FakeConnection, FakeCursor
+
+
+def test_parse_bulk_ids_sorts_and_deduplicates():
+    assert parse_bulk_ids([3, '1', 3, 2]) == [1, 2, 3]
+
+
+@pytest.mark.parametrize('raw', ['1,2', [1, 'x'], [1, None]])
+def test_parse_bulk_ids_rejects_bad_input(raw):
+    with pytest.raises(ValueError):
+        parse_bulk_ids(raw)
+
+
+def test_parse_bulk_ids_limits_the_request():
+    with pytest.raises(ValueError, match='At most 2'):
+        parse_bulk_ids([1, 2, 3], max_ids=2)
+
+
+def test_small_id_sets_are_chunked_in_lists_and_committed_per_chunk():
+    cursor = FakeCursor({'GROUP BY clients.category': [('Tech', 2)]})
+    db = FakeConnection(cursor)
+
+    result = bulk_update_category(db, [1, 2, 3], 'Food', chunk_size=2)
+
+    assert [params for _, params in cursor.statements('^UPDATE clients')] == [('Food', 1, 2), ('Food', 3)]
+    assert db.commits == 2
+    assert result.to_dict() == {'requested': 3, 'affected': 4, 'chunks': 2, 'dry_run': False,
+                                'categories': {'Tech': 4}}
+
+
+def test_dry_runs_change_nothing():
+    cursor = FakeCursor({'GROUP BY clients.category': [('Tech', 3)]})
+    db = FakeConnection(cursor)
+
+    result = bulk_delete(db, [1, 2, 3], dry_run=True)
+
+    assert result.affected == 3
+    assert not cursor.statements('DELETE|FOR UPDATE')
+    assert db.commits == 0 and db.rollbacks == 1
+
+
+def test_deleted_clients_are_subtracted_from_the_rollup_before_the_delete():
+    cursor = FakeCursor({
+        'GROUP BY clients.category': [('Tech', 2)],
+        'SELECT clients.created_at, clients.category': [(datetime(2024, 5, 1, 9), 'Tech'),
+                                                        (datetime(2024, 5, 1, 17), 'Tech')],
+    })
+
+    bulk_delete(FakeConnection(cursor), [4, 5])
+
+    statements = [sql for sql, _ in cursor.executed]
+    rollup = statements.index(next(sql for sql in statements if sql.startswith('UPDATE client_daily_counts')))
+    delete = statements.index(next(sql for sql in statements if sql.startswith('DELETE clients')))
+    assert rollup < delete
+    assert cursor.statements('^UPDATE client_daily_counts')[0][1] == [(2, datetime(2024, 5, 1).date(), 'Tech')]
+
+
+class FailingDropCursor(FakeCursor):
+    """Lets the first DROP of the temporary id table through and fails the one that cleans up"""
+
+    drops = 0
+
+    def execute(self, sql, params=()):
+        if 'DROP TEMPORARY TABLE' in sql:
+            self.drops += 1
+            if self.drops > 1:
+                raise ConnectionError('connection lost')
+        super().execute(sql, params)
+
+
+def test_a_failed_cleanup_is_logged_without_hiding_the_original_error(caplog):
+    cursor = FailingDropCursor()
+    db = FakeConnection(cursor)
+
+    def progress(result):
+        raise RuntimeError('stopped by progress')
+
+    with caplog.at_level(logging.WARNING, logger='bulk'):
+        with pytest.raises(RuntimeError, match='stopped by progress'):
+            bulk_delete(db, list(range(10)), temp_threshold=5, chunk_size=4, progress=progress)
+
+    assert 'Could not drop the temporary id table: connection lost' in caplog.text
+    assert db.rollbacks == 1
+    assert cursor.closed
+
+
+def test_category_deletes_subtract_the_same_rows_they_delete():
+    cursor = FakeCursor({
+        'SELECT COUNT(*) FROM clients': [(1,)],
+        'SELECT clients.created_at, clients.category': [(datetime(2024, 5, 1), 'Tech')],
+    })
+
+    delete_category_clients(FakeConnection(cursor), 'Tech', chunk_size=2)
+
+    (sql, params), = cursor.statements('^SELECT clients.created_at')
+    assert sql.endswith('WHERE clients.category = %s ORDER BY clients.id LIMIT %s FOR UPDATE')
+    assert params == ('Tech', 2)
@@ -0,0 +1,47 @@
+import time
+
+from cache import VersionedCache
+
+
+def test_get_or_compute_caches_until_bump():
+    cache = VersionedCache(ttl=60)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+
+    assert cache.get_or_compute('dashboard', compute) == 1
+    assert cache.get_or_compute('dashboard', compute) == 1
+    cache.bump()
+    assert cache.get_or_compute('dashboard', compute) == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_value_computed_before_a_write_is_not_stored():
+    cache = VersionedCache(ttl=60)
+    version = cache.version
+    cache.bump()
+    cache.set('dashboard', 'stale', version)
+    assert cache.get('dashboard') is None
+
+
+def test_entries_expire_after_ttl():
+    cache = VersionedCache(ttl=0.01)
+    cache.set('dashboard', 'value', cache.version)
+    time.sleep(0.02)
+    assert cache.get('dashboard') is None
+
+
+def test_max_entries_drops_the_oldest():
+    cache = VersionedCache(ttl=60, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key.upper(), cache.version)
+    assert cache.get('a') is None
+    assert cache.get('b') == 'B'
+    assert cache.get('c') == 'C'
+
+
+def test_bump_moves_last_modified_forward():
+    cache = VersionedCache()
+    before = cache.last_modified
+    time.sleep(0.01)
+    cache.bump()
+    assert cache.last_modified > before
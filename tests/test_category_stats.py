@@ -0,0 +1,74 @@
+from category_stats import (apply_category_deltas, lock_client_categories, read_uncategorized_count,
+                            reconcile_category_stats)
+from conftest import FakeConnection, FakeCursor
+
+
+def test_deltas_upsert_categories_and_drop_emptied_ones(cursor):
+    apply_category_deltas(cursor, {'Tech': 2, 'Retail': -1, 'Food': 0})
+
+    (upsert, rows), (delete, params) = cursor.executed
+    assert upsert.startswith('INSERT INTO category_stats')
+    assert rows == [('Tech', 2), ('Retail', -1)]
+    assert delete.startswith('DELETE FROM category_stats WHERE category IN (%s)')
+    assert params == ('Retail',)
+
+
+def test_clients_without_a_category_go_to_uncategorized_clients(cursor):
+    apply_category_deltas(cursor, {None: -3})
+
+    [(sql, params)] = cursor.executed
+    assert 'uncategorized_clients' in sql
+    assert params == (-3,)
+
+
+def test_no_deltas_means_no_statements(cursor):
+    apply_category_deltas(cursor, {'Tech': 0})
+    assert cursor.executed == []
+
+
+def test_lock_client_categories_counts_per_category():
+    cursor = FakeCursor({'FOR UPDATE': [('Tech',), ('Tech',), (None,)]})
+    counts = lock_client_categories(cursor, [1, 2, 3])
+    assert counts == {'Tech': 2, None: 1}
+    assert cursor.executed[0][1] == (1, 2, 3)
+
+
+def test_uncategorized_count_defaults_to_zero():
+    assert read_uncategorized_count(FakeCursor()) == 0
+    assert read_uncategorized_count(FakeCursor({'uncategorized_clients': [(7,)]})) == 7
+
+
+def test_reconcile_reports_drift_including_uncategorized():
+    cursor = FakeCursor({
+        'FROM clients GROUP BY category': [('Tech', 3), ('Food', 1), (None, 2)],
+        'FROM category_stats FOR UPDATE': [('Tech', 3), ('Retail', 4)],
+        'FROM uncategorized_clients': [(0,)],
+    })
+    db = FakeConnection(cursor)
+
+    drift = reconcile_category_stats(db, dry_run=True)
+
+    assert drift == [
+        {'category': None, 'expected': 2, 'recorded': 0},
+        {'category': 'Food', 'expected': 1, 'recorded': None},
+        {'category': 'Retail', 'expected': 0, 'recorded': 4},
+    ]
+    assert db.rollbacks == 1 and db.commits == 0
+    assert not cursor.statements('^DELETE')
+
+
+def test_reconcile_rewrites_the_counts():
+    cursor = FakeCursor({
+        'FROM clients GROUP BY category': [('Tech', 3), (None, 2)],
+        'FROM category_stats FOR UPDATE': [('Tech', 1)],
+    })
+    db = FakeConnection(cursor)
+
+    reconcile_category_stats(db)
+
+    assert cursor.statements('^DELETE FROM category_stats')
+    [(_, rows)] = cursor.statements('^INSERT INTO category_stats')
+    assert rows == [('Tech', 3)]
+    [(_, params)] = cursor.statements('^INSERT INTO uncategorized_clients')
+    assert params == (2,)
+    assert db.commits == 1
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from conftest import FakePool
+from exports import client_batch_stream, iter_clients_by_id
+from server import parse_client_ids
+
+
+def test_parse_client_ids_keeps_order_and_drops_duplicates():
+    assert parse_client_ids('3, 1,3,,2') == [3, 1, 2]
+    assert parse_client_ids([5, '4', 5]) == [5, 4]
+
+
+@pytest.mark.parametrize('raw', ['1,x', [1, None], {'ids': 1}])
+def test_parse_client_ids_rejects_bad_input(raw):
+    with pytest.raises(ValueError):
+        parse_client_ids(raw)
+
+
+def test_lookups_follow_the_requested_order_in_bounded_chunks():
+    pool = FakePool({'FROM clients WHERE id IN': lambda params: [(i, f'Client {i}') for i in params if i != 2]})
+
+    chunks = list(iter_clients_by_id(pool, [3, 2, 1], ['id', 'name'], chunk_size=2))
+
+    assert chunks == [([(3, 'Client 3')], [2]), ([(1, 'Client 1')], [])]
+    assert [params for _, params in pool.cursor.executed] == [(3, 2), (1,)]
+    assert pool.cursor.closed
+
+
+def test_batch_stream_is_one_json_document():
+    chunks = [([(1, 'Acme'), (2, 'Globex')], [7]), ([], [8]), ([(3, 'Initech')], [])]
+
+    body = b''.join(client_batch_stream(iter(chunks), ['id', 'name']))
+
+    assert json.loads(body) == {
+        'clients': [{'id': 1, 'name': 'Acme'}, {'id': 2, 'name': 'Globex'}, {'id': 3, 'name': 'Initech'}],
+        'missing': [7, 8],
+        'count': 3,
+    }
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['logged_in'] = True
+        yield client
+
+
+def test_batch_endpoint_streams_the_clients(app, client):
+    app.extensions['client_data'].db_pool = FakePool({'FROM clients WHERE id IN': [(2, 'Globex'), (1, 'Acme')]})
+
+    response = client.get('/clients/batch?ids=1,2,9&fields=name')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'clients': [{'id': 1, 'name': 'Acme'}, {'id': 2, 'name': 'Globex'}],
+                                   'missing': [9], 'count': 2}
+
+
+def test_batch_endpoint_reports_a_database_failure_as_an_error(app, client):
+    app.extensions['client_data'].db_pool = FakePool(fail=ConnectionError('database is down'))
+
+    response = client.post('/clients/batch', json={'ids': [1, 2]})
+
+    assert response.status_code == 500
+    assert response.get_json() == {'error': 'Failed to load clients'}
+
+
+def test_batch_endpoint_validates_ids(client):
+    assert client.get('/clients/batch').status_code == 400
+    assert client.get('/clients/batch?ids=1,a').get_json() == {'error': "Invalid client id: 'a'"}
@@ -0,0 +1,61 @@
+import io
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from columnar import COLUMNAR_COMPRESSION, columnar_stream
+
+COLUMNS = ['id', 'name', 'category', 'created_at']
+CHUNKS = [
+    [(1, 'Acme', 'Tech', datetime(2024, 5, 1, 9, 30)), (2, 'Globex', None, None)],
+    # Food is not among the categories known when the export started
+    [(3, 'Chez Café', 'Food', datetime(2024, 5, 2)), (4, 'Initech', 'Tech', datetime(2024, 5, 3))],
+]
+
+
+def read_rows(table):
+    return [tuple(row.values()) for row in table.to_pylist()]
+
+
+@pytest.mark.parametrize('compression', COLUMNAR_COMPRESSION['parquet'])
+def test_parquet_round_trip_with_one_row_group_per_chunk(compression):
+    data = b''.join(columnar_stream(iter(CHUNKS), COLUMNS, ['Tech'], 'parquet', compression))
+
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert read_rows(table) == [row for chunk in CHUNKS for row in chunk]
+    assert pa.types.is_dictionary(table.schema.field('category').type)
+    assert not table.schema.field('id').nullable
+
+
+@pytest.mark.parametrize('compression', COLUMNAR_COMPRESSION['arrow'])
+def test_arrow_stream_round_trip_with_dictionary_deltas(compression):
+    data = b''.join(columnar_stream(iter(CHUNKS), COLUMNS, ['Tech'], 'arrow', compression))
+
+    reader = pa.ipc.open_stream(data)
+    batches = list(reader)
+    assert [batch.num_rows for batch in batches] == [2, 2]
+    assert read_rows(pa.Table.from_batches(batches)) == [row for chunk in CHUNKS for row in chunk]
+    assert batches[1].column('category').dictionary.to_pylist() == ['Tech', 'Food']
+
+
+def test_each_chunk_is_sent_before_the_next_is_read():
+    consumed = []
+
+    def chunks():
+        for chunk in CHUNKS:
+            consumed.append(len(chunk))
+            yield chunk
+
+    stream = columnar_stream(chunks(), COLUMNS, ['Tech'], 'arrow')
+    next(stream)
+    assert consumed == [2]
+    assert len(b''.join(stream)) > 0
+
+
+def test_empty_exports_are_still_valid_files():
+    data = b''.join(columnar_stream(iter([]), COLUMNS, [], 'parquet'))
+    assert pq.read_table(io.BytesIO(data)).num_rows == 0
@@ -0,0 +1,119 @@
+import gzip
+
+import pytest
+
+from compression import CompressionMiddleware, _Gzip, negotiate_encoding
+
+ENCODINGS = {'zstd': None, 'br': None, 'gzip': _Gzip}
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('', None),
+    ('gzip, deflate, br, zstd', 'zstd'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('br;q=0.5, gzip;q=0.5', 'br'),
+    ('zstd;q=0, *', 'br'),
+    ('*;q=0', None),
+    ('identity', None),
+    ('x-gzip', 'gzip'),
+    ('GZIP;Q=0.8', 'gzip'),
+    ('gzip;q=oops, br', 'br'),
+])
+def test_negotiation(header, expected):
+    assert negotiate_encoding(header, ENCODINGS) == expected
+
+
+def make_app(blocks, content_type='text/html; charset=utf-8', status='200 OK', headers=()):
+    def app(environ, start_response):
+        start_response(status, [('Content-Type', content_type), *headers])
+        return iter(blocks)
+    return app
+
+
+def call(app, accept='gzip', method='GET', **options):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = status
+        response['headers'] = dict(headers)
+        return lambda data: None
+
+    completed = []
+    middleware = CompressionMiddleware(app, encodings={'gzip': _Gzip}, min_size=10,
+                                       on_complete=lambda *args: completed.append(args), **options)
+    body = b''.join(middleware({'REQUEST_METHOD': method, 'HTTP_ACCEPT_ENCODING': accept}, start_response))
+    return response['headers'], body, completed
+
+
+def test_text_is_compressed_chunk_by_chunk():
+    blocks = [b'<html>' + b'x' * 100, b'y' * 100, b'</html>']
+    headers, body, completed = call(make_app(blocks, headers=[('Content-Length', '213'), ('ETag', '"abc"')]))
+
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Length' not in headers
+    assert gzip.decompress(body) == b''.join(blocks)
+    assert completed == [('gzip', 213, len(body))]
+
+
+def test_etags_are_weakened_once():
+    headers, _, _ = call(make_app([b'x' * 100], headers=[('ETag', '"abc"')]))
+    assert headers['ETag'] == 'W/"abc"'
+    headers, _, _ = call(make_app([b'x' * 100], headers=[('ETag', 'W/"abc"')]))
+    assert headers['ETag'] == 'W/"abc"'
+
+
+def test_event_streams_are_not_compressed():
+    events = [b'retry: 5000\n\n', b'event: delta\ndata: {}\n\n']
+    headers, body, completed = call(make_app(events, content_type='text/event-stream'))
+
+    assert 'Content-Encoding' not in headers
+    assert 'Vary' not in headers
+    assert body == b''.join(events)
+    assert completed == []
+
+
+@pytest.mark.parametrize('options', [
+    dict(blocks=[b'tiny']),
+    dict(blocks=[b'x' * 100], content_type='application/pdf'),
+    dict(blocks=[b'x' * 100], status='206 Partial Content'),
+    dict(blocks=[b'x' * 100], headers=[('Cache-Control', 'no-transform')]),
+    dict(blocks=[b'x' * 100], headers=[('Content-Encoding', 'br')]),
+])
+def test_responses_that_are_passed_through(options):
+    headers, body, completed = call(make_app(**options))
+    assert headers.get('Content-Encoding') == dict(options.get('headers', ())).get('Content-Encoding')
+    assert body == b''.join(options['blocks'])
+    assert completed == []
+
+
+def test_clients_without_a_common_encoding_still_get_vary():
+    headers, body, _ = call(make_app([b'x' * 100], content_type='application/json'), accept='br')
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert body == b'x' * 100
+
+
+def test_existing_vary_is_extended():
+    headers, _, _ = call(make_app([b'x' * 100], headers=[('Vary', 'Cookie')]))
+    assert headers['Vary'] == 'Cookie, Accept-Encoding'
+
+
+def test_head_requests_are_not_compressed():
+    headers, _, _ = call(make_app([b'x' * 100]), method='HEAD')
+    assert 'Content-Encoding' not in headers
+
+
+def test_the_application_body_is_closed():
+    closed = []
+
+    class Body(list):
+        def close(self):
+            closed.append(True)
+
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return Body([b'x' * 100])
+
+    call(app)
+    assert closed == [True]
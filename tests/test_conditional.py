@@ -0,0 +1,87 @@
+import pytest
+from flask import template_rendered
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess.update(logged_in=True, user_id=1, username='alice', role='admin', login_at=1700000000)
+        yield client
+
+
+@pytest.fixture
+def rendered(app):
+    templates = []
+
+    def record(sender, template, context, **extra):
+        templates.append(template.name)
+
+    template_rendered.connect(record, app)
+    yield templates
+    template_rendered.disconnect(record, app)
+
+
+def test_a_matching_etag_gets_a_304_without_running_the_view(client, rendered):
+    first = client.get('/dashboard')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert 'dashboard.html' in rendered
+    rendered.clear()
+
+    second = client.get('/dashboard', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    assert rendered == []
+
+
+def test_a_matching_last_modified_gets_a_304(client):
+    first = client.get('/dashboard')
+
+    second = client.get('/dashboard', headers={'If-Modified-Since': first.headers['Last-Modified']})
+
+    assert second.status_code == 304
+
+
+def test_responses_vary_on_the_session_cookie_and_are_never_shared(client):
+    response = client.get('/dashboard')
+
+    assert 'Cookie' in response.headers['Vary']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_a_data_change_changes_the_etag(app, client):
+    etag = client.get('/dashboard').headers['ETag']
+
+    app.extensions['client_data'].dashboard_cache.bump()
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_another_session_gets_another_etag(client):
+    etag = client.get('/dashboard').headers['ETag']
+
+    with client.session_transaction() as sess:
+        sess.update(user_id=2, username='bob', role='user')
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_pages_are_not_validated_without_a_login_or_with_caching_off(app):
+    with app.test_client() as client:
+        assert 'ETag' not in client.get('/dashboard').headers
+
+    app.config['DASHBOARD_CACHE_TTL'] = 0
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess['logged_in'] = True
+        response = client.get('/dashboard')
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
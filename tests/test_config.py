@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+import config
+from config import flag, load_config_file, secret_key, setting
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    """Point APP_CONFIG at a file written by the test, and forget any file read before"""
+    def use(name, content):
+        path = tmp_path / name
+        path.write_text(content)
+        monkeypatch.setenv(config.CONFIG_ENV, str(path))
+        return path
+
+    monkeypatch.setattr(config, '_file_settings', None)
+    monkeypatch.delenv(config.CONFIG_ENV, raising=False)
+    return use
+
+
+def test_environment_then_file_then_default(config_file, monkeypatch):
+    config_file('settings.json', json.dumps({'DB_HOST': 'db.internal', 'DB_PORT': 3307}))
+    monkeypatch.delenv('DB_HOST', raising=False)
+    monkeypatch.delenv('DB_PORT', raising=False)
+
+    assert setting('DB_HOST', 'localhost') == 'db.internal'
+    assert setting('DB_PORT', 3306, int) == 3307
+    assert setting('DB_NAME', 'clients') == 'clients'
+    assert setting('DB_USER') is None
+
+    monkeypatch.setenv('DB_PORT', '3308')
+    assert setting('DB_PORT', 3306, int) == 3308
+
+
+def test_python_config_files_export_their_uppercase_names(config_file, monkeypatch):
+    config_file('settings.py', "import os\nDB_POOL_MAX_SIZE = 4 * 5\nhelper = 'ignored'\n")
+    monkeypatch.delenv('DB_POOL_MAX_SIZE', raising=False)
+
+    assert setting('DB_POOL_MAX_SIZE', 10, int) == 20
+    assert set(config.file_settings()) == {'DB_POOL_MAX_SIZE'}
+
+
+def test_the_file_is_read_once_per_process(config_file):
+    path = config_file('settings.json', '{"A": 1}')
+    assert setting('A') == 1
+    path.write_text('{"A": 2}')
+    assert setting('A') == 1
+
+
+def test_json_files_must_hold_an_object(tmp_path):
+    path = tmp_path / 'settings.json'
+    path.write_text('[1, 2]')
+    with pytest.raises(ValueError, match='expected a JSON object'):
+        load_config_file(str(path))
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1', True), ('yes', True), ('0', False), ('False', False), (' off ', False), ('', False),
+])
+def test_flags_from_the_environment(config_file, monkeypatch, value, expected):
+    monkeypatch.setenv('FEATURE', value)
+    assert flag('FEATURE') is expected
+
+
+def test_flags_from_the_file_and_defaults(config_file, monkeypatch):
+    config_file('settings.json', '{"FEATURE": false}')
+    monkeypatch.delenv('FEATURE', raising=False)
+    assert flag('FEATURE') is False
+    assert flag('OTHER_FEATURE') is True
+    assert flag('OTHER_FEATURE', default=False) is False
+
+
+def test_a_generated_secret_key_is_shared_and_kept(config_file, monkeypatch, tmp_path):
+    monkeypatch.delenv('SECRET_KEY', raising=False)
+    instance = tmp_path / 'instance'
+
+    key = secret_key(str(instance))
+
+    assert len(key) == 64
+    assert secret_key(str(instance)) == key
+    assert os.listdir(instance) == ['secret_key']
+    assert oct(os.stat(instance / 'secret_key').st_mode & 0o777) == '0o600'
+
+    monkeypatch.setenv('SECRET_KEY', 'configured')
+    assert secret_key(str(instance)) == 'configured'
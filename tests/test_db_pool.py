@@ -0,0 +1,189 @@
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class Connection:
+    """Stands in for a mysql-connector connection"""
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.pings = 0
+        self.ping_error = None
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_error:
+            raise self.ping_error
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class Factory:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        connection = Connection(len(self.opened) + 1)
+        self.opened.append(connection)
+        return connection
+
+
+@pytest.fixture
+def factory():
+    return Factory()
+
+
+def make_pool(factory, **options):
+    return ConnectionPool(factory, **dict({'min_size': 1, 'max_size': 2, 'timeout': 0.05}, **options))
+
+
+@pytest.mark.parametrize('min_size, max_size', [(-1, 5), (0, 0), (3, 2)])
+def test_invalid_sizes_are_refused(min_size, max_size):
+    with pytest.raises(ValueError):
+        ConnectionPool(Factory(), min_size=min_size, max_size=max_size)
+
+
+def test_a_pool_without_idle_connections_is_allowed(factory):
+    pool = ConnectionPool(factory, min_size=0, max_size=1)
+    pool.warm()
+    assert factory.opened == []
+
+
+def test_warm_opens_min_size_connections(factory):
+    pool = make_pool(factory, min_size=2, max_size=3)
+    pool.warm()
+    pool.warm()
+    assert len(factory.opened) == 2
+    assert pool.stats()['idle'] == 2
+
+
+def test_connections_are_reused_most_recent_first(factory):
+    pool = make_pool(factory)
+    first = pool.acquire()
+    second = pool.acquire()
+    pool.release(first)
+    pool.release(second)
+
+    assert pool.acquire() is second
+    assert len(factory.opened) == 2
+
+
+def test_checkouts_beyond_max_size_time_out(factory):
+    pool = make_pool(factory)
+    held = [pool.acquire(), pool.acquire()]
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout, match='2 in use, max 2'):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()['timeouts'] == 1
+    assert len(factory.opened) == 2
+
+    pool.release(held.pop())
+    assert pool.acquire(timeout=0) is not None
+
+
+def test_a_waiting_checkout_gets_the_next_released_connection(factory):
+    pool = make_pool(factory, max_size=1, timeout=5)
+    held = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    while pool.stats()['waiting'] == 0:
+        time.sleep(0.001)
+
+    pool.release(held)
+    waiter.join(5)
+
+    assert got == [held]
+
+
+def test_uncommitted_work_is_rolled_back_on_release(factory):
+    pool = make_pool(factory)
+    pooled = pool.acquire()
+    pooled.connection.in_transaction = True
+
+    pool.release(pooled)
+
+    assert pooled.connection.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_an_interrupted_block_discards_its_connection(factory):
+    pool = make_pool(factory)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as connection:
+            raise RuntimeError('unread results')
+
+    assert connection.closed
+    assert pool.stats()['size'] == 0
+
+
+def test_a_failed_open_frees_its_slot():
+    def broken():
+        raise ConnectionError('database is down')
+
+    pool = make_pool(broken, max_size=1)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pool.acquire()
+    assert pool.stats()['size'] == 0 and pool.stats()['in_use'] == 0
+
+
+def test_idle_connections_are_pinged_and_replaced_when_dead(factory):
+    pool = make_pool(factory, idle_check=0)
+    pooled = pool.acquire()
+    pool.release(pooled)
+    pooled.connection.ping_error = ConnectionError('gone away')
+
+    replacement = pool.acquire()
+
+    assert replacement.connection.number == 2
+    assert pooled.connection.closed
+    assert pool.stats()['health_check_failures'] == 1
+
+
+def test_old_connections_are_recycled(factory):
+    pool = make_pool(factory, recycle=1)
+    pooled = pool.acquire()
+    pooled.created_at -= 2
+    pool.release(pooled)
+
+    assert pool.acquire().connection.number == 2
+    assert pool.stats()['connections_recycled'] == 1
+
+
+def test_connections_idle_too_long_shrink_the_pool_to_min_size(factory):
+    pool = make_pool(factory, max_idle=10)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    first.last_used -= 60
+
+    pool.release(second)
+
+    assert first.connection.closed
+    assert pool.stats()['size'] == 1
+
+
+def test_reset_after_fork_leaves_the_parents_connections_alone(factory):
+    pool = make_pool(factory, min_size=2)
+    pool.warm()
+    inherited = list(factory.opened)
+
+    pool.reset_after_fork()
+
+    assert pool.stats()['size'] == 0
+    assert not any(connection.closed for connection in inherited)
+    assert pool.acquire().connection.number == 3
@@ -0,0 +1,113 @@
+import io
+
+import pytest
+
+from conftest import FakeConnection, FakeCursor
+from importer import ImportResult, import_clients_csv, import_clients_csv_staged, iter_valid_rows
+
+
+def upload(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+def rows(text, max_errors=100):
+    result = ImportResult(max_errors)
+    return list(iter_valid_rows(upload(text), result)), result
+
+
+def test_columns_are_found_by_header_name():
+    valid, result = rows('﻿Email,Client Name,Category\r\na@acme.test,Acme,Tech\r\n')
+    assert valid == [('Acme', 'Tech', 'a@acme.test', '', '', '')]
+    assert result.skipped == 0
+
+
+def test_headers_without_name_and_category_use_the_documented_order():
+    valid, _ = rows('a,b,c,d,e,f\nAcme,Tech,a@acme.test,555,1 Main St,"notes, with a comma"\n')
+    assert valid == [('Acme', 'Tech', 'a@acme.test', '555', '1 Main St', 'notes, with a comma')]
+
+
+def test_bad_rows_are_skipped_with_their_line_numbers():
+    text = ('name,category,phone\n'
+            'Acme,Tech,555\n'
+            ',Tech,555\n'             # no name
+            'Globex\n'                # too short to have a category
+            '\n'
+            ' , \n'                   # blank rows are ignored, not errors
+            f'Initech,Tech,{"5" * 51}\n'
+            '"Multi\nline",Food,1\n'
+            '"Umbrella"Corp,Tech\n'   # text after a closing quote
+            'Hooli,Tech,"unterminated\nrest of the file\n')
+    valid, result = rows(text)
+
+    assert valid == [('Acme', 'Tech', '', '555', '', ''), ('Multi\nline', 'Food', '', '1', '', '')]
+    assert result.errors == [
+        {'line': 3, 'error': 'Name and category are required'},
+        {'line': 4, 'error': 'Name and category are required'},
+        {'line': 7, 'error': 'Value too long for phone'},
+        {'line': 10, 'error': "Malformed CSV row: ',' expected after '\"'"},
+        {'line': 12, 'error': 'Malformed CSV row: unexpected end of data'},
+    ]
+
+
+def test_error_lists_are_truncated():
+    _, result = rows('name,category\n' + 'x,\n' * 5, max_errors=2)
+    assert result.to_dict()['skipped'] == 5
+    assert len(result.errors) == 2
+    assert result.to_dict()['errors_truncated']
+
+
+@pytest.mark.parametrize('text', ['', 'name,category\n'])
+def test_empty_files_import_nothing(text):
+    cursor = FakeCursor()
+    db = FakeConnection(cursor)
+
+    result = import_clients_csv(db, upload(text))
+
+    assert result.to_dict() == {'processed': 0, 'imported': 0, 'skipped': 0, 'errors': [],
+                                'errors_truncated': False}
+    assert cursor.executed == [] and db.commits == 0
+    assert cursor.closed
+
+
+def test_rows_are_inserted_in_batches_and_committed_with_their_counts():
+    text = 'name,category\n' + ''.join(f'Client {i},{"Tech" if i % 2 else "Food"}\n' for i in range(5))
+    cursor = FakeCursor()
+    db = FakeConnection(cursor)
+    progress = []
+
+    result = import_clients_csv(db, upload(text), batch_size=2, commit_rows=4,
+                                progress=lambda r: progress.append((r.processed, r.imported)))
+
+    inserts = cursor.statements('^INSERT INTO clients ')
+    assert [len(batch) for _, batch in inserts] == [2, 2, 1]
+    assert db.commits == 2
+    assert progress == [(2, 0), (4, 4), (5, 4)]
+    assert result.imported == 5
+    assert result.categories == {'Food': 3, 'Tech': 2}
+    deltas = [dict(params) for _, params in cursor.statements('^INSERT INTO category_stats')]
+    assert deltas == [{'Food': 2, 'Tech': 2}, {'Food': 1}]
+
+
+def test_staged_imports_move_every_row_in_one_transaction():
+    text = 'name,category\nAcme,Tech\nGlobex,\nInitech,Tech\n'
+    cursor = FakeCursor({'SELECT category, COUNT(*) FROM clients_import_staging': [('Tech', 2)]})
+    db = FakeConnection(cursor)
+
+    result = import_clients_csv_staged(db, upload(text), batch_size=1)
+
+    assert [batch for _, batch in cursor.statements('^INSERT INTO clients_import_staging')] == \
+        [[('Acme', 'Tech', '', '', '', '')], [('Initech', 'Tech', '', '', '', '')]]
+    assert len(cursor.statements('^INSERT INTO clients .* SELECT')) == 1
+    assert db.commits == 1
+    assert (result.imported, result.skipped) == (2, 1)
+    assert cursor.executed[-1][0] == 'DROP TEMPORARY TABLE IF EXISTS clients_import_staging'
+
+
+def test_a_failed_staged_import_rolls_back_and_drops_the_staging_table():
+    db = FakeConnection(FakeCursor())
+
+    with pytest.raises(UnicodeDecodeError):
+        import_clients_csv_staged(db, io.BytesIO(b'name,category\n\xff\xfe,Tech\n'))
+
+    assert db.commits == 0 and db.rollbacks == 1
+    assert db.cursor().executed[-1][0] == 'DROP TEMPORARY TABLE IF EXISTS clients_import_staging'
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from conftest import FakePool
+from jobs import JobRejected, JobRunner, UnknownJobType
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = JobRunner(FakePool(), str(tmp_path), max_workers=4, max_queued=2, heartbeat_interval=3600)
+    yield runner
+    if runner._executor:
+        runner._executor.shutdown(wait=True)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def blocking_handler(release, started):
+    def handler(ctx):
+        started.release()
+        release.wait(5)
+        return {'ok': True}
+    return handler
+
+
+def test_unknown_job_type_is_its_own_error(runner):
+    with pytest.raises(UnknownJobType):
+        runner.submit('nope')
+    assert issubclass(UnknownJobType, JobRejected)
+
+
+def test_each_type_runs_within_its_limit_and_queues_up_to_max_queued(runner):
+    release, started = threading.Event(), threading.Semaphore(0)
+    runner.register('export', blocking_handler(release, started), limit=2)
+    runner.register('backup', blocking_handler(release, started), limit=1)
+
+    for _ in range(4):
+        runner.submit('export', created_by='alice')
+    runner.submit('backup')
+    for _ in range(3):
+        assert started.acquire(timeout=5)
+
+    stats = runner.stats()
+    assert stats['running'] == {'export': 2, 'backup': 1}
+    assert stats['queued'] == {'export': 2}
+    with pytest.raises(JobRejected, match='Too many queued export jobs'):
+        runner.submit('export')
+    # Other types are not held up by a full export queue
+    runner.submit('backup')
+
+    # Finished jobs make room for the queued ones
+    release.set()
+    wait_until(lambda: not runner.stats()['running'] and not runner.stats()['queued'])
+    succeeded = [params for sql, params in runner.pool.cursor.statements('^UPDATE jobs SET status')
+                 if params[0] == 'succeeded']
+    assert len(succeeded) == 6
+
+
+def test_submitted_jobs_are_stored_with_a_heartbeat(runner):
+    runner.register('optimize', lambda ctx: {'done': True})
+    job_id = runner.submit('optimize', {'table': 'clients'}, created_by='bob')
+    runner._executor.shutdown(wait=True)
+
+    [(sql, params)] = runner.pool.cursor.statements('^INSERT INTO jobs')
+    assert 'heartbeat_at' in sql
+    assert params == (job_id, 'optimize', '{"table": "clients"}', 'bob')
+    statuses = [params[0] for sql, params in runner.pool.cursor.statements('^UPDATE jobs SET status')]
+    assert statuses == ['running', 'succeeded']
+    assert runner._active == set()
+
+
+def test_failed_job_records_its_error(runner):
+    def fail(ctx):
+        raise RuntimeError('disk full')
+    runner.register('backup', fail)
+    runner.submit('backup')
+    runner._executor.shutdown(wait=True)
+
+    [(_, params)] = runner.pool.cursor.statements("^UPDATE jobs SET status = %s, error = %s")
+    assert params[:2] == ('failed', 'disk full')
+
+
+def test_recover_interrupted_allows_three_missed_heartbeats(tmp_path):
+    runner = JobRunner(FakePool(), str(tmp_path), heartbeat_interval=30)
+    db = runner.pool.db
+    runner.pool.cursor.rowcount = 0
+
+    runner.recover_interrupted(db)
+
+    [(sql, params)] = runner.pool.cursor.statements('^UPDATE jobs')
+    assert "status IN ('queued', 'running')" in sql
+    assert params == (90,)
+    assert db.commits == 1
+
+
+def test_reset_after_fork_forgets_the_parents_jobs(runner):
+    runner._pending['export'].append(object())
+    runner._running['export'] = 1
+    runner._active.add('abc')
+    runner.reset_after_fork()
+    assert runner.stats()['running'] == {} and runner.stats()['queued'] == {}
+    assert runner._active == set() and runner._heartbeat is None
@@ -0,0 +1,88 @@
+import json
+import queue
+
+import pytest
+
+from conftest import FakePool
+from live import ChangeFeed, FeedFull, format_event, snapshot_delta, snapshot_totals
+
+
+def snapshot(categories, recent_ids=(), uncategorized=0):
+    return {
+        'categories': list(categories),
+        'uncategorized': uncategorized,
+        'recent_clients': [{'id': i, 'name': f'Client {i}', 'category': 'Tech'} for i in recent_ids],
+    }
+
+
+def test_unchanged_snapshots_have_no_delta():
+    state = snapshot([('Tech', 3)], [2, 1])
+    assert snapshot_delta(state, snapshot([('Tech', 3)], [2, 1])) is None
+
+
+def test_delta_lists_changed_and_removed_categories_and_new_clients():
+    old = snapshot([('Tech', 3), ('Food', 1)], [2, 1])
+    new = snapshot([('Tech', 4)], [3, 2])
+
+    delta = snapshot_delta(old, new)
+
+    assert delta['categories'] == {'Tech': 4}
+    assert delta['removed_categories'] == ['Food']
+    assert [client['id'] for client in delta['new_clients']] == [3]
+    assert 'recent_clients' not in delta
+    assert delta['total_clients'] == 4
+
+
+def test_a_deleted_recent_client_resends_the_list():
+    delta = snapshot_delta(snapshot([('Tech', 3)], [3, 2, 1]), snapshot([('Tech', 2)], [3, 1]))
+    assert [client['id'] for client in delta['recent_clients']] == [3, 1]
+
+
+def test_uncategorized_changes_are_a_delta_and_count_towards_the_total():
+    old = snapshot([('Tech', 3)], uncategorized=1)
+    delta = snapshot_delta(old, snapshot([('Tech', 3)], uncategorized=2))
+    assert delta['total_clients'] == 5
+    assert snapshot_totals(old) == {'total_clients': 4, 'total_categories': 1, 'largest_category': 3,
+                                    'avg_clients_per_category': 4.0}
+
+
+def test_format_event():
+    message = format_event('delta', {'total_clients': 5}, event_id=7)
+    assert message == b'id: 7\nevent: delta\ndata: {"total_clients": 5}\n\n'
+
+
+def test_subscribers_are_limited():
+    feed = ChangeFeed(FakePool(), max_subscribers=1, poll_interval=3600)
+    feed.subscribe()
+    with pytest.raises(FeedFull):
+        feed.subscribe()
+    assert feed.stats()['max_subscribers'] == 1
+
+
+def test_streams_end_after_their_lifetime():
+    feed = ChangeFeed(FakePool())
+    subscriber = queue.Queue()
+    feed._subscribers.add(subscriber)
+
+    messages = list(feed.stream(subscriber, heartbeat=0.01, lifetime=0.05))
+
+    assert messages[0] == b'retry: 5000\n\n'
+    assert set(messages[1:]) == {b': keepalive\n\n'}
+    assert feed.stats()['subscribers'] == 0
+
+
+def test_current_shares_one_load_until_the_next_change():
+    loads = []
+
+    def load(db):
+        loads.append(db)
+        return snapshot([('Tech', len(loads))])
+
+    feed = ChangeFeed(FakePool(), load=load, poll_interval=3600)
+    assert feed.current()['categories'] == {'Tech': 1}
+    assert feed.current()['categories'] == {'Tech': 1}
+    feed.notify()
+    data = feed.current()
+    assert data['categories'] == {'Tech': 2}
+    assert json.loads(json.dumps(data)) == data
+    assert len(loads) == 2
@@ -0,0 +1,46 @@
+import pytest
+
+from metrics import Counter, Histogram, Registry, normalize_sql
+
+
+@pytest.mark.parametrize('sql, shape', [
+    ("SELECT * FROM clients WHERE id = 42", "SELECT * FROM clients WHERE id = ?"),
+    ("SELECT *\n  FROM clients\n WHERE name = 'O''Brien'", "SELECT * FROM clients WHERE name = ?"),
+    ("SELECT * FROM clients WHERE id IN (%s, %s, %s)", "SELECT * FROM clients WHERE id IN (...)"),
+    ("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)", "INSERT INTO t (a, b) VALUES (...)"),
+    ("SELECT price FROM t WHERE price > 10.5 LIMIT %s", "SELECT price FROM t WHERE price > ? LIMIT ?"),
+    (b"SELECT 1", "SELECT ?"),
+])
+def test_normalize_sql(sql, shape):
+    assert normalize_sql(sql) == shape
+
+
+def test_identifiers_with_digits_are_kept():
+    assert normalize_sql("SELECT col1 FROM t2") == "SELECT col1 FROM t2"
+
+
+def test_long_statements_are_truncated():
+    shape = normalize_sql("SELECT " + ", ".join(f"column_{n}" for n in range(100)), max_length=50)
+    assert len(shape) == 50 and shape.endswith('...')
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('app_query_seconds', 'Query latency', ['kind'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'select')
+    assert histogram.samples() == [
+        'app_query_seconds_bucket{kind="select",le="0.1"} 1',
+        'app_query_seconds_bucket{kind="select",le="1.0"} 2',
+        'app_query_seconds_bucket{kind="select",le="+Inf"} 3',
+        'app_query_seconds_sum{kind="select"} 5.55',
+        'app_query_seconds_count{kind="select"} 3',
+    ]
+
+
+def test_registry_renders_help_and_type():
+    registry = Registry()
+    counter = registry.register(Counter('app_requests_total', 'Requests', ['status']))
+    counter.inc(2, '200')
+    assert registry.render() == ('# HELP app_requests_total Requests\n'
+                                 '# TYPE app_requests_total counter\n'
+                                 'app_requests_total{status="200"} 2\n')
@@ -0,0 +1,37 @@
+import pytest
+
+from server import decode_page_cursor, encode_page_cursor, keyset_condition
+
+
+@pytest.mark.parametrize('value, client_id', [('Acme', 42), (None, 7), (1700000000, 1), ('Zoë & Co', 99)])
+def test_cursor_round_trip(value, client_id):
+    token = encode_page_cursor(value, client_id)
+    assert '=' not in token
+    assert decode_page_cursor(token) == (value, client_id)
+
+
+@pytest.mark.parametrize('token', ['', 'not-base64!', encode_page_cursor('a', 'b'), encode_page_cursor([1], 2)])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(ValueError):
+        decode_page_cursor(token)
+
+
+def test_id_order_only_compares_ids():
+    assert keyset_condition('id', 'desc', 10, 10) == ("id < %s", [10])
+    assert keyset_condition('id', 'asc', 10, 10) == ("id > %s", [10])
+
+
+def test_ascending_continues_after_ties_and_nulls():
+    sql, params = keyset_condition('name', 'asc', 'Beta', 5)
+    assert sql == "(name > %s OR (name = %s AND id > %s))"
+    assert params == ['Beta', 'Beta', 5]
+    # NULLs come first ascending, so every non-NULL value is still ahead
+    sql, params = keyset_condition('category', 'asc', None, 5)
+    assert 'category IS NOT NULL' in sql and params == [5]
+
+
+def test_descending_keeps_nulls_for_last():
+    sql, params = keyset_condition('category', 'desc', 'Tech', 5)
+    assert sql.endswith('OR category IS NULL)')
+    assert params == ['Tech', 'Tech', 5]
+    assert keyset_condition('category', 'desc', None, 5) == ("(category IS NULL AND id < %s)", [5])
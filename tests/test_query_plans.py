@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from conftest import FakeConnection, FakeCursor
+from migrate import MigrationError, discover_migrations
+from query_plans import (ALLOWED_FULL_SCANS, application_modules, check_query_plans, extract_statements,
+                         full_scans, sample_params)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_full_scans_include_type_all_with_candidate_keys():
+    plan = [
+        {'table': 'clients', 'type': 'ALL', 'possible_keys': None},
+        {'table': 'jobs', 'type': 'ALL', 'possible_keys': 'idx_jobs_status'},
+        {'table': 'users', 'type': 'ref', 'possible_keys': 'username'},
+        {'table': '<derived2>', 'type': 'ALL', 'possible_keys': None},
+    ]
+    assert [row['table'] for row in full_scans(plan)] == ['clients', 'jobs']
+
+
+def test_every_application_module_is_checked_by_default():
+    names = {os.path.basename(path) for path in application_modules(ROOT)}
+    assert {'server.py', 'category_stats.py', 'exports.py', 'bulk.py', 'rollups.py', 'search.py',
+            'backup.py', 'importer.py', 'jobs.py'} <= names
+    assert not names & {'benchmark.py', 'datagen.py', 'query_plans.py'}
+
+
+def test_every_allowed_scan_names_a_real_function():
+    for filename, function in ALLOWED_FULL_SCANS:
+        statements, skipped = extract_statements(os.path.join(ROOT, filename), filename=filename)
+        assert function in {statement.function for statement in statements + skipped}, (filename, function)
+
+
+def test_f_string_fields_get_per_file_samples(tmp_path):
+    source = tmp_path / 'jobs.py'
+    source.write_text('def recent(cursor, where):\n'
+                      '    cursor.execute(f"SELECT id FROM jobs {where} LIMIT %s", (1,))\n'
+                      '    cursor.execute(f"SELECT {unknown} FROM jobs")\n')
+    statements, skipped = extract_statements(str(source), filename='jobs.py')
+    assert [statement.sql for statement in statements] == ['SELECT id FROM jobs WHERE created_by = %s LIMIT %s']
+    assert [statement.location for statement in skipped] == ['jobs.py:3 (recent)']
+
+
+def test_sample_params_fill_placeholders_with_literals():
+    assert sample_params("SELECT id FROM clients WHERE name = %s LIMIT %s OFFSET %s") == \
+        "SELECT id FROM clients WHERE name = '1' LIMIT 10 OFFSET 10"
+
+
+def test_check_reports_failures_and_allowed_scans(tmp_path):
+    source = tmp_path / 'server.py'
+    source.write_text('def users(cursor):\n'
+                      '    cursor.execute("SELECT id FROM users")\n'
+                      'def clients(cursor):\n'
+                      '    cursor.execute("SELECT id FROM clients WHERE notes = %s", ("x",))\n'
+                      '    cursor.execute("SET NAMES utf8mb4")\n')
+    scan = [('1', 'SIMPLE', 'clients', 'ALL', None)]
+    cursor = FakeCursor({'EXPLAIN': scan})
+    cursor.description = [('id',), ('select_type',), ('table',), ('type',), ('possible_keys',)]
+    db = FakeConnection(cursor)
+
+    report = check_query_plans(db, [str(source)])
+
+    assert report['checked'] == 2
+    [(statement, tables)] = report['failures']
+    assert statement.function == 'clients' and tables == 'clients'
+    assert [entry[0].function for entry in report['allowed']] == ['users']
+    assert db.rollbacks == 1
+
+
+def test_migrations_are_numbered_and_split_into_statements(tmp_path):
+    migrations = discover_migrations(os.path.join(ROOT, 'migrations'))
+    versions = [migration.version for migration in migrations]
+    assert versions == sorted(versions) and len(set(versions)) == len(versions)
+
+    (tmp_path / '0001_first.sql').write_text('-- a comment; not a statement\n'
+                                             'CREATE TABLE a (id INT);\n'
+                                             'INSERT INTO a VALUES (1);  \n')
+    [migration] = discover_migrations(str(tmp_path))
+    assert migration.statements() == ['CREATE TABLE a (id INT)', 'INSERT INTO a VALUES (1)']
+
+    (tmp_path / '0001_again.sql').write_text('SELECT 1;\n')
+    with pytest.raises(MigrationError, match='Duplicate migration version 1'):
+        discover_migrations(str(tmp_path))
@@ -0,0 +1,169 @@
+import io
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from pypdf import PdfReader
+
+from reports import (ReportSnapshots, parse_allowed_recipients, parse_report_params, recipient_allowed,
+                     report_key, write_pdf_report)
+
+
+def test_report_params_have_defaults_and_a_canonical_form():
+    assert parse_report_params({}) == {'format': 'pdf', 'months': 12, 'listings': True, 'category': None}
+    assert parse_report_params({'format': 'HTML', 'months': '3', 'listings': 'off', 'category': ' Tech '}) == \
+        {'format': 'html', 'months': 3, 'listings': False, 'category': 'Tech'}
+
+
+@pytest.mark.parametrize('values', [{'format': 'docx'}, {'months': 'many'}, {'months': -1}, {'months': 121}])
+def test_report_params_are_validated(values):
+    with pytest.raises(ValueError):
+        parse_report_params(values)
+
+
+def test_report_keys_change_with_the_data_version():
+    params = parse_report_params({})
+    assert report_key('v1', params) == report_key('v1', dict(params))
+    assert report_key('v1', params) != report_key('v2', params)
+
+
+def test_pdf_report_is_a_readable_document():
+    summary = {
+        'generated_at': datetime(2024, 6, 10, 12, 0),
+        'params': {'months': 2, 'category': None},
+        'total_clients': 3,
+        'total_categories': 2,
+        'categories': [{'category': 'Tech', 'count': 2, 'share': 2 / 3},
+                       {'category': 'Food', 'count': 1, 'share': 1 / 3}],
+        'growth': [{'month': '2024-05-01', 'new': 1, 'total': 2}, {'month': '2024-06-01', 'new': 1, 'total': 3}],
+    }
+    created = datetime(2024, 5, 2)
+    listings = [('Food', iter([(3, 'Chez Café', None, None, created)])),
+                ('Tech', iter([(1, 'Acme', 'a@acme.test', '555', created), (2, 'Globex', None, None, None)]))]
+    out = io.BytesIO()
+
+    pages = write_pdf_report(out, summary, listings)
+
+    reader = PdfReader(io.BytesIO(out.getvalue()))
+    assert len(reader.pages) == pages == 3
+    text = '\n'.join(page.extract_text() for page in reader.pages)
+    assert '3 clients in 2 categories' in text
+    assert 'Growth over the Last 2 Months' in text
+    assert 'Tech (2 clients)' in text
+    assert 'a@acme.test' in text
+    assert reader.metadata.title == 'Client Report - 2024-06-10 12:00'
+
+
+def render_bytes(content, calls):
+    def render(out):
+        calls.append(1)
+        out.write(content)
+    return render
+
+
+def test_snapshots_are_rendered_once_and_then_served(tmp_path):
+    snapshots = ReportSnapshots(str(tmp_path))
+    calls = []
+
+    first = snapshots.get('abc', 'pdf', render_bytes(b'%PDF', calls))
+    second = snapshots.get('abc', 'pdf', render_bytes(b'%PDF', calls))
+
+    assert first == second
+    assert calls == [1]
+    assert snapshots.stats() == {'hits': 1, 'renders': 1}
+    assert snapshots._rendering == {}
+
+
+def test_the_directory_is_created_by_the_first_render(tmp_path):
+    snapshots = ReportSnapshots(str(tmp_path / 'reports'))
+    snapshots.cleanup()
+    assert not (tmp_path / 'reports').exists()
+
+    path = snapshots.get('abc', 'html', render_bytes(b'<html>', []))
+
+    assert open(path, 'rb').read() == b'<html>'
+
+
+def test_a_failed_render_leaves_nothing_behind(tmp_path):
+    snapshots = ReportSnapshots(str(tmp_path))
+
+    def render(out):
+        out.write(b'partial')
+        raise RuntimeError('database is down')
+
+    with pytest.raises(RuntimeError):
+        snapshots.get('abc', 'pdf', render)
+
+    assert os.listdir(tmp_path) == []
+    assert snapshots._rendering == {}
+
+
+def test_concurrent_requests_share_one_render(tmp_path):
+    snapshots = ReportSnapshots(str(tmp_path))
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_render(out):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        out.write(b'report')
+
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(snapshots.get('k', 'html', slow_render)))
+               for _ in range(3)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert len(set(paths)) == 1 and len(paths) == 3
+    assert snapshots._rendering == {}
+
+
+def test_cleanup_keeps_the_tmp_file_of_a_render_in_progress(tmp_path):
+    snapshots = ReportSnapshots(str(tmp_path), retention=60)
+    old = time.time() - 3600
+    in_progress = tmp_path / 'report_busy.pdf.1234.tmp'
+    abandoned = tmp_path / 'report_gone.pdf.5678.tmp'
+    expired = tmp_path / 'report_old.pdf'
+    for path in (in_progress, abandoned, expired):
+        path.write_bytes(b'x')
+        os.utime(path, (old, old))
+    snapshots._rendering[snapshots.path('busy', 'pdf')] = [threading.Lock(), 1]
+
+    snapshots.cleanup()
+
+    assert sorted(os.listdir(tmp_path)) == ['report_busy.pdf.1234.tmp']
+
+
+def test_cleanup_removes_the_least_recently_served_snapshots_above_the_limit(tmp_path):
+    snapshots = ReportSnapshots(str(tmp_path), max_snapshots=2)
+    now = time.time()
+    for age, key in ((30, 'a'), (20, 'b'), (10, 'c')):
+        path = snapshots.path(key, 'pdf')
+        open(path, 'wb').close()
+        os.utime(path, (now - age, now - age))
+
+    snapshots.cleanup()
+
+    assert sorted(os.listdir(tmp_path)) == ['report_b.pdf', 'report_c.pdf']
+
+
+def test_allowed_recipients():
+    allowed = parse_allowed_recipients(' Boss@Example.com, @partner.test ,,')
+    assert allowed == {'boss@example.com', '@partner.test'}
+
+    assert recipient_allowed('Me@Example.com ', 'me@example.com')
+    assert recipient_allowed('boss@example.com', 'me@example.com', allowed)
+    assert recipient_allowed('anyone@partner.test', None, allowed)
+    assert not recipient_allowed('other@example.com', 'me@example.com', allowed)
+    assert not recipient_allowed('partner.test', None, {'@'})
+    assert not recipient_allowed('someone@elsewhere.test', '', set())
@@ -0,0 +1,162 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import FakeConnection, FakeCursor, FakePool
+from rollups import (ROLLUP_SETTLE, RollupRefresher, client_growth, period_start, periods,
+                     refresh_client_rollup, remove_clients_from_rollup)
+
+NOW = datetime(2024, 6, 10, 12, 0)
+
+
+@pytest.mark.parametrize('interval, expected', [
+    ('day', [date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)]),
+    ('week', [date(2024, 1, 29)]),
+    ('month', [date(2024, 1, 1), date(2024, 2, 1)]),
+])
+def test_periods(interval, expected):
+    assert periods(date(2024, 1, 30), date(2024, 2, 1), interval) == expected
+
+
+def test_months_roll_over_the_year_end():
+    assert periods(date(2023, 12, 31), date(2024, 1, 1), 'month') == [date(2023, 12, 1), date(2024, 1, 1)]
+    assert period_start(date(2024, 2, 29), 'month') == date(2024, 2, 1)
+
+
+def test_periods_are_limited():
+    with pytest.raises(ValueError, match='At most'):
+        periods(date(2000, 1, 1), date(2024, 1, 1), 'day')
+
+
+def test_growth_fills_empty_periods_and_adds_the_opening_total():
+    cursor = FakeCursor({
+        'GROUP BY period, category': [(date(2024, 1, 1), 'Tech', 2), ('2024-03-01', 'Food', 1)],
+        'WHERE day < %s': [(5,)],
+    })
+
+    growth = client_growth(cursor, 'month', date(2024, 1, 15), date(2024, 3, 5))
+
+    assert growth['labels'] == ['2024-01-01', '2024-02-01', '2024-03-01']
+    assert growth['totals'] == [2, 0, 1]
+    assert growth['cumulative'] == [7, 7, 8]
+
+
+def test_removed_clients_are_subtracted_per_day_and_category():
+    cursor = FakeCursor({'FOR UPDATE': [(datetime(2024, 5, 1, 9), 'Tech'), (datetime(2024, 5, 1, 18), 'Tech'),
+                                        (date(2024, 5, 2), 'Food'), (None, 'Food'), (datetime(2024, 5, 3), None)]})
+
+    removed = remove_clients_from_rollup(cursor, "clients.id IN (%s, %s)", (1, 2))
+
+    assert removed == 3
+    (_, subtract), = cursor.statements('^UPDATE client_daily_counts')
+    assert subtract == [(2, date(2024, 5, 1), 'Tech'), (1, date(2024, 5, 2), 'Food')]
+    (_, emptied), = cursor.statements('^DELETE FROM client_daily_counts')
+    assert emptied == [(date(2024, 5, 1), 'Tech'), (date(2024, 5, 2), 'Food')]
+
+
+def test_nothing_to_remove_writes_nothing():
+    cursor = FakeCursor()
+    assert remove_clients_from_rollup(cursor, "clients.id = %s", (1,)) == 0
+    assert len(cursor.executed) == 1
+
+
+def rollup_cursor(state, dirty=(), rolled=(), expected=(), lock=1):
+    return FakeCursor({
+        'GET_LOCK': [(lock,)],
+        'SELECT NOW()': [(NOW,)],
+        'FROM rollup_state': [state] if state else [],
+        'SELECT DISTINCT DATE(created_at)': [(day,) for day in dirty],
+        'FROM client_daily_counts GROUP BY category': list(rolled),
+        'FROM category_stats': list(expected),
+    })
+
+
+def test_incremental_refresh_recounts_from_the_watermarks_less_the_settle_time():
+    created = datetime(2024, 6, 10, 0, 3)
+    updated = datetime(2024, 6, 10, 11, 0)
+    rebuilt = datetime(2024, 6, 10, 11, 30)
+    cursor = rollup_cursor((created, updated, rebuilt), dirty=[date(2024, 3, 1)])
+
+    result = refresh_client_rollup(FakeConnection(cursor))
+
+    # The created watermark less five minutes falls on the day before
+    assert result == {'mode': 'incremental', 'rows': 0, 'recounted_from': '2024-06-09', 'dirty_days': 1}
+    (_, params), = cursor.statements('SELECT DISTINCT DATE')
+    assert params == (rebuilt - ROLLUP_SETTLE, date(2024, 6, 9))
+    assert cursor.statements('DELETE FROM client_daily_counts WHERE day = %s')[0][1] == (date(2024, 3, 1),)
+    assert all(sql.endswith('LOCK IN SHARE MODE') for sql, _ in cursor.statements('GROUP BY DATE'))
+    # The drift check reads under the same locks as the recount, so a client committed in between is not drift
+    assert all(sql.endswith('LOCK IN SHARE MODE')
+               for sql, _ in cursor.statements('GROUP BY category|FROM category_stats'))
+    (_, saved), = cursor.statements('INSERT INTO rollup_state')
+    assert saved == ('client_daily_counts', NOW, NOW, rebuilt, NOW)
+
+
+def test_the_updated_watermark_is_used_when_it_is_later_than_the_last_rebuild():
+    updated = datetime(2024, 6, 10, 11, 0)
+    cursor = rollup_cursor((datetime(2024, 6, 10, 11, 0), updated, datetime(2024, 1, 1)))
+
+    refresh_client_rollup(FakeConnection(cursor))
+
+    assert cursor.statements('SELECT DISTINCT DATE')[0][1][0] == updated - ROLLUP_SETTLE
+
+
+def test_a_rollup_that_was_never_built_needs_repair():
+    cursor = rollup_cursor(None)
+    db = FakeConnection(cursor)
+
+    assert refresh_client_rollup(db) == {'mode': 'repair_needed', 'rows': 0, 'reason': 'never built'}
+    assert not cursor.statements('DELETE')
+
+    result = refresh_client_rollup(db, repair=True)
+    assert result == {'mode': 'rebuild', 'rows': 0}
+    assert cursor.statements('INSERT INTO rollup_state')[0][1][3] == NOW
+
+
+def test_too_many_changed_days_need_repair():
+    dirty = [date(2023, 1, 1) + timedelta(days=i) for i in range(400)]
+    cursor = rollup_cursor((NOW, NOW, None), dirty=dirty)
+
+    result = refresh_client_rollup(FakeConnection(cursor))
+
+    assert result == {'mode': 'repair_needed', 'rows': 0, 'reason': '400 changed days'}
+
+
+def test_drift_is_reported_and_only_repaired_on_request():
+    drifted = dict(rolled=[('Tech', 3)], expected=[('Tech', 4), ('Food', 1)])
+
+    result = refresh_client_rollup(FakeConnection(rollup_cursor((NOW, NOW, None), **drifted)))
+    assert result['mode'] == 'incremental'
+    assert result['drift'] == ['Food', 'Tech']
+
+    result = refresh_client_rollup(FakeConnection(rollup_cursor((NOW, NOW, None), **drifted)), repair=True)
+    assert result['mode'] == 'rebuild'
+
+
+def test_a_held_lock_skips_the_refresh():
+    cursor = rollup_cursor((NOW, NOW, None), lock=0)
+    assert refresh_client_rollup(FakeConnection(cursor)) == {'mode': 'skipped'}
+    assert len(cursor.executed) == 1
+
+
+def test_the_refresher_schedules_one_rebuild_per_interval():
+    scheduled = []
+    pool = FakePool()
+    pool.cursor.results.update(rollup_cursor(None).results)
+    refresher = RollupRefresher(pool, max_age=0, schedule_rebuild=lambda: scheduled.append(1),
+                                rebuild_interval=3600)
+
+    assert refresher.maybe_refresh()['mode'] == 'repair_needed'
+    refresher.maybe_refresh()
+
+    assert scheduled == [1]
+
+
+def test_the_refresher_refreshes_at_most_once_per_max_age():
+    pool = FakePool()
+    pool.cursor.results.update(rollup_cursor((NOW, NOW, None)).results)
+    refresher = RollupRefresher(pool, max_age=3600)
+
+    assert refresher.maybe_refresh()['mode'] == 'incremental'
+    assert refresher.maybe_refresh() is None
+    assert pool.checkouts == 1
@@ -0,0 +1,67 @@
+import pytest
+
+from conftest import FakeCursor
+from search import SEARCH_COLUMNS, SEARCH_MAX_TERMS, boolean_query, search_clients
+
+# Characters with a meaning in BOOLEAN MODE; none may reach the query as typed
+OPERATORS = set('+-"*()~<>@')
+
+
+def test_every_word_becomes_a_required_prefix():
+    assert boolean_query('Tech Solutions') == '+tech* +solutions*'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('+acme -corp', '+acme* +corp*'),
+    ('"acme corp"', '+acme* +corp*'),
+    ('acme* (corp)', '+acme* +corp*'),
+    ('~acme <corp >ltd', '+acme* +corp* +ltd*'),
+    ('a@acme.test', '+acme* +test*'),
+    ('acme-corp', '+acme* +corp*'),
+    ("o'brien", '+brien*'),
+    ('+-"*()~<>@', None),
+])
+def test_operators_typed_by_the_user_are_dropped(text, expected):
+    query = boolean_query(text)
+    assert query == expected
+    if query:
+        # Only the operators boolean_query adds itself remain
+        assert {term[0] for term in query.split()} == {'+'}
+        assert not OPERATORS & set(''.join(term[1:-1] for term in query.split()))
+
+
+@pytest.mark.parametrize('text', ['', '   ', 'a to be', '!!!'])
+def test_input_without_a_searchable_word_gives_no_query(text):
+    assert boolean_query(text) is None
+
+
+def test_short_words_are_dropped_and_long_ones_kept():
+    assert boolean_query('IT firm in NY') == '+firm*'
+    assert boolean_query('it firm', min_token=2) == '+it* +firm*'
+
+
+def test_repeated_words_are_looked_up_once_and_terms_are_capped():
+    assert boolean_query('Acme acme ACME') == '+acme*'
+    words = ' '.join(f'word{i}' for i in range(SEARCH_MAX_TERMS + 3))
+    assert len(boolean_query(words).split()) == SEARCH_MAX_TERMS
+
+
+def test_unicode_words_are_kept():
+    assert boolean_query('Café Zürich') == '+café* +zürich*'
+
+
+def test_search_sends_the_query_as_a_parameter():
+    cursor = FakeCursor({'ORDER BY score': [(1, 'Acme', 'Tech', None, None, 2.5)],
+                         'GROUP BY category': [('Tech', 1), ('Food', 4)]})
+    query = boolean_query("Robert'); DROP TABLE clients; --")
+
+    rows, facets = search_clients(cursor, query, category='Tech', limit=11, offset=20)
+
+    (sql, params), (facet_sql, facet_params) = cursor.executed
+    assert 'DROP' not in sql
+    assert f'MATCH({SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE) AND category = %s' in sql
+    assert params == (query, query, query, 'Tech', 11, 20)
+    # Facets count every category, whatever the filter
+    assert 'category = %s' not in facet_sql and facet_params == (query,)
+    assert rows == [(1, 'Acme', 'Tech', None, None, 2.5)]
+    assert facets == [('Tech', 1), ('Food', 4)]
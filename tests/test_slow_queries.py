@@ -0,0 +1,41 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from slow_queries import SlowQueryLog, params_shape
+
+
+def test_params_shape_never_includes_values():
+    assert params_shape(None) == ''
+    assert params_shape(('alice@example.com', 42, None)) == '(str, int, NoneType)'
+    assert params_shape({'email': 'alice@example.com', 'id': 1}) == '{email: str, id: int}'
+    assert params_shape([(1, 'a'), (2, 'b'), (3, 'c')]) == '3 x (int, str)'
+    assert params_shape([Decimal('1.5'), date(2024, 1, 1)]) == '(Decimal, date)'
+    assert params_shape('secret') == 'str'
+
+
+def test_statements_under_the_threshold_are_ignored():
+    log = SlowQueryLog(factory=None, threshold=0.5, explain=False)
+    log.observe(None, None, 'SELECT ?', 'SELECT 1', None, 0.1, 1)
+    assert log.entries() == []
+
+
+def test_slow_statements_are_kept_newest_first_up_to_capacity():
+    log = SlowQueryLog(factory=None, threshold=0.1, capacity=2, explain=False)
+    for n in range(3):
+        log.observe(None, None, f'SELECT {n}', f'SELECT {n}', ('x',), 0.2 + n, 1)
+    entries = log.entries()
+    assert [entry['statement'] for entry in entries] == ['SELECT 2', 'SELECT 1']
+    assert entries[0]['params'] == '(str)'
+    assert log.stats()['recorded'] == 3
+    assert log.stats()['slowest_ms'] == 2200.0
+
+
+def test_the_log_file_is_created_by_the_first_slow_statement(tmp_path):
+    path = tmp_path / 'logs' / 'slow_queries.log'
+    log = SlowQueryLog(factory=None, threshold=0.1, path=str(path), explain=False)
+    assert not path.parent.exists()
+
+    log._write({'statement': 'SELECT ?', 'duration_ms': 250.0})
+
+    assert json.loads(path.read_text()) == {'statement': 'SELECT ?', 'duration_ms': 250.0}